@@ -0,0 +1,115 @@
+"""
+    Замер сверки истории диалога при синхронизации (ACK).
+
+    Сравнивает прежнюю сверку по спискам (O(n * m)), сверку по множествам (build_sync_plan)
+    и сверку по диапазонам (build_sync_plan_from_summary) на историях от 1 тыс. до 1 млн сообщений.
+
+    Запуск из корня репозитория:
+        python benchmarks/sync_plan.py
+        python benchmarks/sync_plan.py --sizes 1000 10000 --legacy-limit 10000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+from libs.sync import HistorySummary, build_sync_plan, build_sync_plan_from_summary  # noqa: E402
+
+MessageIds = List[str]
+
+def make_history(size: int, missing_ratio: float, buffered: int, seed: int) -> Tuple[MessageIds, MessageIds, MessageIds]:
+    """
+        Строит историю двух сторон: у каждой стороны пропущена часть сообщений другой.
+
+    Args:
+        size (int): Количество сообщений в общей истории.
+        missing_ratio (float): Доля сообщений, которых нет у одной из сторон.
+        buffered (int): Количество неподтвержденных исходящих сообщений.
+        seed (int): Зерно генератора случайных чисел.
+
+    Returns:
+        Tuple[MessageIds, MessageIds, MessageIds]: Наша история, буфер исходящих и история собеседника (в нашем восприятии).
+    """
+    rng = random.Random(seed)
+    history: MessageIds = [f'{"m" if i % 2 else "o"}{i // 2}' for i in range(size)]
+    our_ids: MessageIds = [message_id for message_id in history if rng.random() >= missing_ratio]
+    peer_ids: MessageIds = [message_id for message_id in history if rng.random() >= missing_ratio]
+    buffered_ids: MessageIds = [f'm{size // 2 + i}' for i in range(buffered)]
+    # Часть буфера собеседник уже получил
+    peer_ids.extend(buffered_ids[::2])
+    return our_ids, buffered_ids, peer_ids
+
+def legacy_sync_plan(our_ids: MessageIds, buffered_ids: MessageIds, peer_ids: MessageIds) -> Tuple[MessageIds, MessageIds, MessageIds, MessageIds]:
+    """
+        Прежняя сверка: проверки принадлежности по спискам, как в _resend_messages_from_buffer,
+        _send_missing_messages и _request_missing_messages до перехода на множества.
+    """
+    resend_ids: MessageIds = []
+    confirmed_ids: MessageIds = []
+    our_id_list: MessageIds = list(our_ids)
+    for message_id in buffered_ids:
+        if message_id not in peer_ids:
+            resend_ids.append(message_id)
+        else:
+            confirmed_ids.append(message_id)
+            our_id_list.append(message_id)
+
+    missing_on_peer_ids: MessageIds = [message_id for message_id in our_ids if message_id not in peer_ids]
+    missing_local_ids: MessageIds = [message_id for message_id in peer_ids if message_id not in our_id_list]
+    return resend_ids, confirmed_ids, missing_on_peer_ids, missing_local_ids
+
+def measure(func: Callable[[], object], repeat: int) -> float:
+    """
+        Возвращает лучшее время выполнения из нескольких запусков.
+
+    Args:
+        func (Callable[[], object]): Замеряемая функция.
+        repeat (int): Количество запусков.
+
+    Returns:
+        float: Время в секундах.
+    """
+    best: float = float('inf')
+    for _ in range(repeat):
+        started: float = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Замер сверки истории диалога.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000],
+                        help='Размеры истории в сообщениях.')
+    parser.add_argument('--missing', type=float, default=0.01, help='Доля сообщений, пропущенных у каждой стороны.')
+    parser.add_argument('--buffered', type=int, default=100, help='Количество неподтвержденных исходящих сообщений.')
+    parser.add_argument('--legacy-limit', type=int, default=20_000,
+                        help='Максимальный размер истории для сверки по спискам (она квадратичная).')
+    parser.add_argument('--repeat', type=int, default=3, help='Количество запусков каждого замера.')
+    args = parser.parse_args()
+
+    print(f'{"сообщений":>10} {"списки, с":>12} {"множества, с":>14} {"диапазоны, с":>14} {"мкс/сообщ. (множ.)":>20}')
+    for size in args.sizes:
+        our_ids, buffered_ids, peer_ids = make_history(size, args.missing, args.buffered, seed=size)
+        peer_summary: HistorySummary = HistorySummary.from_ids(peer_ids)
+
+        set_plan = build_sync_plan(our_ids, buffered_ids, peer_ids)
+        summary_plan = build_sync_plan_from_summary(our_ids, buffered_ids, peer_summary)
+        # Диапазоны не сохраняют порядок собеседника, поэтому сравниваем содержимое
+        assert all(sorted(a) == sorted(b) for a, b in zip(set_plan, summary_plan)), 'Результаты сверок не совпадают'
+
+        set_time: float = measure(lambda: build_sync_plan(our_ids, buffered_ids, peer_ids), args.repeat)
+        summary_time: float = measure(lambda: build_sync_plan_from_summary(our_ids, buffered_ids, peer_summary), args.repeat)
+
+        legacy_column: str = '-'
+        if size <= args.legacy_limit:
+            assert tuple(legacy_sync_plan(our_ids, buffered_ids, peer_ids)) == tuple(set_plan), 'Результаты сверок не совпадают'
+            legacy_column = f'{measure(lambda: legacy_sync_plan(our_ids, buffered_ids, peer_ids), 1):.4f}'
+
+        print(f'{size:>10} {legacy_column:>12} {set_time:>14.4f} {summary_time:>14.4f} {set_time / size * 1e6:>20.3f}')
+
+if __name__ == '__main__':
+    main()
@@ -20,12 +20,78 @@ class _NetworkDHTConfig(NamedTuple):
 class _NetworkPingConfig(NamedTuple):
     INTERVAL: int
     TIMEOUT: int
+    MAX_INTERVAL: int
+
+class _NetworkFileTransferConfig(NamedTuple):
+    CHUNK_SIZE: int
+    MAX_CHUNK_SIZE: int
+    ACK_WINDOW: int
+    JOURNAL_INTERVAL: int
+    LEGACY_MAX_FILE_SIZE: int
+
+class _NetworkAsyncioConfig(NamedTuple):
+    ENABLED: bool
+    FRAME_WORKERS: int
+    BACKGROUND_WORKERS: int
+
+class _NetworkSyncConfig(NamedTuple):
+    BATCH_SIZE: int
+    BATCH_MAX_BYTES: int
+    MAX_REQUEST_IDS: int
+
+class _NetworkAckConfig(NamedTuple):
+    DELAY_MS: int
+    MAX_PENDING: int
+    MAX_SACK_RANGES: int
+
+class _NetworkTimersConfig(NamedTuple):
+    WORKERS: int
+
+class _NetworkDHTCacheConfig(NamedTuple):
+    TTL: int
+    MAX_STALE: int
+
+class _NetworkDHTRepublishConfig(NamedTuple):
+    CHECK_INTERVAL: int
+    INTERVAL: int
+    MIN_BACKOFF: int
+    MAX_BACKOFF: int
+    IP_RECHECK_INTERVAL: int
+
+class _NetworkDHTRoutingConfig(NamedTuple):
+    MAX_CONTACTS: int
 
 class _NetworkConfig(NamedTuple):
     DHT: _NetworkDHTConfig
     DHT_CLIENT_PORT: PortType
     CLIENT_COMMUNICATION_PORT: PortType
+    PUBLIC_IP_TIMEOUT: float
     PING: _NetworkPingConfig
+    FILE_TRANSFER: _NetworkFileTransferConfig
+    ASYNCIO: _NetworkAsyncioConfig
+    SYNC: _NetworkSyncConfig
+    ACK: _NetworkAckConfig
+    TIMERS: _NetworkTimersConfig
+    DHT_CACHE: _NetworkDHTCacheConfig
+    DHT_REPUBLISH: _NetworkDHTRepublishConfig
+    DHT_ROUTING: _NetworkDHTRoutingConfig
+
+class _DatabaseConfig(NamedTuple):
+    JOURNAL_MODE: str
+    SYNCHRONOUS: str
+    POOL_SIZE: int
+    STATEMENT_CACHE_SIZE: int
+    BUSY_TIMEOUT: float
+    FLUSH_INTERVAL_MS: int
+    FLUSH_BATCH_SIZE: int
+    FLUSH_TIMEOUT: float
+    HISTORY_PAGE_SIZE: int
+
+class _EventsConfig(NamedTuple):
+    WORKERS: int
+    BACKGROUND_WORKERS: int
+    MAX_BATCH: int
+    MAX_PENDING: int
 
 class _FontConfig(NamedTuple):
     FAMILY: str
@@ -51,6 +117,9 @@ class _WidgetDescription(NamedTuple):
 class _WidgetsConfig(NamedTuple):
     MAX_TEXT_SYMBOLS_NUMBER: int
     MAX_FILE_SIZE: int
+    UI_UPDATE_INTERVAL_MS: int
+    DIALOG_WINDOW_SIZE: int
+    DIALOG_WINDOW_MARGIN: int
     DIALOG_TEXT_FONT: _FontConfig
     DIALOG_AUTHOR_FONT: _FontConfig
     INPUT_TEXT_FONT: _FontConfig
@@ -59,8 +128,10 @@ class _WidgetsConfig(NamedTuple):
 
 class _PathConfig(NamedTuple):
     LOG_DHT: PathType
+    DHT_STATE: PathType
     LOG_CLIENT: PathType
     DOWNLOAD: PathType
+    TRANSFERS: PathType
     THEMES: PathType
     ICONS: PathType
     KEYS: PathType
@@ -102,12 +173,78 @@ class _Config(NamedTuple):
         ),
         DHT_CLIENT_PORT=60798, 
         CLIENT_COMMUNICATION_PORT=60801,
-        PING=_NetworkPingConfig(INTERVAL=5, TIMEOUT=15)
+        PUBLIC_IP_TIMEOUT=5.0,  # Сколько секунд ждать ответа сервиса определения глобального IP адреса
+        PING=_NetworkPingConfig(
+            INTERVAL                = 5,    # Интервал проверки соединения в секундах сразу после обмена данными
+            TIMEOUT                 = 15,   # Через сколько секунд без входящих кадров соединение считается разорванным
+            MAX_INTERVAL            = 12    # До какого интервала растет проверка простаивающего соединения
+        ),
+        FILE_TRANSFER=_NetworkFileTransferConfig(
+            CHUNK_SIZE              = 256 * 1024,   # Размер одного блока файла при потоковой передаче
+            MAX_CHUNK_SIZE          = 16 * 1024 * 1024, # Наибольший размер блока, который принимается от собеседника
+            ACK_WINDOW              = 16,           # Сколько блоков можно отправить без подтверждения
+            JOURNAL_INTERVAL        = 16,           # Через сколько принятых блоков обновляется журнал передачи на диске
+            LEGACY_MAX_FILE_SIZE    = 100_000_000   # Ограничение для клиентов без потоковой передачи файлов
+        ),
+        ASYNCIO=_NetworkAsyncioConfig(
+            ENABLED                 = False,    # Все сессии в одном цикле событий asyncio вместо потока на сессию
+            FRAME_WORKERS           = 8,        # Потоки обработки кадров (подписи, шифрование, БД)
+            BACKGROUND_WORKERS      = 16        # Потоки длительных задач сессий (синхронизация, передача файлов)
+        ),
+        SYNC=_NetworkSyncConfig(
+            BATCH_SIZE              = 256,          # Сколько сообщений истории упаковывается в один кадр SEND_BATCH
+            BATCH_MAX_BYTES         = 1024 * 1024,  # Ограничение размера сообщений одного кадра SEND_BATCH в байтах
+            MAX_REQUEST_IDS         = 100_000       # Сколько недостающих сообщений запрашивается у собеседника за одну синхронизацию
+        ),
+        ACK=_NetworkAckConfig(
+            DELAY_MS                = 40,   # Сколько миллисекунд можно задержать подтверждение, чтобы объединить его с другими
+            MAX_PENDING             = 32,   # Сколько неподтвержденных сообщений вызывает подтверждение без задержки
+            MAX_SACK_RANGES         = 32    # Максимальное количество выборочно подтверждаемых диапазонов в одном кадре
+        ),
+        TIMERS=_NetworkTimersConfig(
+            WORKERS                 = 4     # Потоки выполнения сработавших таймеров всех сессий (проверка соединения, подтверждения)
+        ),
+        DHT_CACHE=_NetworkDHTCacheConfig(
+            TTL                     = 10 * 60,          # Сколько секунд профиль собеседника из DHT используется без обновления
+            MAX_STALE               = 7 * 24 * 60 * 60  # До какого возраста устаревший профиль используется, пока обновляется в фоне
+        ),
+        DHT_REPUBLISH=_NetworkDHTRepublishConfig(
+            CHECK_INTERVAL          = 60,       # Как часто сверяются данные собственного профиля (IP адрес, порт) с записанными в DHT
+            INTERVAL                = 60 * 60,  # Через сколько секунд неизменный профиль записывается повторно, пока узлы DHT его не забыли
+            MIN_BACKOFF             = 5,        # Задержка перед повтором первой неудачной записи
+            MAX_BACKOFF             = 5 * 60,   # До какой задержки растут повторы неудачной записи
+            IP_RECHECK_INTERVAL     = 15 * 60   # Как часто для профиля заново определяется наш IP адрес
+        ),
+        DHT_ROUTING=_NetworkDHTRoutingConfig(
+            MAX_CONTACTS            = 64    # Сколько узлов таблицы маршрутизации сохраняется для быстрого подключения при следующем запуске
+        )
+    )
+
+    DATABASE: _DatabaseConfig = _DatabaseConfig(
+        JOURNAL_MODE            = 'WAL',    # Запись в журнал упреждающей записи, чтение не блокируется записью
+        SYNCHRONOUS             = 'NORMAL', # Уровень синхронизации с диском: OFF, NORMAL, FULL или EXTRA
+        POOL_SIZE               = 4,        # Сколько свободных соединений держать открытыми для каждой базы
+        STATEMENT_CACHE_SIZE    = 128,      # Размер кэша подготовленных выражений одного соединения
+        BUSY_TIMEOUT            = 5.0,      # Сколько секунд ждать освобождения заблокированной базы
+        FLUSH_INTERVAL_MS       = 50,       # Как часто очередь отложенной записи фиксирует накопленные сообщения
+        FLUSH_BATCH_SIZE        = 500,      # Сколько сообщений в очереди вызывает запись не дожидаясь интервала
+        FLUSH_TIMEOUT           = 10.0,     # Сколько секунд чтение истории ждет записи очереди, прежде чем читать без нее
+        HISTORY_PAGE_SIZE       = 100       # Сколько сообщений истории загружается за раз при открытии диалога и прокрутке
+    )
+
+    EVENTS: _EventsConfig = _EventsConfig(
+        WORKERS                 = 4,        # Потоки обработки событий сети для интерфейса
+        BACKGROUND_WORKERS      = 2,        # Потоки длительных обработчиков событий (запись полученных файлов)
+        MAX_BATCH               = 256,      # Сколько событий одного диалога обрабатывается за раз
+        MAX_PENDING             = 10_000    # Сколько необработанных событий может накопиться до ожидания публикующего
     )
 
     WIDGETS: _WidgetsConfig = _WidgetsConfig(
         MAX_TEXT_SYMBOLS_NUMBER = 5000,
-        MAX_FILE_SIZE           = 100_000_000,
+        MAX_FILE_SIZE           = 20_000_000_000,
+        UI_UPDATE_INTERVAL_MS   = 16,   # Период применения накопленных обновлений интерфейса (~60 кадров в секунду)
+        DIALOG_WINDOW_SIZE      = 300,  # Сколько сообщений диалога одновременно выведено в текстовый виджет
+        DIALOG_WINDOW_MARGIN    = 100,  # На сколько сообщений сдвигается окно при прокрутке к его краю
         DIALOG_AUTHOR_FONT      = _FontConfig(
             FAMILY  = 'Calibri',
             SIZE    = 10,
@@ -164,8 +301,10 @@ class _Config(NamedTuple):
     BASE_PATH: str = 'stuff'
     PATHS: _PathConfig = _PathConfig(
         LOG_DHT     = f'{BASE_PATH}/log/dht/',
+        DHT_STATE   = f'{BASE_PATH}/dht/',
         LOG_CLIENT  = f'{BASE_PATH}/log/client/',
         DOWNLOAD    = 'download',
+        TRANSFERS   = 'download/.transfers/',
         THEMES      = f'{BASE_PATH}/themes/',
         ICONS       = f'{BASE_PATH}/icons/',
         KEYS        = f'{BASE_PATH}/keys/'
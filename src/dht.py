@@ -1,7 +1,13 @@
 import asyncio
-import nest_asyncio
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Coroutine, Dict, Iterable, List, Set, Tuple, TypeVar, Union
 
-nest_asyncio.apply()
+from kademlia.crawling import NodeSpiderCrawl
 from kademlia.network import Server
 from pydantic import BaseModel
 
@@ -9,6 +15,8 @@ from libs.cryptography import RSA_KeyType
 from libs.mylogger import MyLogger, MyLoggerType
 from config import config, IPAddressType, PortType
 
+T = TypeVar('T')
+
 class EmptyDHTDataError(Exception):
     """Исключение возникает, когда не найдено данных для предоставленного ключа."""
     
@@ -29,15 +37,160 @@ class DHTPeerProfile(BaseModel):
     avaliable_port: 'PortType'     # порт.
     rsa_public_key: 'RSA_KeyType'  # Публичный ключ RSA.
 
+class _RoutingSnapshot(BaseModel):
+    """
+    Снимок таблицы маршрутизации узла, сохраняемый между запусками.
+
+    Attributes:
+        node_id (str): Идентификатор узла (hex). Постоянный идентификатор сохраняет место узла в сети,
+            поэтому таблицы маршрутизации соседей остаются верными после перезапуска.
+        bootstrap (Union[Tuple[IPAddressType, PortType], None]): Загрузочный узел сети, в которой получены контакты.
+        contacts (List[Tuple[IPAddressType, PortType]]): Адреса узлов из k-корзин, сначала недавно отвечавшие.
+    """
+    node_id: str
+    bootstrap: Union[Tuple['IPAddressType', 'PortType'], None] = None
+    contacts: List[Tuple['IPAddressType', 'PortType']] = []
+
+def _snapshot_filename(port: PortType) -> str:
+    """
+        Возвращает путь к снимку таблицы маршрутизации узла, прослушивающего заданный порт.
+
+    Args:
+        port: Порт узла.
+
+    Returns:
+        Путь к файлу снимка.
+    """
+    return os.path.join(config.PATHS.DHT_STATE, f'routing_{port}.json')
+
+def _load_routing_snapshot(port: PortType) -> Union[_RoutingSnapshot, None]:
+    """
+        Загружает снимок таблицы маршрутизации.
+
+    Args:
+        port: Порт узла.
+
+    Returns:
+        Снимок или None, если его нет или он поврежден.
+    """
+    try:
+        with open(_snapshot_filename(port), 'r', encoding='utf-8') as file:
+            return _RoutingSnapshot.parse_raw(file.read())
+    except Exception:
+        return None
+
+def _save_routing_snapshot(server: Server, port: PortType, bootstrap: Union[Tuple[IPAddressType, PortType], None]) -> None:
+    """
+        Сохраняет идентификатор узла и до MAX_CONTACTS контактов из его k-корзин.
+        Пустая таблица (например, после неудачного подключения) не перезаписывает прежний снимок.
+
+    Args:
+        server: Запущенный сервер Kademlia.
+        port: Порт узла.
+        bootstrap: Загрузочный узел текущей сети.
+    """
+    if server.protocol is None:
+        return
+    # Берем узлы из всех корзин по очереди, чтобы снимок покрывал все пространство ключей
+    buckets = [reversed(bucket.get_nodes()) for bucket in server.protocol.router.buckets]
+    contacts = [(node.ip, node.port) for nodes in itertools.zip_longest(*buckets) for node in nodes if node is not None]
+    if not contacts:
+        return
+
+    snapshot = _RoutingSnapshot(
+        node_id=server.node.id.hex(),
+        bootstrap=bootstrap,
+        contacts=contacts[:config.NETWORK.DHT_ROUTING.MAX_CONTACTS]
+    )
+    try:
+        os.makedirs(config.PATHS.DHT_STATE, exist_ok=True)
+        with open(_snapshot_filename(port), 'w', encoding='utf-8') as file:
+            file.write(snapshot.model_dump_json())
+    except OSError:
+        pass
+
+def _create_server(snapshot: Union[_RoutingSnapshot, None]) -> Server:
+    """
+        Создает сервер Kademlia с идентификатором из снимка или со случайным идентификатором.
+
+    Args:
+        snapshot: Снимок таблицы маршрутизации.
+
+    Returns:
+        Сервер Kademlia.
+    """
+    if snapshot is None:
+        return Server()
+    return Server(node_id=bytes.fromhex(snapshot.node_id))
+
+_bootstrap_tasks: Set['asyncio.Future[Any]'] = set()  # Фоновые задачи подключения: опросы узлов и поиск соседей
+
+async def _bootstrap(server: Server, addresses: Iterable[Tuple[IPAddressType, PortType]]) -> None:
+    """
+        Подключается к сети, опрашивая все известные узлы параллельно.
+
+        Подключение завершается после первого ответившего узла, поэтому недоступный загрузочный узел
+        или устаревшие контакты не задерживают его. Узлы, ответившие позже, добавляются в таблицу маршрутизации
+        по мере прихода ответов, а поиск ближайших соседей продолжается в фоне.
+
+    Args:
+        server: Запущенный сервер Kademlia.
+        addresses: Адреса известных узлов.
+    """
+    def add_contact(ping: 'asyncio.Future[Any]') -> None:
+        if not ping.cancelled() and ping.exception() is None and ping.result() is not None:
+            server.protocol.router.add_contact(ping.result())
+
+    pings = [asyncio.ensure_future(server.bootstrap_node(address)) for address in dict.fromkeys(addresses)]
+    for ping in pings:
+        ping.add_done_callback(add_contact)
+        _bootstrap_tasks.add(ping)
+        ping.add_done_callback(_bootstrap_tasks.discard)
+
+    for ping in asyncio.as_completed(pings):
+        try:
+            node = await ping
+        except Exception:
+            continue
+        if node is not None:
+            server.protocol.router.add_contact(node)
+            crawl = asyncio.ensure_future(NodeSpiderCrawl(server.protocol, server.node, [node], server.ksize, server.alpha).find())
+            _bootstrap_tasks.add(crawl)
+            crawl.add_done_callback(_bootstrap_tasks.discard)
+            return
+
+@dataclass
+class _PublishedRecord:
+    """ Собственная запись клиента, которую республикатор поддерживает в DHT. """
+    provider: Callable[[], str]                                     # Возвращает актуальные данные записи ('' - данных пока нет)
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)    # Будит республикатор раньше срока
+    data: str = ''                                                  # Последние успешно записанные данные
+    stored_at: float = 0.0                                          # Время последней успешной записи (time.monotonic)
+    force: bool = True                                              # Записать при следующей проверке, даже если данные не изменились
+    failures: int = 0                                               # Неудачных попыток записи подряд
+    task: Union['asyncio.Task[None]', None] = None                  # Задача республикатора
+
 class DHT_Client:
+    """
+        Клиент DHT.
+
+        Сервер Kademlia работает в собственном событийном цикле в отдельном потоке, поэтому запросы
+        из потоков приложения не блокируют друг друга: get_async/set_async возвращают Future сразу,
+        а get_many выполняет поиск нескольких ключей параллельно.
+
+        Таблица маршрутизации сохраняется на диск при остановке и переподключении, а при запуске клиент
+        опрашивает сохраненные контакты вместе с загрузочным узлом параллельно и готов к работе после первого ответа.
+
+        Собственные записи клиента публикуются через publish: республикатор периодически сверяет данные записи
+        с последними записанными, сразу перезаписывает изменившиеся (например, после смены IP адреса),
+        обновляет неизменные до истечения их срока в DHT и повторяет неудачные записи с растущей задержкой.
+    """
     def __init__(self, listen_port: PortType) -> None:
         """
-            Инициализирует клиент DHT.
+            Инициализирует клиент DHT и запускает поток его событийного цикла.
 
         Args:
             listen_port: Порт, который будет использоваться для прослушивания входящих соединений.
-            dht_ip: IP адрес узла для начального подключения к сети DHT.
-            dht_port: Порт узла для начального подключения к сети DHT.
         """
         self._listen_port = listen_port
         self._dht_ip: IPAddressType = ""
@@ -45,9 +198,31 @@ class DHT_Client:
 
         self.is_active = False
 
-        self._loop = asyncio.get_event_loop()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name='dht-loop', daemon=True)
+        self._thread.start()
         self._server = Server()
-        
+        self._published: Dict[str, _PublishedRecord] = {}  # Ключ -> собственная запись (используется только в потоке цикла)
+
+    def _run_loop(self) -> None:
+        """
+            Выполняет событийный цикл клиента в его потоке.
+        """
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def _submit(self, coroutine: Coroutine[Any, Any, T]) -> 'Future[T]':
+        """
+            Передает корутину в событийный цикл клиента.
+
+        Args:
+            coroutine: Корутина.
+
+        Returns:
+            Future с результатом корутины.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
     def start(self, dht_ip: IPAddressType, dht_port: PortType):
         """
             Подключается к корневой DHT-node.
@@ -55,16 +230,28 @@ class DHT_Client:
         self._dht_ip = dht_ip
         self._dht_port = dht_port
 
-        self._loop.run_until_complete(self._init_server())
+        self._submit(self._init_server()).result()
         self.is_active = True
 
     async def _init_server(self):
         """
-            Асинхронно инициализирует сервер, прослушивает порт и подключается к узлу DHT.
+            Асинхронно инициализирует сервер, прослушивает порт и подключается к сети DHT
+            через загрузочный узел и контакты, сохраненные при прошлом подключении к той же сети.
         """
-        await self._server.listen(self._listen_port)
         bootstrap_node = (self._dht_ip, self._dht_port)
-        await self._server.bootstrap([bootstrap_node])
+        snapshot = _load_routing_snapshot(self._listen_port)
+        # Сервер создается заново, чтобы восстановить сохраненный идентификатор узла
+        self._server = _create_server(snapshot)
+        await self._server.listen(self._listen_port)
+
+        contacts = snapshot.contacts if snapshot is not None and snapshot.bootstrap == bootstrap_node else []
+        await _bootstrap(self._server, [*contacts, bootstrap_node])
+
+    def _save_routing(self) -> None:
+        """
+            Сохраняет таблицу маршрутизации текущей сети.
+        """
+        _save_routing_snapshot(self._server, self._listen_port, (self._dht_ip, self._dht_port))
 
     def set_data(self, key: str, data: str) -> None:
         """
@@ -74,7 +261,20 @@ class DHT_Client:
             key: Ключ для данных.
             data: Данные для сохранения.
         """
-        self._loop.run_until_complete(self._set_data(key, data))
+        self.set_async(key, data).result()
+
+    def set_async(self, key: str, data: str) -> 'Future[None]':
+        """
+            Начинает запись данных в DHT, не дожидаясь ее завершения.
+
+        Args:
+            key: Ключ для данных.
+            data: Данные для сохранения.
+
+        Returns:
+            Future, завершающийся после записи.
+        """
+        return self._submit(self._set_data(key, data))
     
     async def _set_data(self, key: str, data: str) -> None:
         """
@@ -89,6 +289,106 @@ class DHT_Client:
         except RuntimeError:
             pass
 
+    def publish(self, key: str, provider: Callable[[], str]) -> None:
+        """
+            Начинает поддерживать собственную запись в DHT. Повторный вызов для того же ключа заменяет источник данных
+            и сразу сверяет запись: неизменные данные повторно не записываются.
+
+        Args:
+            key: Ключ записи.
+            provider: Возвращает актуальные данные записи. Вызывается в пуле потоков цикла при каждой проверке,
+                поэтому может выполнять блокирующие операции (например, определение IP адреса).
+        """
+        self._loop.call_soon_threadsafe(self._publish, key, provider)
+
+    def unpublish(self, key: str) -> None:
+        """
+            Прекращает поддерживать собственную запись. Уже записанные данные удаляются из DHT по истечении их срока.
+
+        Args:
+            key: Ключ записи.
+        """
+        self._loop.call_soon_threadsafe(self._unpublish, key)
+
+    def _publish(self, key: str, provider: Callable[[], str]) -> None:
+        """
+            Регистрирует запись или обновляет ее источник данных и будит республикатор.
+
+        Args:
+            key: Ключ записи.
+            provider: Источник данных записи.
+        """
+        record = self._published.get(key)
+        if record is None:
+            record = self._published[key] = _PublishedRecord(provider=provider)
+            record.task = self._loop.create_task(self._republish(key, record))
+        else:
+            record.provider = provider
+            record.failures = 0
+            record.wakeup.set()
+
+    def _unpublish(self, key: str) -> None:
+        """
+            Останавливает республикатор записи.
+
+        Args:
+            key: Ключ записи.
+        """
+        record = self._published.pop(key, None)
+        if record is not None and record.task is not None:
+            record.task.cancel()
+
+    def _republish_all(self) -> None:
+        """
+            Требует перезаписать все собственные записи и будит республикаторы,
+            например, после подключения к новой сети, где этих записей еще нет.
+        """
+        for record in self._published.values():
+            record.force = True
+            record.failures = 0
+            record.wakeup.set()
+
+    async def _republish(self, key: str, record: _PublishedRecord) -> None:
+        """
+            Поддерживает собственную запись в DHT, пока ее не отменят.
+
+            Каждые CHECK_INTERVAL секунд получает актуальные данные и записывает их, если они изменились,
+            с последней успешной записи прошло INTERVAL секунд или запись требуют принудительно (force).
+            После неудачи следующая попытка выполняется через MIN_BACKOFF секунд, и задержка удваивается до MAX_BACKOFF.
+            Пустые данные (например, IP адрес еще не определен) тоже считаются неудачей.
+
+        Args:
+            key: Ключ записи.
+            record: Состояние записи.
+        """
+        settings = config.NETWORK.DHT_REPUBLISH
+        while True:
+            record.wakeup.clear()
+            try:
+                data = await self._loop.run_in_executor(None, record.provider)
+                is_stored = bool(data)
+                if is_stored and (record.force or data != record.data or time.monotonic() - record.stored_at >= settings.INTERVAL):
+                    # Сервер возвращает False, если ни один узел DHT не сохранил запись
+                    is_stored = await self._server.set(key, data)
+                    if is_stored:
+                        record.data = data
+                        record.stored_at = time.monotonic()
+                        record.force = False
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                is_stored = False
+            record.failures = 0 if is_stored else record.failures + 1
+
+            if record.failures:
+                delay = min(settings.MAX_BACKOFF, settings.MIN_BACKOFF * 2 ** (record.failures - 1))
+            else:
+                delay = settings.CHECK_INTERVAL
+            try:
+                await asyncio.wait_for(record.wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
     def get_data(self, key: str) -> str:
         """
             Возвращает данные из DHT по заданному ключу.
@@ -102,7 +402,44 @@ class DHT_Client:
         Raises:
             EmptyDataFromDHT: Если данные по ключу отсутствуют или пусты.
         """
-        return self._loop.run_until_complete(self._get_data(key))
+        return self.get_async(key).result()
+
+    def get_async(self, key: str) -> 'Future[str]':
+        """
+            Начинает поиск данных в DHT, не дожидаясь его завершения.
+
+        Args:
+            key: Ключ для извлечения данных.
+
+        Returns:
+            Future со строкой данных. Если данные по ключу отсутствуют, Future завершается с EmptyDHTDataError.
+        """
+        return self._submit(self._get_data(key))
+
+    def get_many(self, keys: Iterable[str]) -> 'Future[Dict[str, str]]':
+        """
+            Начинает параллельный поиск данных для нескольких ключей.
+
+        Args:
+            keys: Ключи для извлечения данных.
+
+        Returns:
+            Future со словарем ключ -> данные. Ключи, для которых данные не найдены, в словарь не попадают.
+        """
+        return self._submit(self._get_many(list(keys)))
+
+    async def _get_many(self, keys: List[str]) -> Dict[str, str]:
+        """
+            Асинхронно и параллельно извлекает данные для нескольких ключей.
+
+        Args:
+            keys: Ключи для извлечения данных.
+
+        Returns:
+            Словарь ключ -> данные для найденных ключей.
+        """
+        results = await asyncio.gather(*(self._get_data(key) for key in keys), return_exceptions=True)
+        return {key: data for key, data in zip(keys, results) if isinstance(data, str) and data}
     
     async def _get_data(self, key: str) -> str:
         """
@@ -147,11 +484,12 @@ class DHT_Client:
             new_ip: Новый IP-адрес узла начальной загрузки.
             new_port: Новый порт узла начальной загрузки.
         """
-        self._loop.run_until_complete(self._reconnect(new_ip, new_port))
+        self._submit(self._reconnect(new_ip, new_port)).result()
 
     async def _reconnect(self, new_ip: str, new_port: int) -> None:
         try:
             # Отключите существующий узел начальной загрузки
+            self._save_routing()
             self._server.stop()
             # Установите новый IP-адрес и порт
             self._dht_ip = new_ip
@@ -159,18 +497,30 @@ class DHT_Client:
             await asyncio.sleep(1)  # Пауза для корректного завершения предыдущих операций
             # Подключиться к новому узлу начальной загрузки
             await self._init_server()
+            self._republish_all()
         except Exception as e:
             print(f"Failed to reconnect: {e}")
 
+    async def _stop_server(self) -> None:
+        """
+            Асинхронно останавливает республикаторы и сервер и дает завершиться их операциям.
+        """
+        for key in list(self._published):
+            self._unpublish(key)
+        self._save_routing()
+        for task in [task for task in _bootstrap_tasks if task.get_loop() is self._loop]:
+            task.cancel()
+        self._server.stop()
+        await asyncio.sleep(1)
+
     def stop(self):
         """
-            Останавливает сервер и закрывает событийный цикл.
+            Останавливает сервер, событийный цикл и его поток.
         """
         try:
-            self._server.stop()
-            self._loop.run_until_complete(asyncio.sleep(1))
-            if self._loop.is_running():
-                self._loop.stop()
+            self._submit(self._stop_server()).result()
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
             self._loop.close()
         except Exception:
             pass
@@ -186,7 +536,8 @@ class KademliaServer:
             port: Порт, на котором сервер будет слушать входящие соединения.
         """
         self._port = port
-        self._server = Server()
+        self._snapshot = _load_routing_snapshot(port)
+        self._server = _create_server(self._snapshot)
         self._loop = asyncio.get_event_loop()
         self._configure_logging()
 
@@ -200,15 +551,19 @@ class KademliaServer:
     async def _start(self) -> None:
         """
             Асинхронный запуск сервера и прослушивание на заданном порту.
+            Если сохранены контакты с прошлого запуска, узел сразу заново заполняет по ним таблицу маршрутизации.
         """
         await self._server.listen(self._port)
+        if self._snapshot is not None and self._snapshot.contacts:
+            await _bootstrap(self._server, self._snapshot.contacts)
         self._logger.debug("Server started")
         self._loop.set_debug(True)
 
     def _stop(self) -> None:
         """
-            Остановка сервера и логгирование этого события.
+            Сохранение таблицы маршрутизации, остановка сервера и логгирование этого события.
         """
+        _save_routing_snapshot(self._server, self._port, None)
         self._server.stop()
         self._logger.debug("Server stopped")
 
@@ -0,0 +1,349 @@
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import Logger
+import socket
+import threading
+from typing import Any, Callable, Coroutine, Tuple, Union
+
+from config import config, IPAddressType, PortType
+from dht import DHTPeerProfile
+from libs.cryptography import RSA_KeyType
+from libs.network import ClientManager, NetworkEvent, UserSession
+from libs.scheduler import Scheduler
+
+class AsyncNetworkEngine:
+    """
+        Общий для всех сессий цикл событий asyncio.
+
+        Сетевой ввод-вывод всех сессий выполняется в одном потоке цикла событий.
+        Обработка кадров (подпись, шифрование, работа с БД) выполняется в небольшом пуле потоков,
+        длительные задачи сессий (синхронизация, передача файлов) - в отдельном пуле,
+        чтобы они не занимали потоки обработки кадров.
+    """
+    def __init__(self, logger: Logger,
+                 frame_workers: int = config.NETWORK.ASYNCIO.FRAME_WORKERS,
+                 background_workers: int = config.NETWORK.ASYNCIO.BACKGROUND_WORKERS) -> None:
+        """
+            Создает цикл событий и запускает его в отдельном потоке.
+
+        Args:
+            logger (Logger): Логгер.
+            frame_workers (int): Количество потоков обработки кадров.
+            background_workers (int): Количество потоков для длительных задач сессий.
+        """
+        self._logger: Logger = logger
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self.frame_executor: ThreadPoolExecutor = ThreadPoolExecutor(frame_workers, thread_name_prefix='network-frames')
+        self.background_executor: ThreadPoolExecutor = ThreadPoolExecutor(background_workers, thread_name_prefix='network-background')
+
+        self._thread: threading.Thread = threading.Thread(target=self._run_loop, name='network-loop', daemon=True)
+        self._thread.start()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def in_loop_thread(self) -> bool:
+        """
+            Проверяет, выполняется ли код в потоке цикла событий.
+
+        Returns:
+            bool: True - если вызов сделан из потока цикла событий.
+        """
+        return threading.current_thread() is self._thread
+
+    def run(self, coroutine: Coroutine[Any, Any, Any]) -> Any:
+        """
+            Выполняет корутину в цикле событий и дожидается результата.
+
+        Args:
+            coroutine (Coroutine): Корутина.
+
+        Returns:
+            Any: Результат корутины.
+
+        Raises:
+            RuntimeError: Если вызван из потока цикла событий (это привело бы к взаимной блокировке).
+        """
+        if self.in_loop_thread():
+            coroutine.close()
+            raise RuntimeError('Нельзя ожидать корутину из потока цикла событий.')
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    def call_soon(self, callback: Callable[..., Any], *args: Any) -> None:
+        """
+            Потокобезопасно планирует вызов функции в цикле событий.
+
+        Args:
+            callback (Callable[..., Any]): Функция.
+            *args: Аргументы функции.
+        """
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def submit_background(self, target: Callable[..., None], *args: Any) -> 'Future[None]':
+        """
+            Запускает длительную задачу в пуле фоновых потоков.
+
+        Args:
+            target (Callable[..., None]): Функция задачи.
+            *args: Аргументы функции.
+
+        Returns:
+            Future[None]: Результат выполнения задачи.
+        """
+        future: 'Future[None]' = self.background_executor.submit(target, *args)
+        future.add_done_callback(self._log_background_error)
+        return future
+
+    async def _cancel_tasks(self) -> None:
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _log_background_error(self, future: 'Future[None]') -> None:
+        if not future.cancelled() and future.exception() is not None:
+            self._logger.error(f'Ошибка в фоновой задаче сессии [{future.exception()}].')
+
+    def stop(self) -> None:
+        """
+            Завершает задачи сессий, останавливает цикл событий и пулы потоков.
+        """
+        if not self.in_loop_thread():
+            asyncio.run_coroutine_threadsafe(self._cancel_tasks(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.frame_executor.shutdown(wait=False)
+        self.background_executor.shutdown(wait=False)
+
+class AsyncUserSession(UserSession):
+    """
+        Сессия пользователя поверх asyncio.
+
+        Протокол полностью совпадает с UserSession: переопределены только транспорт (StreamReader/StreamWriter),
+        и запуск фоновых задач (пул потоков движка). Таймеры сессии работают на общем планировщике ClientManager.
+        Кадры одной сессии обрабатываются строго последовательно.
+    """
+    def __init__(self, engine: AsyncNetworkEngine, remote_address: Tuple[IPAddressType, PortType],
+                 user_id_hash: str, user_name: str, user_password: str, peer_rsa_public_key: RSA_KeyType,
+                 logger: Logger, event: NetworkEvent, scheduler: Scheduler, on_closed: Callable[[int], None],
+                 reader: Union[asyncio.StreamReader, None] = None, writer: Union[asyncio.StreamWriter, None] = None) -> None:
+        """
+            Инициализирует новую сессию пользователя.
+
+        Args:
+            engine (AsyncNetworkEngine): Цикл событий, в котором работает сессия.
+            remote_address (Tuple[IPAddressType, PortType]): IP-адрес и порт собеседника.
+            user_id_hash (str): Идентификатор пользователя.
+            user_name (str): Имя пользователя.
+            user_password (str): Пароль пользователя.
+            peer_rsa_public_key (RSA_KeyType): Публичный ключ собеседника (пустой для входящих подключений).
+            logger (Logger): Логгер для записи событий сессии.
+            event (NetworkEvent): Сетевое событие, связанное с сессией.
+            scheduler (Scheduler): Общий для всех сессий планировщик таймеров.
+            on_closed (Callable[[int], None]): Вызывается с идентификатором сессии после ее закрытия.
+            reader (asyncio.StreamReader): Поток чтения (для входящих подключений).
+            writer (asyncio.StreamWriter): Поток записи (для входящих подключений).
+        """
+        super().__init__(None, remote_address, user_id_hash, user_name, user_password, # type: ignore
+                         peer_rsa_public_key, logger, event, scheduler)
+        self._engine: AsyncNetworkEngine = engine
+        self._reader: Union[asyncio.StreamReader, None] = reader
+        self._writer: Union[asyncio.StreamWriter, None] = writer
+        self._on_closed: Callable[[int], None] = on_closed
+
+    def start(self) -> None:
+        """
+            Запускает чтение кадров в цикле событий.
+        """
+        self._engine.call_soon(self._engine.loop.create_task, self._read_frames())
+
+    def connect(self) -> int:
+        """
+            Устанавливает соединение с удалённым клиентом и отправляет инициализационное сообщение.
+
+        Returns:
+            int: Идентификатор сессии при успешном соединении, -1 при ошибке.
+        """
+        return self._engine.run(self._connect())
+
+    async def _connect(self) -> int:
+        self._logger.debug(f"Устанавливаю соединение с клиентом [{self._remote_address}].")
+        try:
+            self._reader, self._writer = await asyncio.open_connection(*self._remote_address)
+            self._engine.loop.create_task(self._read_frames())
+            await self._engine.loop.run_in_executor(self._engine.frame_executor, self._send_init)
+            return self._session_id
+        except OSError:
+            self._logger.debug(f'Произошло закрытие сокета. Завершаю сессию.')
+            return -1
+
+    async def _read_frames(self) -> None:
+        """
+            Читает кадры из потока и последовательно передает их на обработку в пул потоков.
+        """
+        if self._reader is None:
+            return
+
+        loop = asyncio.get_running_loop()
+        try:
+            while self._is_active:
+                raw_data_size: bytes = await asyncio.wait_for(
+                    self._reader.readexactly(self._int_size_for_message_length), config.NETWORK.PING.TIMEOUT)
+                data_size: int = int.from_bytes(raw_data_size, byteorder='big')
+                data: bytes = await asyncio.wait_for(self._reader.readexactly(data_size), config.NETWORK.PING.TIMEOUT)
+
+                if data:
+                    await loop.run_in_executor(self._engine.frame_executor, self._handle_frame, data)
+
+        except asyncio.TimeoutError:
+            self._logger.debug(f"Клиент не отвечает, закрываю соединение с [{self._remote_address}]"
+                               f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+        except (asyncio.IncompleteReadError, OSError):
+            self._logger.debug(f'Произошло закрытие сокета. Завершаю сессию.')
+        finally:
+            # Закрытие сессии сохраняет данные в БД, поэтому выполняется вне цикла событий
+            await loop.run_in_executor(self._engine.frame_executor, self._finish)
+
+    def _finish(self) -> None:
+        """
+            Закрывает сессию после завершения чтения и приостанавливает прием файлов.
+        """
+        self.close()
+        self._suspend_incoming_files()
+
+    def _write_frame(self, seal: Callable[[], bytes]) -> None:
+        """
+            Собирает кадр и записывает его в поток, затем ждет, пока буфер записи освободится.
+
+            Кадр собирается и записывается в цикле событий без ожидания между этими шагами,
+            поэтому номера кадров AEAD идут в порядке записи. Ожидание дает естественное ограничение
+            скорости для отправителей (например, при передаче файла).
+
+        Args:
+            seal (Callable[[], bytes]): Возвращает кадр вместе с префиксом длины.
+        """
+        if self._writer is None:
+            raise ConnectionResetError('Соединение не установлено.')
+
+        if self._engine.in_loop_thread():
+            self._writer.write(seal())
+            return
+        asyncio.run_coroutine_threadsafe(self._write_frame_async(seal), self._engine.loop).result()
+
+    async def _write_frame_async(self, seal: Callable[[], bytes]) -> None:
+        if self._writer is None or self._writer.is_closing():
+            raise ConnectionResetError('Соединение закрыто.')
+        self._writer.write(seal())
+        await self._writer.drain()
+
+    def _clear_socket_buffer(self) -> None:
+        """
+            Кадры читаются целиком по префиксу длины, поэтому после ошибки разбора поток не требует очистки.
+        """
+        pass
+
+    def _close_transport(self) -> None:
+        self._engine.call_soon(self._close_writer)
+
+    def _close_writer(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+
+    def _wait_handler_finished(self) -> None:
+        """
+            Чтение кадров завершится само после закрытия потока записи, ждать его не нужно.
+        """
+        pass
+
+    def _notify_closed(self) -> None:
+        self._on_closed(self._session_id)
+
+    def _run_background(self, target: Callable[..., None], *args: Any) -> None:
+        self._engine.submit_background(target, *args)
+
+class AsyncClientManager(ClientManager):
+    """
+        Менеджер клиентов, в котором все сессии работают в одном цикле событий asyncio.
+
+        Контракт с UI (NetworkEvent) такой же, как у ClientManager.
+    """
+    def __init__(self, logger: Logger, port: PortType = config.NETWORK.CLIENT_COMMUNICATION_PORT) -> None:
+        self._engine: AsyncNetworkEngine = AsyncNetworkEngine(logger)
+        self._server: Union[asyncio.AbstractServer, None] = None
+        super().__init__(logger, port)
+
+    def _start_session_cleanup(self) -> None:
+        """
+            Сессии сами сообщают о своем закрытии через on_closed, отдельный поток не нужен.
+        """
+        pass
+
+    def _forget_session(self, session_id: int) -> None:
+        self._sessions.pop(session_id, None)
+
+    def _create_session(self, remote_address: Tuple[IPAddressType, PortType], peer_rsa_public_key: RSA_KeyType, # type: ignore
+                        reader: Union[asyncio.StreamReader, None] = None,
+                        writer: Union[asyncio.StreamWriter, None] = None) -> AsyncUserSession:
+        session = AsyncUserSession(
+            engine=self._engine,
+            remote_address=remote_address,
+            user_id_hash=self._client_info.user_id_hash,
+            user_name=self._client_info.user_name,
+            user_password=self._client_info.user_password,
+            peer_rsa_public_key=peer_rsa_public_key,
+            logger=self._logger,
+            event=self.event,
+            scheduler=self._scheduler,
+            on_closed=self._forget_session,
+            reader=reader,
+            writer=writer
+        )
+        self._sessions[session.get_id()] = session
+        return session
+
+    def setup_listener(self, port: PortType = config.NETWORK.CLIENT_COMMUNICATION_PORT) -> None:
+        """
+            Настройка и запуск прослушивающего сервера в цикле событий.
+        """
+        self._engine.run(self._setup_listener(port))
+
+    async def _setup_listener(self, port: PortType) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+        self._server = await asyncio.start_server(self._accept_connection_async, host=None, port=port, family=socket.AF_INET)
+        self._listen_communication_port = port
+        self._logger.debug(f"Начинаю прослушивать порт [{port}].")
+
+    async def _accept_connection_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+            Обработка входящего подключения.
+        """
+        addr: Tuple[IPAddressType, PortType] = writer.get_extra_info('peername')[:2]
+        self._logger.debug(f'Создаю новую сессию с [{addr}].')
+        # Создание сессии загружает ключи с диска, поэтому выполняется вне цикла событий
+        session: AsyncUserSession = await asyncio.get_running_loop().run_in_executor(
+            self._engine.frame_executor, lambda: self._create_session(addr, '', reader=reader, writer=writer))
+        session.start()
+
+    def connect(self, peer_info: DHTPeerProfile) -> int:
+        """
+            Создает новую сессию для взаимодействия с пиром.
+        """
+        self._logger.debug(f'Создаю новую сессию с [{(peer_info.avaliable_ip, peer_info.avaliable_port)}].')
+        return self._create_session((peer_info.avaliable_ip, peer_info.avaliable_port), peer_info.rsa_public_key).connect()
+
+    def close(self) -> None:
+        """
+            Закрывает все активные сессии, прослушивающий сервер и цикл событий.
+        """
+        super().close()
+        if self._server is not None:
+            self._engine.run(self._close_server())
+        self._engine.stop()
+
+    async def _close_server(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
@@ -1,7 +1,11 @@
 from base64 import b64encode, b64decode
 import binascii
+from collections import OrderedDict
+import hashlib
 import random
 import string
+import struct
+import threading
 from typing import Union
 from Crypto.Cipher import AES, PKCS1_OAEP
 from Crypto.Protocol.KDF import HKDF
@@ -55,6 +59,15 @@ class RSAKeyLoadingError(FileNotFoundError):
 
 
 class Encrypter:
+    _RSA_KEY_CACHE_SIZE: int = 256  # Сколько импортированных публичных RSA ключей держать в кэше
+    _rsa_key_cache: 'OrderedDict[str, RSA.RsaKey]' = OrderedDict()  # LRU кэш: отпечаток PEM -> ключ
+    _rsa_key_cache_lock: threading.Lock = threading.Lock()
+
+    # Контексты HKDF для ключей AEAD: у каждого направления свой ключ, поэтому отраженный назад кадр не проходит проверку
+    _SESSION_KEY_CONTEXT_INITIATOR: bytes = b'p2p-chat session aead initiator->responder'
+    _SESSION_KEY_CONTEXT_RESPONDER: bytes = b'p2p-chat session aead responder->initiator'
+    _AEAD_NONCE: struct.Struct = struct.Struct('!4xQ')  # Nonce AES-GCM (96 бит): 4 нулевых байта и номер кадра направления
+
     def __init__(self, keys_path: PathType, user_id_hash: UserIdType, user_password: str) -> None:
         """
             Инициализирует объект Encrypter, загружает необходимые ключи.
@@ -66,6 +79,10 @@ class Encrypter:
         self._private_key: ECC.EccKey
         self._public_key: ECC.EccKey
         self._secret_key: bytes = b''
+        self._send_key: bytes = b''     # Ключ AES-GCM для наших кадров после рукопожатия
+        self._recv_key: bytes = b''     # Ключ AES-GCM для кадров собеседника после рукопожатия
+        self._send_counter: int = 0     # Номер следующего нашего кадра AEAD
+        self._recv_counter: int = -1    # Номер последнего принятого кадра AEAD собеседника
         self._rsa_public_key: RSA.RsaKey
         self._rsa_private_key: RSA.RsaKey
 
@@ -89,12 +106,13 @@ class Encrypter:
         self._private_key = ECC.generate(curve='P-256')
         self._public_key = self._private_key.public_key()
 
-    def calculate_dh_secret(self, peer_pub_key: PEM_FormatData) -> None:
+    def calculate_dh_secret(self, peer_pub_key: PEM_FormatData, is_initiator: bool) -> None:
         """
             Вычисляет общий секрет, используя публичный ключ другой стороны.
 
         Args:
             peer_pub_key: Публичный ключ другой стороны в формате PEM.
+            is_initiator: Мы начали соединение (отправили INIT). Определяет, каким из ключей направлений мы шифруем.
         """
         _peer_pub_key: ECC.EccKey = ECC.import_key(peer_pub_key)
         # Вычисляем общий секрет, умножая публичный ключ другой стороны на наш приватный ключ
@@ -103,6 +121,12 @@ class Encrypter:
         shared_secret_bytes = shared_secret_point.x.to_bytes(32, 'big')  # Для P-256 размер 32 байта
         # Использование HKDF для получения ключа фиксированного размера из общего секрета
         self._secret_key = HKDF(shared_secret_bytes, 16, b"", SHA256) # type: ignore
+        # Отдельные ключи для AEAD, чтобы не использовать один ключ в двух режимах шифрования
+        initiator_key: bytes = HKDF(shared_secret_bytes, 32, b"", SHA256, context=self._SESSION_KEY_CONTEXT_INITIATOR) # type: ignore
+        responder_key: bytes = HKDF(shared_secret_bytes, 32, b"", SHA256, context=self._SESSION_KEY_CONTEXT_RESPONDER) # type: ignore
+        self._send_key, self._recv_key = (initiator_key, responder_key) if is_initiator else (responder_key, initiator_key)
+        self._send_counter = 0
+        self._recv_counter = -1
 
     @staticmethod
     def encode_to_b64(message: Union[str, bytes]) -> B64_FormatData:
@@ -158,8 +182,20 @@ class Encrypter:
         Returns:
             Кортеж, содержащий зашифрованный текст и IV в base64.
         """
+        return self.encrypt_bytes(message.encode())
+
+    def encrypt_bytes(self, data: bytes) -> EncryptedData:
+        """
+            Шифрует произвольные байты (например, блок файла) и возвращает зашифрованный текст и IV в base64.
+
+        Args:
+            data: Байты для шифрования.
+
+        Returns:
+            Зашифрованные данные и IV в base64.
+        """
         cipher = AES.new(self._secret_key, AES.MODE_CBC)
-        ct_bytes = cipher.encrypt(pad(message.encode(), AES.block_size))
+        ct_bytes = cipher.encrypt(pad(data, AES.block_size))
         iv = cipher.iv
 
         # Кодирование зашифрованных данных и IV в base64 для передачи в JSON
@@ -175,12 +211,76 @@ class Encrypter:
         Returns:
             Расшифрованное сообщение.
         """
+        return self.decrypt_bytes(data).decode()
+
+    def decrypt_bytes(self, data: EncryptedData) -> bytes:
+        """
+            Расшифровывает данные, закодированные в base64, и IV, не преобразуя результат в строку.
+
+        Args:
+            data: Зашифрованные данные в base64
+
+        Returns:
+            Расшифрованные байты.
+        """
         iv = self.decode_from_b64(data.iv_b64)
         ct_bytes = self.decode_from_b64(data.data_b64)
         cipher = AES.new(self._secret_key, AES.MODE_CBC, iv)
-        pt = unpad(cipher.decrypt(ct_bytes), AES.block_size)
-        return pt.decode()
+        return unpad(cipher.decrypt(ct_bytes), AES.block_size)
     
+    def encrypt_aead(self, data: bytes, associated_data: bytes = b'') -> EncryptedData:
+        """
+            Шифрует данные в режиме AES-GCM на ключе нашего направления.
+
+            Тег аутентификации дописывается в конец шифротекста, поэтому отдельная подпись сообщения не нужна.
+            Nonce содержит номер кадра, который собеседник проверяет на строгое возрастание, поэтому вызовы
+            должны выполняться в том же порядке, в котором кадры записываются в соединение.
+
+        Args:
+            data: Байты для шифрования.
+            associated_data: Данные, которые не шифруются, но защищаются тегом (например, тип команды).
+
+        Returns:
+            Шифротекст с тегом и nonce в base64.
+        """
+        nonce: bytes = self._AEAD_NONCE.pack(self._send_counter)
+        self._send_counter += 1
+        cipher = AES.new(self._send_key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated_data)
+        ct_bytes, tag = cipher.encrypt_and_digest(data)
+        return EncryptedData(data_b64=Encrypter.encode_to_b64(ct_bytes + tag), iv_b64=Encrypter.encode_to_b64(cipher.nonce))
+
+    def decrypt_aead(self, data: EncryptedData, associated_data: bytes = b'') -> bytes:
+        """
+            Расшифровывает данные AES-GCM на ключе собеседника, проверяет тег аутентификации
+            и то, что номер кадра больше номера последнего принятого (защита от повтора старых кадров).
+
+        Args:
+            data: Шифротекст с тегом и nonce в base64.
+            associated_data: Данные, которые были защищены тегом при шифровании.
+
+        Returns:
+            Расшифрованные байты.
+
+        Raises:
+            ValueError: Если тег не совпал (данные подделаны, повреждены или отражены назад) или кадр повторный.
+        """
+        nonce = self.decode_from_b64(data.iv_b64)
+        ct_bytes = self.decode_from_b64(data.data_b64)
+        if len(nonce) != self._AEAD_NONCE.size or nonce[:4] != bytes(4) or len(ct_bytes) < AES.block_size:
+            raise ValueError('Неверный формат данных AEAD.')
+
+        (counter,) = self._AEAD_NONCE.unpack(nonce)
+        if counter <= self._recv_counter:
+            raise ValueError(f'Повторный кадр AEAD [{counter}], последний принятый [{self._recv_counter}].')
+
+        cipher = AES.new(self._recv_key, AES.MODE_GCM, nonce=nonce)
+        cipher.update(associated_data)
+        plaintext: bytes = cipher.decrypt_and_verify(ct_bytes[:-AES.block_size], ct_bytes[-AES.block_size:])
+        # Номер сдвигается только после проверки тега, иначе поддельный кадр с большим номером заблокировал бы настоящие
+        self._recv_counter = counter
+        return plaintext
+
     @staticmethod
     def encrypt_with_aes(key: bytes, data: str) -> bytes:
         """
@@ -246,7 +346,7 @@ class Encrypter:
         Returns:
             B64_FormatData: Шифрованные данные.
         """
-        _rsa_public_key = RSA.import_key(rsa_public_key.encode()) if rsa_public_key else self._rsa_public_key
+        _rsa_public_key = Encrypter.import_rsa_public_key(rsa_public_key) if rsa_public_key else self._rsa_public_key
         cipher = PKCS1_OAEP.new(_rsa_public_key, hashAlgo=SHA256)
         encrypted_message = cipher.encrypt(message.encode())
         return Encrypter.encode_to_b64(encrypted_message)
@@ -279,22 +379,67 @@ class Encrypter:
         signature = pkcs1_15.new(self._rsa_private_key).sign(h)
         return Encrypter.encode_to_b64(signature)
 
-    def verify_signature(self, public_key: RSA_KeyType, encrypted_message: B64_FormatData, signature: B64_FormatData) -> bool:
+    @staticmethod
+    def import_rsa_public_key(public_key: RSA_KeyType) -> RSA.RsaKey:
+        """
+            Импортирует публичный RSA ключ из PEM, используя LRU кэш уже импортированных ключей.
+
+            Разбор PEM - дорогая операция, а ключи собеседников повторяются постоянно,
+            поэтому ключ кэшируется по отпечатку (SHA-256) его PEM представления.
+
+        Args:
+            public_key (RSA_KeyType): Публичный ключ в формате PEM.
+
+        Returns:
+            RSA.RsaKey: Импортированный ключ.
+
+        Raises:
+            ValueError: Если ключ имеет неверный формат.
+        """
+        fingerprint: str = hashlib.sha256(public_key.encode()).hexdigest()
+        with Encrypter._rsa_key_cache_lock:
+            key = Encrypter._rsa_key_cache.get(fingerprint)
+            if key is not None:
+                Encrypter._rsa_key_cache.move_to_end(fingerprint)
+                return key
+
+        key = RSA.import_key(public_key.encode())
+        with Encrypter._rsa_key_cache_lock:
+            Encrypter._rsa_key_cache[fingerprint] = key
+            if len(Encrypter._rsa_key_cache) > Encrypter._RSA_KEY_CACHE_SIZE:
+                Encrypter._rsa_key_cache.popitem(last=False)
+        return key
+
+    @staticmethod
+    def create_signature_verifier(public_key: RSA_KeyType) -> pkcs1_15.PKCS115_SigScheme:
+        """
+            Создает объект проверки подписи для публичного ключа, который можно переиспользовать для всех сообщений собеседника.
+
+        Args:
+            public_key (RSA_KeyType): Публичный ключ в формате PEM.
+
+        Returns:
+            pkcs1_15.PKCS115_SigScheme: Объект проверки подписи.
+        """
+        return pkcs1_15.new(Encrypter.import_rsa_public_key(public_key))
+
+    def verify_signature(self, public_key: Union[RSA_KeyType, pkcs1_15.PKCS115_SigScheme],
+                         encrypted_message: B64_FormatData, signature: B64_FormatData) -> bool:
         """
             Проверяет подпись сообщения, используя публичный RSA ключ отправителя.
 
         Args:
-            public_key: Публичный ключ отправителя.
+            public_key: Публичный ключ отправителя в формате PEM или уже созданный объект проверки подписи.
             encrypted_message: Зашифрованное сообщение.
             signature: Подпись для проверки.
 
         Returns:
             True, если подпись верифицирована, иначе False.
         """
-        key = RSA.import_key(public_key.encode())
+        verifier = Encrypter.create_signature_verifier(public_key) if isinstance(public_key, str) else public_key
         h = SHA256.new(self.decode_from_b64(encrypted_message))
         try:
-            pkcs1_15.new(key).verify(h, self.decode_from_b64(signature))
+            verifier.verify(h, self.decode_from_b64(signature))
             return True
         except (ValueError, TypeError):
             return False
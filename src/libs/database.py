@@ -1,8 +1,14 @@
+from concurrent.futures import Future
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
 import json
 from logging import Logger
 import os
 import sqlite3
-from typing import Dict, List, Tuple
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Tuple, Union
 
 from config import UserIdHashType, UserIdType, config
 from libs.cryptography import Encrypter
@@ -10,8 +16,318 @@ from libs.message import MessageIdType, MessageTextData
 from libs.structs import ClientInfo, DHTNodeHistory
 from libs.utils import strip_bad_symbols
 
+class DatabaseConnectionPool:
+    """
+        Потокобезопасный пул постоянных соединений с файлом базы данных SQLite.
+
+        Соединения открываются один раз и переиспользуются, поэтому при каждом запросе не тратится время
+        на открытие файла и разбор схемы, а подготовленные выражения остаются в кэше соединения.
+        База переводится в режим WAL, поэтому запись не блокирует чтение, а фиксация транзакции
+        сводится к дописыванию в журнал с уровнем синхронизации из config.DATABASE.SYNCHRONOUS.
+    """
+    _pools: Dict[str, 'DatabaseConnectionPool'] = {}
+    _pools_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, db_path: str) -> None:
+        """
+            Создает пул соединений для файла базы данных.
+
+        Args:
+            db_path (str): Путь к файлу базы данных.
+        """
+        self._db_path: str = db_path
+        self._idle_connections: List[sqlite3.Connection] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    @classmethod
+    def get(cls, db_path: str) -> 'DatabaseConnectionPool':
+        """
+            Возвращает общий пул для файла базы данных, создавая его при первом обращении.
+
+        Args:
+            db_path (str): Путь к файлу базы данных.
+
+        Returns:
+            DatabaseConnectionPool: Пул соединений.
+        """
+        with cls._pools_lock:
+            pool = cls._pools.get(db_path)
+            if pool is None:
+                pool = cls._pools[db_path] = cls(db_path)
+            return pool
+
+    @classmethod
+    def close_all(cls) -> None:
+        """ Закрывает все свободные соединения всех пулов. """
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+        for pool in pools:
+            pool.close()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+            Выдает соединение из пула на время выполнения блока.
+
+            При успешном выходе из блока транзакция фиксируется, при исключении - откатывается.
+            После этого соединение возвращается в пул.
+
+        Yields:
+            sqlite3.Connection: Соединение с базой данных.
+
+        Raises:
+            sqlite3.Error: Если не удалось открыть соединение или выполнить запрос.
+        """
+        with self._lock:
+            conn = self._idle_connections.pop() if self._idle_connections else None
+        if conn is None:
+            conn = self._open_connection()
+
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            with self._lock:
+                if len(self._idle_connections) < config.DATABASE.POOL_SIZE:
+                    self._idle_connections.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self) -> None:
+        """ Закрывает свободные соединения пула. Занятые соединения закроются при возврате, если пул переполнен. """
+        with self._lock:
+            connections, self._idle_connections = self._idle_connections, []
+        for conn in connections:
+            conn.close()
+
+    def _open_connection(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self._db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(
+            self._db_path,
+            timeout=config.DATABASE.BUSY_TIMEOUT,
+            check_same_thread=False,
+            cached_statements=config.DATABASE.STATEMENT_CACHE_SIZE
+        )
+        conn.execute(f'PRAGMA journal_mode={config.DATABASE.JOURNAL_MODE}')
+        conn.execute(f'PRAGMA synchronous={config.DATABASE.SYNCHRONOUS}')
+        return conn
+
+class WriteQueueStats(NamedTuple):
+    """ Состояние очереди отложенной записи. """
+    queue_depth: int            # Сколько строк ожидает записи
+    flushed_rows: int           # Сколько строк записано за все время
+    flushes: int                # Сколько транзакций выполнено
+    last_flush_latency: float   # Длительность последней транзакции в секундах
+    max_flush_latency: float    # Максимальная длительность транзакции в секундах
+
+@dataclass
+class _WriteRequest:
+    """ Строки для вставки в таблицу истории от одного вызова save_data. """
+    rows: List[Tuple[str, str, MessageIdType, float, int, bytes]]
+    peer_id_hash: str
+    logger: Logger
+    committed: 'Future[bool]' = field(default_factory=Future)  # Результат: True - строки зафиксированы в базе
+
+class HistoryWriteQueue:
+    """
+        Очередь отложенной записи истории сообщений с групповой фиксацией.
+
+        Вызовы save_data всех сессий только добавляют зашифрованные строки в очередь и сразу возвращаются
+        с объектом Future, который завершается после фиксации транзакции с этими строками.
+        Фоновый поток забирает накопившиеся строки раз в config.DATABASE.FLUSH_INTERVAL_MS
+        или как только их становится config.DATABASE.FLUSH_BATCH_SIZE, и записывает все одной транзакцией.
+    """
+    _INSERT_QUERY: str = (
+        "INSERT OR REPLACE INTO messages (owner_id_hash, peer_id_hash, message_id, timestamp, sync_state, data) "
+        "VALUES (?, ?, ?, ?, ?, ?)"
+    )
+
+    _instance: Union['HistoryWriteQueue', None] = None
+    _instance_lock: threading.Lock = threading.Lock()
+
+    def __init__(self, pool: DatabaseConnectionPool) -> None:
+        """
+            Создает очередь записи.
+
+        Args:
+            pool (DatabaseConnectionPool): Пул соединений базы данных истории.
+        """
+        self._pool: DatabaseConnectionPool = pool
+        self._condition: threading.Condition = threading.Condition()
+        self._pending: List[_WriteRequest] = []
+        self._pending_rows: int = 0
+        self._enqueued_batches: int = 0     # Номер последней поставленной в очередь пачки
+        self._written_batches: int = 0      # Номер последней записанной пачки
+        self._thread: Union[threading.Thread, None] = None
+
+        self._flushed_rows: int = 0
+        self._flushes: int = 0
+        self._last_flush_latency: float = 0.0
+        self._max_flush_latency: float = 0.0
+
+    @classmethod
+    def get(cls) -> 'HistoryWriteQueue':
+        """
+            Возвращает общую для всех сессий очередь записи истории.
+
+        Returns:
+            HistoryWriteQueue: Очередь записи.
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                cls._instance = cls(DatabaseConnectionPool.get(config.FILES.HISTORY))
+            return cls._instance
+
+    def put(self, request: _WriteRequest) -> None:
+        """
+            Ставит строки в очередь на запись и будит фоновый поток, если набралась полная пачка.
+
+        Args:
+            request (_WriteRequest): Строки для записи.
+        """
+        with self._condition:
+            self._pending.append(request)
+            self._pending_rows += len(request.rows)
+            self._enqueued_batches += 1
+            self._ensure_thread()
+            # Будим поток на первой строке (начало отсчета интервала) и на полной пачке
+            if len(self._pending) == 1 or self._pending_rows >= config.DATABASE.FLUSH_BATCH_SIZE:
+                self._condition.notify_all()
+
+    def flush(self, timeout: Union[float, None] = config.DATABASE.FLUSH_TIMEOUT) -> bool:
+        """
+            Немедленно записывает накопленные строки и ждет окончания записи.
+
+        Args:
+            timeout (Union[float, None]): Максимальное время ожидания в секундах. None - без ограничения.
+
+        Returns:
+            bool: True - если все строки, поставленные до вызова, записаны.
+        """
+        with self._condition:
+            target = self._enqueued_batches
+            if self._written_batches >= target:
+                return True
+            self._ensure_thread()
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._written_batches >= target, timeout)
+
+    def stop(self) -> None:
+        """ Записывает все оставшиеся строки и останавливает фоновый поток. При следующей записи поток запустится снова. """
+        with self._condition:
+            thread, self._thread = self._thread, None
+            self._condition.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def stats(self) -> WriteQueueStats:
+        """
+            Возвращает текущее состояние очереди.
+
+        Returns:
+            WriteQueueStats: Глубина очереди и задержки записи.
+        """
+        with self._condition:
+            return WriteQueueStats(
+                queue_depth=self._pending_rows,
+                flushed_rows=self._flushed_rows,
+                flushes=self._flushes,
+                last_flush_latency=self._last_flush_latency,
+                max_flush_latency=self._max_flush_latency
+            )
+
+    def _ensure_thread(self) -> None:
+        # Вызывается под self._condition. Поток, завершившийся из-за ошибки, запускаем заново
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        interval: float = config.DATABASE.FLUSH_INTERVAL_MS / 1000
+        while True:
+            with self._condition:
+                while self._thread is threading.current_thread() and not self._pending:
+                    self._condition.wait()
+                # Копим строки в течение интервала, чтобы записать их одной транзакцией
+                if self._thread is threading.current_thread() and self._pending_rows < config.DATABASE.FLUSH_BATCH_SIZE:
+                    self._condition.wait(interval)
+                requests, self._pending = self._pending, []
+                self._pending_rows = 0
+                target = self._enqueued_batches
+                is_stopped = self._thread is not threading.current_thread()
+
+            try:
+                if requests:
+                    self._write(requests)
+            except Exception as e:
+                # Поток записи общий для всех сессий и не должен завершаться из-за одной пачки
+                requests[0].logger.error(f'Ошибка в потоке записи истории: {e}')
+
+            # Пачки считаются обработанными даже при ошибке записи, иначе flush будет ждать их вечно
+            with self._condition:
+                self._written_batches = max(self._written_batches, target)
+                self._condition.notify_all()
+                if is_stopped and not self._pending:
+                    return
+
+    def _write(self, requests: List[_WriteRequest]) -> None:
+        started: float = time.perf_counter()
+        results: List[bool] = [False] * len(requests)
+        try:
+            try:
+                with self._pool.connection() as conn:
+                    for request in requests:
+                        conn.executemany(self._INSERT_QUERY, request.rows)
+                results = [True] * len(requests)
+            except Exception:
+                # Одна ошибочная пачка не должна откатывать чужие сообщения, поэтому записываем пачки по отдельности.
+                # Ловим не только sqlite3.Error: ошибка открытия базы (OSError) или плохая строка (ValueError, TypeError)
+                # не должны останавливать поток записи
+                for i, request in enumerate(requests):
+                    try:
+                        with self._pool.connection() as conn:
+                            conn.executemany(self._INSERT_QUERY, request.rows)
+                        results[i] = True
+                    except Exception as e:
+                        request.logger.error(f'Ошибка при добавлении данных в БД для клиента [{request.peer_id_hash}]. Ошибка [{e}].')
+
+            latency: float = time.perf_counter() - started
+            rows: int = sum(len(request.rows) for request in requests)
+            with self._condition:
+                self._flushed_rows += rows
+                self._flushes += 1
+                self._last_flush_latency = latency
+                self._max_flush_latency = max(self._max_flush_latency, latency)
+        finally:
+            # Ожидающие подтверждения получают результат в любом случае
+            for request, is_committed in zip(requests, results):
+                if is_committed:
+                    request.logger.debug(f"[{len(request.rows)}] сообщение(-ий) успешно добавлено(-ы) в базу данных для клиента [{request.peer_id_hash}].")
+                if not request.committed.done():
+                    request.committed.set_result(is_committed)
+
 class HistoryDatabaseManager:
+    """
+        Хранилище истории диалогов.
+
+        Все диалоги хранятся в одной таблице messages с ключом (owner_id_hash, peer_id_hash, message_id).
+        Время и состояние синхронизации вынесены в отдельные индексированные столбцы, содержимое сообщения
+        зашифровано ключом диалога. Таблицы старого формата `table_<user>_<peer>` переносятся в messages
+        при первом открытии диалога.
+    """
     DB_PATH = config.FILES.HISTORY
+    _pool: DatabaseConnectionPool = DatabaseConnectionPool.get(DB_PATH)
+
+    _schema_lock: threading.Lock = threading.Lock()
+    _is_schema_ready: bool = False
+    _MAX_QUERY_PARAMETERS: int = 500
 
     def __init__(self, user_id_hash: str, user_password: str, logger: Logger) -> None:
         self._user_id_hash: str = user_id_hash
@@ -19,108 +335,293 @@ class HistoryDatabaseManager:
         self._logger: Logger = logger
         self._database_key: bytes = b''
         
-        self._table_name = ''
+        self._peer_id_hash: str = ''
 
     def set_table_name(self, peer_id_hash: str):
         """
-            Создает шаблоны названий для таблицы базы данных для данного диалога.
+            Выбирает диалог, с которым работает менеджер, и переносит его историю из таблицы старого формата, если она есть.
 
         Args:
-            user_id_hash (str): Наш id
             peer_id_hash (str): Id собеседника
         """
         self._peer_id_hash = peer_id_hash
-        self._table_name = strip_bad_symbols(f'table_{self._user_id_hash}_{peer_id_hash}')
         self._database_key = Encrypter.load_database_encode_key(self._user_id_hash, self._user_password, self._peer_id_hash)
 
+        try:
+            self._create_schema()
+            self._migrate_legacy_table()
+        except (sqlite3.Error, ValueError) as e:
+            self._logger.error(f'Не удалось подготовить таблицу истории для клиента [{self._peer_id_hash}]. Ошибка [{e}].')
 
-    def connect(self):
-        """ Устанавливает соединение с базой данных и возвращает объект соединения. """
-        return sqlite3.connect(HistoryDatabaseManager.DB_PATH)
-
-    def save_data(self, messages: List[MessageTextData], is_outbound_message_buffer: bool = False) -> None:
+    def save_data(self, messages: List[MessageTextData], is_outbound_message_buffer: bool = False) -> 'Future[bool]':
         """
-        Сохраняет данные в указанную таблицу базы данных.
+        Ставит данные в очередь на запись в таблицу базы данных.
 
         Args:
             table (List[MessageTextData]): Список сообщений.
             is_outbound_message_buffer (bool): Флаг того, что сохраняются данные их временного буфера.
+
+        Returns:
+            Future[bool]: Завершается после фиксации транзакции. True - сообщения записаны, False - запись не удалась.
         """
         if not messages:
-            return
+            committed: 'Future[bool]' = Future()
+            committed.set_result(True)
+            return committed
         
-        _messages = [(not is_outbound_message_buffer, Encrypter.encrypt_with_aes(self._database_key, msg.model_dump_json())) for msg in messages]
+        _messages = [self._make_row(msg, not is_outbound_message_buffer) for msg in messages]
+
+        # Запись выполняет фоновый поток, поэтому вызывающий поток не ждет диска
+        self._logger.debug(f"Добавляю [{len(_messages)}] сообщение(-ий) в очередь записи в базу данных для клиента [{self._peer_id_hash}].")
+        request = _WriteRequest(_messages, self._peer_id_hash, self._logger)
+        HistoryWriteQueue.get().put(request)
+        return request.committed
 
+    def flush(self) -> None:
+        """
+            Дожидается записи в базу данных всех сообщений, сохраненных через save_data,
+            но не дольше config.DATABASE.FLUSH_TIMEOUT.
+        """
+        if not HistoryWriteQueue.get().flush():
+            self._logger.warning(f"Очередь записи истории не успела записать сообщения для клиента [{self._peer_id_hash}], "
+                                 f"читаю базу без них.")
+
+    def load_unsent_messages(self) -> Dict[MessageIdType, MessageTextData]:
+        """
+            Загружает неотправленные сообщения диалога и удаляет их из базы (они возвращаются для повторной отправки).
+
+        Returns:
+            Dict[MessageIdType, MessageTextData]: Словарь несинхронизированных сообщений.
+        """
+        unsent_messages: Dict[MessageIdType, MessageTextData] = {}
 
+        # Сообщения из очереди записи должны попасть в выборку (и под удаление)
+        self.flush()
         try:
-            self._logger.debug(f"Добавляю [{len(_messages)}] сообщение(-ий) в базу данных для клиента [{self._peer_id_hash}].")
-            conn = self.connect()
-            cursor = conn.cursor()
-             # SQL-запрос для вставки данных
-            query = f"INSERT INTO {self._table_name} (sync_state, data) VALUES (?, ?)"
-            
-            # Вставляем множество записей
-            cursor.executemany(query, _messages)
+            with HistoryDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT data FROM messages
+                    WHERE owner_id_hash = ? AND peer_id_hash = ? AND sync_state = 0
+                    ORDER BY timestamp, message_id
+                """, (self._user_id_hash, self._peer_id_hash))
+
+                for message in self._decrypt_rows(cursor.fetchall()):
+                    unsent_messages[message.id] = message
+
+                if unsent_messages:
+                    cursor.execute(
+                        "DELETE FROM messages WHERE owner_id_hash = ? AND peer_id_hash = ? AND sync_state = 0",
+                        (self._user_id_hash, self._peer_id_hash)
+                    )
 
-             # Сохраняем изменения
-            conn.commit()
-            self._logger.debug(f"[{len(_messages)}] сообщение(-ий) успешно добавлено(-ы) в базу данных для клиента [{self._peer_id_hash}].")
+            self._logger.debug(f'Было загружено [{len(unsent_messages)}] сообщения(-ий) для клиента [{self._peer_id_hash}], требующих повторной отправки.')
         except sqlite3.Error as e:
-            self._logger.error(f'Ошибка при добавлении данных в БД для клиента [{self._peer_id_hash}]. Ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()  
+            self._logger.error(f'Не удалось подключиться к базе данных по пути [{HistoryDatabaseManager.DB_PATH}]. Ошибка [{e}].')
+        return unsent_messages
 
-    def load_data(self) -> Tuple[List[MessageTextData], Dict[MessageIdType, MessageTextData]]:
+    def load_message_ids(self) -> List[MessageIdType]:
         """
-        Загружает данные из указанной таблицы с учетом условий.
+            Загружает идентификаторы всех синхронизированных сообщений диалога, не расшифровывая сами сообщения.
 
         Returns:
-            Tuple[List[MessageTextData], Dict[MessageIdType, MessageTextData]]:
-            Кортеж из списка синхронизированных и словаря несинхронизированных сообщений.
+            List[MessageIdType]: Идентификаторы сообщений по возрастанию времени.
         """
-        self._logger.debug(f'Подключаюсь к базе данных и загружаю историю диалога с клиентом [{self._peer_id_hash}].')
+        self.flush()
+        try:
+            with HistoryDatabaseManager._pool.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT message_id FROM messages
+                    WHERE owner_id_hash = ? AND peer_id_hash = ? AND sync_state = 1
+                    ORDER BY timestamp, message_id
+                """, (self._user_id_hash, self._peer_id_hash))
+                return [row[0] for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            self._logger.error(f'Не удалось загрузить идентификаторы сообщений для клиента [{self._peer_id_hash}]. Ошибка [{e}].')
+            return []
 
-        sent_messages: List[MessageTextData] = []
-        unsent_messages: Dict[MessageIdType, MessageTextData] = {}
-        try:    
-            # Подключение к базе данных (или её создание, если она не существует)
-            conn = self.connect()
-            cursor = conn.cursor()
+    def load_page(self, before: Union[MessageTextData, None] = None, limit: int = config.DATABASE.HISTORY_PAGE_SIZE) -> List[MessageTextData]:
+        """
+            Загружает страницу синхронизированных сообщений диалога.
 
-            # Создание таблицы диалога
-            cursor.execute(f'CREATE TABLE IF NOT EXISTS {self._table_name} (sync_state INTEGER, data BLOB)')
+        Args:
+            before (Union[MessageTextData, None]): Сообщение, старше которого нужно загрузить страницу. Если None - загружаются последние сообщения.
+            limit (int): Максимальное количество сообщений на странице.
 
-            # Выполнение запроса на выборку всех записей из таблицы
-            req = f"SELECT * FROM {self._table_name}"
-            cursor.execute(req)
-            
-            # Получение всех результатов
-            all_rows = cursor.fetchall()
-            
-            for row in all_rows:
-                decoded_row = MessageTextData.parse_raw((Encrypter.decrypt_with_aes(self._database_key, row[1])))
-                sent_messages.append(decoded_row) if int(row[0]) else unsent_messages.update({decoded_row.id: decoded_row})
+        Returns:
+            List[MessageTextData]: Сообщения страницы по возрастанию времени.
+        """
+        self.flush()
+        try:
+            with HistoryDatabaseManager._pool.connection() as conn:
+                if before is None:
+                    cursor = conn.execute("""
+                        SELECT data FROM messages
+                        WHERE owner_id_hash = ? AND peer_id_hash = ? AND sync_state = 1
+                        ORDER BY timestamp DESC, message_id DESC
+                        LIMIT ?
+                    """, (self._user_id_hash, self._peer_id_hash, limit))
+                else:
+                    # Постраничная выборка по ключу (timestamp, message_id) без OFFSET
+                    cursor = conn.execute("""
+                        SELECT data FROM messages
+                        WHERE owner_id_hash = ? AND peer_id_hash = ? AND sync_state = 1 AND (timestamp, message_id) < (?, ?)
+                        ORDER BY timestamp DESC, message_id DESC
+                        LIMIT ?
+                    """, (self._user_id_hash, self._peer_id_hash, datetime.fromisoformat(before.time).timestamp(), before.id, limit))
+                messages = self._decrypt_rows(cursor.fetchall())
+        except sqlite3.Error as e:
+            self._logger.error(f'Не удалось загрузить историю диалога с клиентом [{self._peer_id_hash}]. Ошибка [{e}].')
+            return []
 
-            if sent_messages:
-                sent_messages.sort(key=lambda x: x.id)
+        messages.reverse()
+        self._logger.debug(f'Было загружено [{len(messages)}] сообщения(-ий) для клиента [{self._peer_id_hash}] из истории.')
+        return messages
 
-            self._logger.debug(f'Было загружено [{len(sent_messages)}] сообщения(-ий) для клиента [{self._peer_id_hash}] из истории.')
-            self._logger.debug(f'Было загружено [{len(unsent_messages)}] сообщения(-ий) для клиента [{self._peer_id_hash}], требующих повторной отправки.')
+    def load_messages_by_ids(self, message_ids: List[MessageIdType]) -> List[MessageTextData]:
+        """
+            Загружает синхронизированные сообщения диалога с указанными идентификаторами.
 
-            req = f"DELETE FROM {self._table_name} WHERE sync_state = ?"
-            cursor.execute(req, (False,))
+        Args:
+            message_ids (List[MessageIdType]): Идентификаторы сообщений.
 
-            # Сохранение изменений и закрытие соединения с базой данных
-            conn.commit()
+        Returns:
+            List[MessageTextData]: Найденные сообщения по возрастанию времени.
+        """
+        if not message_ids:
+            return []
 
+        self.flush()
+        rows: List[Tuple[float, MessageIdType, bytes]] = []
+        try:
+            with HistoryDatabaseManager._pool.connection() as conn:
+                # Ограничиваем количество параметров в одном запросе
+                for i in range(0, len(message_ids), self._MAX_QUERY_PARAMETERS):
+                    chunk = message_ids[i:i + self._MAX_QUERY_PARAMETERS]
+                    cursor = conn.execute(f"""
+                        SELECT timestamp, message_id, data FROM messages
+                        WHERE owner_id_hash = ? AND peer_id_hash = ? AND sync_state = 1
+                        AND message_id IN ({', '.join('?' * len(chunk))})
+                    """, (self._user_id_hash, self._peer_id_hash, *chunk))
+                    rows.extend(cursor.fetchall())
+        except sqlite3.Error as e:
+            self._logger.error(f'Не удалось загрузить сообщения для клиента [{self._peer_id_hash}]. Ошибка [{e}].')
+            return []
 
+        rows.sort(key=lambda row: (row[0], row[1]))
+        return self._decrypt_rows([(row[2],) for row in rows])
+
+    def load_next_message_number(self) -> int:
+        """
+            Возвращает номер, с которого нужно нумеровать наши новые сообщения в диалоге (идентификаторы вида `m<номер>`).
+
+        Returns:
+            int: Номер следующего сообщения.
+        """
+        self.flush()
+        try:
+            with HistoryDatabaseManager._pool.connection() as conn:
+                cursor = conn.execute("""
+                    SELECT MAX(CAST(SUBSTR(message_id, 2) AS INTEGER)) FROM messages
+                    WHERE owner_id_hash = ? AND peer_id_hash = ? AND message_id LIKE 'm%'
+                """, (self._user_id_hash, self._peer_id_hash))
+                row = cursor.fetchone()
         except sqlite3.Error as e:
-            self._logger.error(f'Не удалось подключиться к базе данных по пути [{HistoryDatabaseManager.DB_PATH}]. Ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
-        return sent_messages, unsent_messages
+            self._logger.error(f'Не удалось получить номер последнего сообщения для клиента [{self._peer_id_hash}]. Ошибка [{e}].')
+            return 0
+        return row[0] + 1 if row and row[0] is not None else 0
+
+    def _decrypt_rows(self, rows: List[Tuple[bytes]]) -> List[MessageTextData]:
+        """
+            Расшифровывает строки выборки, первым столбцом которых являются данные сообщения.
+
+        Args:
+            rows (List[Tuple[bytes]]): Строки выборки.
+
+        Returns:
+            List[MessageTextData]: Сообщения.
+        """
+        return [MessageTextData.parse_raw(Encrypter.decrypt_with_aes(self._database_key, row[0])) for row in rows]
+
+    def _make_row(self, message: MessageTextData, sync_state: bool) -> Tuple[str, str, MessageIdType, float, int, bytes]:
+        """
+            Собирает строку таблицы messages для сообщения.
+
+        Args:
+            message (MessageTextData): Сообщение.
+            sync_state (bool): Подтверждено ли сообщение собеседником.
+
+        Returns:
+            Tuple[str, str, MessageIdType, float, int, bytes]: Значения столбцов строки.
+        """
+        return (
+            self._user_id_hash,
+            self._peer_id_hash,
+            message.id,
+            datetime.fromisoformat(message.time).timestamp(),
+            int(sync_state),
+            Encrypter.encrypt_with_aes(self._database_key, message.model_dump_json())
+        )
+
+    @classmethod
+    def _create_schema(cls) -> None:
+        """
+            Создает таблицу messages и ее индексы, если их еще нет.
+
+        Raises:
+            sqlite3.Error: Если не удалось создать таблицу.
+        """
+        with cls._schema_lock:
+            if cls._is_schema_ready:
+                return
+
+            with cls._pool.connection() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS messages (
+                        owner_id_hash TEXT NOT NULL,
+                        peer_id_hash TEXT NOT NULL,
+                        message_id TEXT NOT NULL,
+                        timestamp REAL NOT NULL,
+                        sync_state INTEGER NOT NULL,
+                        data BLOB NOT NULL,
+                        PRIMARY KEY (owner_id_hash, peer_id_hash, message_id)
+                    ) WITHOUT ROWID
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS messages_timestamp_idx ON messages (owner_id_hash, peer_id_hash, timestamp)")
+                conn.execute("CREATE INDEX IF NOT EXISTS messages_sync_state_idx ON messages (owner_id_hash, peer_id_hash, sync_state)")
+            cls._is_schema_ready = True
+
+    def _migrate_legacy_table(self) -> None:
+        """
+            Переносит историю диалога из таблицы старого формата в messages и удаляет старую таблицу.
+
+            Перенос выполняется одной транзакцией: при ошибке старая таблица остается нетронутой.
+
+        Raises:
+            sqlite3.Error: Если не удалось перенести данные.
+            ValueError: Если не удалось расшифровать сообщение старой таблицы.
+        """
+        legacy_table_name: str = strip_bad_symbols(f'table_{self._user_id_hash}_{self._peer_id_hash}')
+
+        with HistoryDatabaseManager._pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (legacy_table_name,))
+            if cursor.fetchone() is None:
+                return
+
+            # Подтвержденные копии сообщения важнее неподтвержденных, поэтому вставляем их первыми
+            cursor.execute(f"SELECT sync_state, data FROM {legacy_table_name} ORDER BY sync_state DESC")
+            rows = [
+                self._make_row(MessageTextData.parse_raw(Encrypter.decrypt_with_aes(self._database_key, data)), bool(sync_state))
+                for sync_state, data in cursor.fetchall()
+            ]
+            cursor.executemany("""
+                INSERT OR IGNORE INTO messages (owner_id_hash, peer_id_hash, message_id, timestamp, sync_state, data)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            cursor.execute(f"DROP TABLE {legacy_table_name}")
+
+        self._logger.debug(f'История диалога с клиентом [{self._peer_id_hash}] перенесена из таблицы [{legacy_table_name}]: [{len(rows)}] сообщение(-ий).')
 
 class KeyLoadingError(FileNotFoundError):
     """Исключение возникает, когда загрузка ключа из файла не удаётся."""
@@ -155,12 +656,8 @@ class DatabaseSetDataError(Exception):
 
 class AccountDatabaseManager:
     DB_PATH = config.FILES.ACCOUNTS
+    _pool: DatabaseConnectionPool = DatabaseConnectionPool.get(DB_PATH)
 
-    @staticmethod
-    def connect():
-        """ Устанавливает соединение с базой данных и возвращает объект соединения. """
-        return sqlite3.connect(AccountDatabaseManager.DB_PATH)
-    
     @staticmethod
     def create_database() -> None:
         """
@@ -170,43 +667,49 @@ class AccountDatabaseManager:
             DatabaseCreationError: Если не удалось создать таблицы в базе данных.
         """
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
             
-            # Создание таблицы информации о пользователе
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_info (
-                user_id TEXT PRIMARY KEY,
-                password_hash TEXT,
-                user_name BLOB,
-                dht_key BLOB,
-                dht_node_ip BLOB,
-                dht_node_port INTEGER,
-                dht_client_port INTEGER,
-                application_port INTEGER,
-                use_local_ip INTEGER,
-                dht_peers_keys BLOB
-            )
-            """)
-
-            # Создание таблицы ключей шифрования
-            cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_keys (
-                user_id_hash TEXT,
-                peer_id_hash TEXT,
-                encryption_key BLOB,
-                known_rsa_pub_keys BLOB,
-                PRIMARY KEY (user_id_hash, peer_id_hash)
-            )
-            """)
-        
-            conn.commit()  # Сохранение изменений
+                # Создание таблицы информации о пользователе
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_info (
+                    user_id TEXT PRIMARY KEY,
+                    password_hash TEXT,
+                    user_name BLOB,
+                    dht_key BLOB,
+                    dht_node_ip BLOB,
+                    dht_node_port INTEGER,
+                    dht_client_port INTEGER,
+                    application_port INTEGER,
+                    use_local_ip INTEGER,
+                    dht_peers_keys BLOB
+                )
+                """)
+
+                # Создание таблицы ключей шифрования
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS user_keys (
+                    user_id_hash TEXT,
+                    peer_id_hash TEXT,
+                    encryption_key BLOB,
+                    known_rsa_pub_keys BLOB,
+                    PRIMARY KEY (user_id_hash, peer_id_hash)
+                )
+                """)
+
+                # Создание таблицы кэша профилей собеседников из DHT
+                cursor.execute("""
+                CREATE TABLE IF NOT EXISTS dht_profiles (
+                    user_id TEXT,
+                    dht_key_hash TEXT,
+                    profile BLOB,
+                    updated_at REAL,
+                    PRIMARY KEY (user_id, dht_key_hash)
+                )
+                """)
 
         except sqlite3.Error as e:
             raise DatabaseCreationError(f"Не удалось создать базу данных [{AccountDatabaseManager.DB_PATH}]! Произошла ошибка [{e}].")
-        finally:
-            if conn: # type: ignore
-                conn.close()  # Закрытие соединения с базой данных
 
     @staticmethod
     def get_all_registered_users() -> list[UserIdType]:
@@ -221,23 +724,20 @@ class AccountDatabaseManager:
         """
         
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            # Выполнение запроса на выборку всех user_id
-            cursor.execute("SELECT user_id FROM user_info")
-            user_ids = cursor.fetchall()  # извлекает все строки результата
+                # Выполнение запроса на выборку всех user_id
+                cursor.execute("SELECT user_id FROM user_info")
+                user_ids = cursor.fetchall()  # извлекает все строки результата
 
-            if not user_ids:
-                raise DatabaseGetDataError(f'В базе данных нет зарегистрированных пользователей!')
+                if not user_ids:
+                    raise DatabaseGetDataError(f'В базе данных нет зарегистрированных пользователей!')
 
-            # Преобразование списка кортежей в список строк
-            return [user_id[0] for user_id in user_ids]
+                # Преобразование списка кортежей в список строк
+                return [user_id[0] for user_id in user_ids]
         except sqlite3.Error as e:
             raise DatabaseGetDataError(f'Не удалось получить ID пользователей из таблицы [user_info]! Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def save_user_info(user_info: ClientInfo) -> None:
@@ -251,35 +751,31 @@ class AccountDatabaseManager:
             DatabaseSetDataError: Если не удалось записать данные.
         """
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
-
-            # Сохранение основной информации о пользователе
-            req = """
-            INSERT INTO user_info (user_id, password_hash, user_name, dht_key, dht_node_ip, dht_node_port, dht_client_port,
-            application_port, use_local_ip, dht_peers_keys)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-
-            cursor.execute(req, (
-                user_info.user_id,
-                user_info.user_password_hash,
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_name),
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_dht_key),
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_node_ip),
-                user_info.dht_node_port,
-                user_info.dht_client_port,
-                user_info.application_port,
-                user_info.use_local_ip,
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_peers_keys.model_dump_json())
-            ))
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Сохранение основной информации о пользователе
+                req = """
+                INSERT INTO user_info (user_id, password_hash, user_name, dht_key, dht_node_ip, dht_node_port, dht_client_port,
+                application_port, use_local_ip, dht_peers_keys)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """
+
+                cursor.execute(req, (
+                    user_info.user_id,
+                    user_info.user_password_hash,
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_name),
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_dht_key),
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_node_ip),
+                    user_info.dht_node_port,
+                    user_info.dht_client_port,
+                    user_info.application_port,
+                    user_info.use_local_ip,
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_peers_keys.model_dump_json())
+                ))
 
-            conn.commit()
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось записать информацию о пользователе [{user_info.user_id}]! Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def update_user_info(user_info: ClientInfo) -> None:
@@ -293,43 +789,39 @@ class AccountDatabaseManager:
             DatabaseSetDataError: Если не удалось записать данные.
         """
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Сохранение основной информации о пользователе
+                req = """
+                UPDATE user_info 
+                SET password_hash=?, 
+                    user_name=?, 
+                    dht_key=?, 
+                    dht_node_ip=?, 
+                    dht_node_port=?, 
+                    dht_client_port=?, 
+                    application_port=?, 
+                    use_local_ip=?, 
+                    dht_peers_keys=?
+                WHERE user_id=?;
+                """
+
+                cursor.execute(req, (
+                    user_info.user_password_hash,
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_name),
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_dht_key),
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_node_ip),
+                    user_info.dht_node_port,
+                    user_info.dht_client_port,
+                    user_info.application_port,
+                    user_info.use_local_ip,
+                    Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_peers_keys.model_dump_json()),
+                    user_info.user_id
+                ))
 
-            # Сохранение основной информации о пользователе
-            req = """
-            UPDATE user_info 
-            SET password_hash=?, 
-                user_name=?, 
-                dht_key=?, 
-                dht_node_ip=?, 
-                dht_node_port=?, 
-                dht_client_port=?, 
-                application_port=?, 
-                use_local_ip=?, 
-                dht_peers_keys=?
-            WHERE user_id=?;
-            """
-
-            cursor.execute(req, (
-                user_info.user_password_hash,
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_name),
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.user_dht_key),
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_node_ip),
-                user_info.dht_node_port,
-                user_info.dht_client_port,
-                user_info.application_port,
-                user_info.use_local_ip,
-                Encrypter.encrypt_with_aes(user_info.user_password.encode(), user_info.dht_peers_keys.model_dump_json()),
-                user_info.user_id
-            ))
-
-            conn.commit()
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось записать информацию о пользователе [{user_info.user_id}]! Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def load_password_hash(user_id: UserIdType) -> str:
@@ -344,21 +836,18 @@ class AccountDatabaseManager:
         """
         # Выполнение запроса для получения информации о пользователе
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            req = """SELECT password_hash FROM user_info WHERE user_id=?"""
-            cursor.execute(req, (user_id,))
-            password_hash = cursor.fetchone()
+                req = """SELECT password_hash FROM user_info WHERE user_id=?"""
+                cursor.execute(req, (user_id,))
+                password_hash = cursor.fetchone()
 
-            if password_hash and password_hash[0]:
-                return password_hash[0]
-            raise DatabaseGetDataError(f'Пользователь с ID [{user_id}] не найден в базе данных.')
+                if password_hash and password_hash[0]:
+                    return password_hash[0]
+                raise DatabaseGetDataError(f'Пользователь с ID [{user_id}] не найден в базе данных.')
         except sqlite3.Error as e:
             raise DatabaseGetDataError(f'Произошла ошибка при получении данных пользователя [{user_id}]: [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def load_user_info(user_info: ClientInfo) -> None:
@@ -372,39 +861,36 @@ class AccountDatabaseManager:
             DatabaseGetDataError: Если не удалось загрузить данные или пользователь не найден.
         """
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
-
-            # Выполнение запроса для получения информации о пользователе
-            req = """
-            SELECT password_hash, user_name, dht_key, dht_node_ip, dht_node_port,
-            dht_client_port, application_port, use_local_ip, dht_peers_keys
-            FROM user_info
-            WHERE user_id = ?
-            """
-            cursor.execute(req, (user_info.user_id,))
-            row = cursor.fetchone()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Выполнение запроса для получения информации о пользователе
+                req = """
+                SELECT password_hash, user_name, dht_key, dht_node_ip, dht_node_port,
+                dht_client_port, application_port, use_local_ip, dht_peers_keys
+                FROM user_info
+                WHERE user_id = ?
+                """
+                cursor.execute(req, (user_info.user_id,))
+                row = cursor.fetchone()
 
             
-            if row:
-                user_info.user_password_hash = row[0]
-                user_info.user_name          = Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[1])
-                user_info.user_dht_key       = Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[2])
-                user_info.dht_node_ip        = Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[3])
-                user_info.dht_node_port      = row[4]
-                user_info.dht_client_port    = row[5]
-                user_info.application_port   = row[6]
-                user_info.use_local_ip       = row[7]
-                user_info.dht_peers_keys=DHTNodeHistory.parse_raw(Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[8]))
+                if row:
+                    user_info.user_password_hash = row[0]
+                    user_info.user_name          = Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[1])
+                    user_info.user_dht_key       = Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[2])
+                    user_info.dht_node_ip        = Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[3])
+                    user_info.dht_node_port      = row[4]
+                    user_info.dht_client_port    = row[5]
+                    user_info.application_port   = row[6]
+                    user_info.use_local_ip       = row[7]
+                    user_info.dht_peers_keys=DHTNodeHistory.parse_raw(Encrypter.decrypt_with_aes(user_info.user_password.encode(), row[8]))
                 
-            else:
-                raise DatabaseGetDataError(f'Пользователь с ID [{user_info.user_id}] не найден в базе данных.')
+                else:
+                    raise DatabaseGetDataError(f'Пользователь с ID [{user_info.user_id}] не найден в базе данных.')
 
         except sqlite3.Error as e:
             raise DatabaseGetDataError(f'Произошла ошибка при получении данных пользователя [{user_info.user_id}]: [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def update_dht_peers_keys(user_id: UserIdType, dht_peers_keys: bytes) -> None:
@@ -420,19 +906,89 @@ class AccountDatabaseManager:
         """
         try:    
             # Подключение к базе данных (или её создание, если она не существует)
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            # Параметризованный запрос для извлечения rsa ключей
-            req = "UPDATE user_info SET dht_peers_keys=? WHERE user_id=?;"
-            cursor.execute(req, (dht_peers_keys, user_id))            
-            conn.commit()
+                # Параметризованный запрос для извлечения rsa ключей
+                req = "UPDATE user_info SET dht_peers_keys=? WHERE user_id=?;"
+                cursor.execute(req, (dht_peers_keys, user_id))            
 
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось обновить список введенных пользователем DHT ключей собеседников для [{user_id}]. Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
+
+    @staticmethod
+    def save_dht_profile(user_id: UserIdType, dht_key_hash: str, profile: bytes, updated_at: float) -> None:
+        """
+            Сохраняет или заменяет профиль собеседника из DHT в кэше пользователя.
+
+        Args:
+            user_id (UserIdType): Id пользователя.
+            dht_key_hash (str): Хэш DHT ключа собеседника.
+            profile (bytes): Сериализованный профиль (зашифрованный паролем user_id).
+            updated_at (float): Время получения профиля из DHT (time.time()).
+
+        Raises:
+            DatabaseSetDataError: Если не удалось записать данные.
+        """
+        try:
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                req = """
+                INSERT OR REPLACE INTO dht_profiles (user_id, dht_key_hash, profile, updated_at)
+                VALUES (?, ?, ?, ?)
+                """
+                cursor.execute(req, (user_id, dht_key_hash, profile, updated_at))
+
+        except sqlite3.Error as e:
+            raise DatabaseSetDataError(f'Не удалось записать профиль из DHT для [{user_id}]. Произошла ошибка [{e}].')
+
+    @staticmethod
+    def fetch_dht_profiles(user_id: UserIdType) -> list[tuple[str, bytes, float]]:
+        """
+            Возвращает все профили собеседников из кэша DHT пользователя.
+
+        Args:
+            user_id (UserIdType): Id пользователя.
+
+        Returns:
+            list[tuple[str, bytes, float]]: list[tuple(dht_key_hash, profile, updated_at)]
+
+        Raises:
+            DatabaseGetDataError: Если не удалось загрузить данные.
+        """
+        try:
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                req = "SELECT dht_key_hash, profile, updated_at FROM dht_profiles WHERE user_id=?;"
+                cursor.execute(req, (user_id,))
+                return cursor.fetchall()
+
+        except sqlite3.Error as e:
+            raise DatabaseGetDataError(f'Не удалось загрузить профили из DHT для [{user_id}]. Произошла ошибка [{e}].')
+
+    @staticmethod
+    def delete_dht_profile(user_id: UserIdType, dht_key_hash: str) -> None:
+        """
+            Удаляет профиль собеседника из кэша DHT пользователя.
+
+        Args:
+            user_id (UserIdType): Id пользователя.
+            dht_key_hash (str): Хэш DHT ключа собеседника.
+
+        Raises:
+            DatabaseSetDataError: Если не удалось удалить данные.
+        """
+        try:
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                req = "DELETE FROM dht_profiles WHERE user_id=? AND dht_key_hash=?;"
+                cursor.execute(req, (user_id, dht_key_hash))
+
+        except sqlite3.Error as e:
+            raise DatabaseSetDataError(f'Не удалось удалить профиль из DHT для [{user_id}]. Произошла ошибка [{e}].')
 
     @staticmethod
     def save_user_keys(user_id_hash: UserIdHashType, peer_id_hash: UserIdHashType,
@@ -452,22 +1008,18 @@ class AccountDatabaseManager:
         """
 
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            req = """
-            INSERT INTO user_keys (user_id_hash, peer_id_hash, encryption_key, known_rsa_pub_keys)
-            VALUES (?, ?, ?, ?)
-            """
+                req = """
+                INSERT INTO user_keys (user_id_hash, peer_id_hash, encryption_key, known_rsa_pub_keys)
+                VALUES (?, ?, ?, ?)
+                """
 
-            cursor.execute(req, (user_id_hash, peer_id_hash, encryption_key, known_rsa_pub_keys))
+                cursor.execute(req, (user_id_hash, peer_id_hash, encryption_key, known_rsa_pub_keys))
 
-            conn.commit()
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось записать ключи пользователей [{user_id_hash}] и [{peer_id_hash}]! Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def add_encryption_key_only(user_id_hash: UserIdHashType, peer_id_hash: UserIdHashType, encryption_key: bytes) -> None:
@@ -485,22 +1037,18 @@ class AccountDatabaseManager:
         """
 
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            req = """
-            INSERT INTO user_keys (user_id_hash, peer_id_hash, encryption_key)
-            VALUES (?, ?, ?)
-            """
+                req = """
+                INSERT INTO user_keys (user_id_hash, peer_id_hash, encryption_key)
+                VALUES (?, ?, ?)
+                """
 
-            cursor.execute(req, (user_id_hash, peer_id_hash, encryption_key))
+                cursor.execute(req, (user_id_hash, peer_id_hash, encryption_key))
 
-            conn.commit()
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось записать ключ шифрования диалога пользователей [{user_id_hash}] и [{peer_id_hash}]! Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def add_known_rsa_pub_keys(user_id_hash: UserIdHashType, peer_id_hash: UserIdHashType, known_rsa_pub_keys: bytes) -> None:
@@ -518,22 +1066,18 @@ class AccountDatabaseManager:
         """
 
         try:
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            req = """
-            INSERT INTO user_keys (user_id_hash, peer_id_hash, known_rsa_pub_keys)
-            VALUES (?, ?, ?)
-            """
+                req = """
+                INSERT INTO user_keys (user_id_hash, peer_id_hash, known_rsa_pub_keys)
+                VALUES (?, ?, ?)
+                """
 
-            cursor.execute(req, (user_id_hash, peer_id_hash, known_rsa_pub_keys))
+                cursor.execute(req, (user_id_hash, peer_id_hash, known_rsa_pub_keys))
 
-            conn.commit()
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось записать известные публичные rsa ключи пользователей [{user_id_hash}] и [{peer_id_hash}]! Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def fetch_encryption_key(user_id_hash: UserIdHashType, peer_id_hash: UserIdHashType) -> bytes:
@@ -552,21 +1096,18 @@ class AccountDatabaseManager:
         """
         try:    
             # Подключение к базе данных (или её создание, если она не существует)
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
-
-            # Параметризованный запрос для извлечения ключа шифрования
-            req = "SELECT encryption_key FROM user_keys WHERE user_id_hash=? AND peer_id_hash=?;"
-            cursor.execute(req, (user_id_hash, peer_id_hash))
-            key = cursor.fetchone()
-            if key and key[0]:
-                return key[0] # Возвращаем ключ шифрования, если он найден
-            raise KeyLoadingError(f'Ключ для [{peer_id_hash}] не найден!')
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Параметризованный запрос для извлечения ключа шифрования
+                req = "SELECT encryption_key FROM user_keys WHERE user_id_hash=? AND peer_id_hash=?;"
+                cursor.execute(req, (user_id_hash, peer_id_hash))
+                key = cursor.fetchone()
+                if key and key[0]:
+                    return key[0] # Возвращаем ключ шифрования, если он найден
+                raise KeyLoadingError(f'Ключ для [{peer_id_hash}] не найден!')
         except sqlite3.Error as e:
             raise KeyLoadingError(f'Не удалось загрузить ключ для [{peer_id_hash}]. Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def fetch_all_peer_id(user_id_hash: UserIdHashType) -> list[UserIdHashType]:
@@ -584,24 +1125,21 @@ class AccountDatabaseManager:
         """
         try:    
             # Подключение к базе данных (или её создание, если она не существует)
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
-
-            # Параметризованный запрос для извлечения ключа шифрования
-            req = "SELECT peer_id_hash FROM user_keys WHERE user_id_hash=?;"
-            cursor.execute(req, (user_id_hash,))
-            peer_ids = cursor.fetchall()
-
-            if not peer_ids:
-                raise DatabaseGetDataError(f'Данные для [{user_id_hash}] не найдены!')
-            # Преобразование списка кортежей в список строк
-            return [peer_ids[0] for peer_ids in peer_ids]
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Параметризованный запрос для извлечения ключа шифрования
+                req = "SELECT peer_id_hash FROM user_keys WHERE user_id_hash=?;"
+                cursor.execute(req, (user_id_hash,))
+                peer_ids = cursor.fetchall()
+
+                if not peer_ids:
+                    raise DatabaseGetDataError(f'Данные для [{user_id_hash}] не найдены!')
+                # Преобразование списка кортежей в список строк
+                return [peer_ids[0] for peer_ids in peer_ids]
             
         except sqlite3.Error as e:
             raise DatabaseGetDataError(f'Не удалось загрузить данные для [{user_id_hash}]. Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
     
     @staticmethod
     def fetch_known_rsa_pub_keys(user_id_hash: UserIdHashType, peer_id_hash: UserIdHashType) -> bytes:
@@ -620,21 +1158,18 @@ class AccountDatabaseManager:
         """
         try:    
             # Подключение к базе данных (или её создание, если она не существует)
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
-
-            # Параметризованный запрос для извлечения rsa ключей
-            req = "SELECT known_rsa_pub_keys FROM user_keys WHERE user_id_hash=? AND peer_id_hash=?;"
-            cursor.execute(req, (user_id_hash, peer_id_hash))
-            key = cursor.fetchone()
-            if key and key[0]:
-                return key[0] # Возвращаем ключ шифрования, если он найден
-            raise KeyLoadingError(f'Известные rsa ключи для [{peer_id_hash}] у [{user_id_hash}] не найдены!')
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Параметризованный запрос для извлечения rsa ключей
+                req = "SELECT known_rsa_pub_keys FROM user_keys WHERE user_id_hash=? AND peer_id_hash=?;"
+                cursor.execute(req, (user_id_hash, peer_id_hash))
+                key = cursor.fetchone()
+                if key and key[0]:
+                    return key[0] # Возвращаем ключ шифрования, если он найден
+                raise KeyLoadingError(f'Известные rsa ключи для [{peer_id_hash}] у [{user_id_hash}] не найдены!')
         except sqlite3.Error as e:
             raise KeyLoadingError(f'Не удалось загрузить известные rsa ключи для [{peer_id_hash}]. Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def get_all_keys_for_user_id(user_id_hash: UserIdHashType) -> list[tuple[bytes, bytes]]:
@@ -653,25 +1188,22 @@ class AccountDatabaseManager:
         """
         try:    
             # Подключение к базе данных (или её создание, если она не существует)
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
-
-            # Параметризованный запрос для извлечения rsa ключей
-            cursor.execute("""
-                SELECT encryption_key, known_rsa_pub_keys
-                FROM user_keys
-                WHERE user_id_hash = ?
-            """, (user_id_hash,))
-            keys = cursor.fetchall()
-
-            if keys:
-                return keys # Возвращаем ключ шифрования, если он найден
-            raise KeyLoadingError(f'Пользователь с ID [{user_id_hash}] не найден в базе данных.')
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Параметризованный запрос для извлечения rsa ключей
+                cursor.execute("""
+                    SELECT encryption_key, known_rsa_pub_keys
+                    FROM user_keys
+                    WHERE user_id_hash = ?
+                """, (user_id_hash,))
+                keys = cursor.fetchall()
+
+                if keys:
+                    return keys # Возвращаем ключ шифрования, если он найден
+                raise KeyLoadingError(f'Пользователь с ID [{user_id_hash}] не найден в базе данных.')
         except sqlite3.Error as e:
             raise KeyLoadingError(f'Не удалось загрузить ключи для [{user_id_hash}]. Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def update_encryption_key(user_id_hash: UserIdHashType, peer_id_hash: UserIdHashType, encryption_key: bytes) -> None:
@@ -688,19 +1220,15 @@ class AccountDatabaseManager:
         """
         try:    
             # Подключение к базе данных (или её создание, если она не существует)
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            # Параметризованный запрос для извлечения rsa ключей
-            req = "UPDATE user_keys SET encryption_key=? WHERE user_id_hash=? AND peer_id_hash=?;"
-            cursor.execute(req, (encryption_key, user_id_hash, peer_id_hash))            
-            conn.commit()
+                # Параметризованный запрос для извлечения rsa ключей
+                req = "UPDATE user_keys SET encryption_key=? WHERE user_id_hash=? AND peer_id_hash=?;"
+                cursor.execute(req, (encryption_key, user_id_hash, peer_id_hash))            
 
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось обновить ключ шифрования диалога для [{peer_id_hash}]. Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
 
     @staticmethod
     def update_known_rsa_pub_keys(user_id_hash: UserIdHashType, peer_id_hash: UserIdHashType, known_rsa_pub_keys: bytes) -> None:
@@ -717,16 +1245,12 @@ class AccountDatabaseManager:
         """
         try:    
             # Подключение к базе данных (или её создание, если она не существует)
-            conn = AccountDatabaseManager.connect()
-            cursor = conn.cursor()
+            with AccountDatabaseManager._pool.connection() as conn:
+                cursor = conn.cursor()
 
-            # Параметризованный запрос для извлечения rsa ключей
-            req = "UPDATE user_keys SET known_rsa_pub_keys=? WHERE user_id_hash=? AND peer_id_hash=?;"
-            cursor.execute(req, (known_rsa_pub_keys, user_id_hash, peer_id_hash))            
-            conn.commit()
+                # Параметризованный запрос для извлечения rsa ключей
+                req = "UPDATE user_keys SET known_rsa_pub_keys=? WHERE user_id_hash=? AND peer_id_hash=?;"
+                cursor.execute(req, (known_rsa_pub_keys, user_id_hash, peer_id_hash))
 
         except sqlite3.Error as e:
             raise DatabaseSetDataError(f'Не удалось обновить известные rsa ключи для [{peer_id_hash}]. Произошла ошибка [{e}].')
-        finally:
-            if conn: # type: ignore
-                conn.close()
\ No newline at end of file
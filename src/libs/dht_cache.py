@@ -0,0 +1,222 @@
+from concurrent.futures import Future, wait
+import hashlib
+from logging import Logger
+import threading
+import time
+from typing import Callable, Dict, Iterable, NamedTuple, Set, Union
+
+from config import UserIdType, config
+from dht import DHTPeerProfile
+from libs.cryptography import Encrypter
+from libs.database import AccountDatabaseManager, DatabaseGetDataError, DatabaseSetDataError
+
+class _CacheEntry(NamedTuple):
+    """ Запись кэша профилей. """
+    profile: DHTPeerProfile  # Профиль собеседника
+    updated_at: float        # Время получения профиля из DHT (time.time())
+
+class DHTProfileCache:
+    """
+        Локальный кэш профилей собеседников из DHT, сохраняемый вместе с аккаунтом.
+
+        Свежий профиль (моложе TTL) возвращается без обращения к DHT. Устаревший, но не старше MAX_STALE,
+        тоже возвращается сразу, а в фоне запускается его обновление. Профили хранятся зашифрованными
+        паролем пользователя, а вместо DHT ключа в базу записывается его хэш.
+    """
+    def __init__(self, logger: Logger, user_id: UserIdType, password: str, fetch: Callable[[str], 'Future[str]'],
+                 ttl: float = config.NETWORK.DHT_CACHE.TTL, max_stale: float = config.NETWORK.DHT_CACHE.MAX_STALE) -> None:
+        """
+            Создает кэш и загружает сохраненные профили пользователя.
+
+        Args:
+            logger (Logger): Логгер.
+            user_id (UserIdType): Id пользователя, с аккаунтом которого хранится кэш.
+            password (str): Пароль пользователя для шифрования профилей.
+            fetch (Callable[[str], Future[str]]): Запрос данных из DHT по ключу (DHT_Client.get_async).
+            ttl (float): Сколько секунд профиль используется без обновления.
+            max_stale (float): До какого возраста устаревший профиль используется, пока обновляется в фоне.
+        """
+        self._logger: Logger = logger
+        self._user_id: UserIdType = user_id
+        self._password: bytes = password.encode()
+        self._fetch: Callable[[str], 'Future[str]'] = fetch
+        self._ttl: float = ttl
+        self._max_stale: float = max_stale
+
+        self._lock: threading.Lock = threading.Lock()
+        self._entries: Dict[str, _CacheEntry] = {}  # Хэш DHT ключа -> запись
+        self._refreshing: Set[str] = set()          # Хэши ключей, обновление которых уже запущено
+        self._load()
+
+    def get(self, key: str) -> DHTPeerProfile:
+        """
+            Возвращает профиль собеседника, по возможности без обращения к DHT.
+
+        Args:
+            key (str): DHT ключ собеседника.
+
+        Returns:
+            DHTPeerProfile: Профиль собеседника.
+
+        Raises:
+            EmptyDHTDataError: Если профиля нет ни в кэше, ни в DHT.
+            ValidationError: Если данные из DHT не являются профилем.
+        """
+        entry = self.peek(key)
+        if entry is not None:
+            age = time.time() - entry.updated_at
+            if age < self._ttl:
+                return entry.profile
+            if age < self._max_stale:
+                self.refresh(key)
+                return entry.profile
+
+        profile = DHTPeerProfile.parse_raw(self._fetch(key).result())
+        self.put(key, profile)
+        return profile
+
+    def prefetch(self, keys: Iterable[str]) -> Dict[str, bool]:
+        """
+            Параллельно обновляет из DHT все профили, которые отсутствуют в кэше или устарели.
+
+        Args:
+            keys (Iterable[str]): DHT ключи собеседников.
+
+        Returns:
+            Dict[str, bool]: DHT ключ -> найден ли актуальный профиль собеседника.
+        """
+        reachable: Dict[str, bool] = {}
+        requests: Dict[str, 'Future[str]'] = {}
+        for key in keys:
+            entry = self.peek(key)
+            if entry is not None and time.time() - entry.updated_at < self._ttl:
+                reachable[key] = True
+                continue
+
+            future = self.refresh(key)
+            if future is not None:
+                requests[key] = future
+            else:
+                # Профиль уже обновляется другим запросом
+                reachable[key] = entry is not None
+
+        wait(requests.values())
+        for key, future in requests.items():
+            reachable[key] = future.exception() is None and bool(future.result())
+        return reachable
+
+    def peek(self, key: str) -> Union[_CacheEntry, None]:
+        """
+            Возвращает запись кэша без обращения к DHT, даже если она устарела.
+
+        Args:
+            key (str): DHT ключ собеседника.
+
+        Returns:
+            Union[_CacheEntry, None]: Запись или None, если профиля в кэше нет.
+        """
+        with self._lock:
+            return self._entries.get(self._hash(key))
+
+    def put(self, key: str, profile: DHTPeerProfile) -> None:
+        """
+            Сохраняет полученный из DHT профиль.
+
+        Args:
+            key (str): DHT ключ собеседника.
+            profile (DHTPeerProfile): Профиль собеседника.
+        """
+        key_hash = self._hash(key)
+        entry = _CacheEntry(profile=profile, updated_at=time.time())
+        with self._lock:
+            self._entries[key_hash] = entry
+        try:
+            AccountDatabaseManager.save_dht_profile(
+                self._user_id, key_hash, Encrypter.encrypt_with_aes(self._password, profile.model_dump_json()), entry.updated_at
+            )
+        except DatabaseSetDataError as e:
+            self._logger.error(f'{e}')
+
+    def invalidate(self, key: str) -> None:
+        """
+            Удаляет профиль из кэша, например, если по сохраненному адресу не удалось подключиться.
+
+        Args:
+            key (str): DHT ключ собеседника.
+        """
+        key_hash = self._hash(key)
+        with self._lock:
+            self._entries.pop(key_hash, None)
+        try:
+            AccountDatabaseManager.delete_dht_profile(self._user_id, key_hash)
+        except DatabaseSetDataError as e:
+            self._logger.error(f'{e}')
+
+    def refresh(self, key: str) -> Union['Future[str]', None]:
+        """
+            Запускает фоновое обновление профиля из DHT. Повторный вызов до завершения обновления ничего не делает.
+
+        Args:
+            key (str): DHT ключ собеседника.
+
+        Returns:
+            Union[Future[str], None]: Запрос к DHT или None, если обновление уже выполняется.
+        """
+        key_hash = self._hash(key)
+        with self._lock:
+            if key_hash in self._refreshing:
+                return None
+            self._refreshing.add(key_hash)
+
+        future = self._fetch(key)
+        future.add_done_callback(lambda done: self._on_refreshed(key, done))
+        return future
+
+    def _on_refreshed(self, key: str, future: 'Future[str]') -> None:
+        """
+            Сохраняет профиль, полученный фоновым обновлением. При ошибке остается прежний профиль.
+
+        Args:
+            key (str): DHT ключ собеседника.
+            future (Future[str]): Завершившийся запрос к DHT.
+        """
+        try:
+            self.put(key, DHTPeerProfile.parse_raw(future.result()))
+        except Exception as e:
+            self._logger.debug(f'Не удалось обновить профиль [{key}] из DHT. Ошибка [{e}].')
+        finally:
+            with self._lock:
+                self._refreshing.discard(self._hash(key))
+
+    def _load(self) -> None:
+        """
+            Загружает сохраненные профили пользователя. Записи, которые не удалось расшифровать, пропускаются.
+        """
+        try:
+            rows = AccountDatabaseManager.fetch_dht_profiles(self._user_id)
+        except DatabaseGetDataError as e:
+            self._logger.error(f'{e}')
+            return
+
+        for key_hash, profile, updated_at in rows:
+            try:
+                self._entries[key_hash] = _CacheEntry(
+                    profile=DHTPeerProfile.parse_raw(Encrypter.decrypt_with_aes(self._password, profile)),
+                    updated_at=updated_at
+                )
+            except Exception:
+                continue
+        self._logger.debug(f'Загружено [{len(self._entries)}] профилей из кэша DHT для [{self._user_id}].')
+
+    @staticmethod
+    def _hash(key: str) -> str:
+        """
+            Возвращает хэш DHT ключа, под которым профиль хранится в кэше.
+
+        Args:
+            key (str): DHT ключ.
+
+        Returns:
+            str: Хэш ключа (sha256).
+        """
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
@@ -0,0 +1,161 @@
+from collections import deque
+from dataclasses import dataclass
+from logging import Logger
+import threading
+from typing import Any, Callable, Deque, Dict, Hashable, List, Tuple, Union
+
+from config import config
+
+EventHandler = Callable[[Any], None]                # Обработчик одного события
+BatchEventHandler = Callable[[List[Any]], None]     # Обработчик пачки событий одной полосы
+EventKey = Callable[[Any], Hashable]                # Ключ полосы, в которой события обрабатываются строго по порядку
+
+@dataclass
+class _Subscription:
+    """ Подписка на тип события. """
+    handler: Union[EventHandler, BatchEventHandler] # Обработчик
+    key: EventKey                                   # Ключ полосы
+    batched: bool                                   # Обработчик принимает пачку событий
+
+class EventBus:
+    """
+        Шина событий с подпиской по типу события и ограниченным пулом потоков.
+
+        События с одинаковым ключом (например, идентификатором собеседника) попадают в одну полосу
+        и обрабатываются строго в порядке публикации, но никогда одновременно двумя потоками.
+        Разные полосы обрабатываются параллельно. Поток забирает из полосы сразу до MAX_BATCH событий,
+        и подряд идущие события одной подписки с batched=True передаются обработчику одним списком.
+    """
+    def __init__(self, logger: Logger, workers: int = config.EVENTS.WORKERS, max_batch: int = config.EVENTS.MAX_BATCH,
+                 max_pending: int = config.EVENTS.MAX_PENDING) -> None:
+        """
+            Создает шину и запускает потоки обработки.
+
+        Args:
+            logger (Logger): Логгер для записи ошибок обработчиков.
+            workers (int): Количество потоков обработки.
+            max_batch (int): Сколько событий полосы поток забирает за раз.
+            max_pending (int): Сколько необработанных событий может накопиться, прежде чем publish начнет ждать.
+        """
+        self._logger: Logger = logger
+        self._max_batch: int = max_batch
+        self._max_pending: int = max_pending
+        self._subscriptions: Dict[Hashable, List[_Subscription]] = {}
+        self._lanes: Dict[Hashable, Deque[Tuple[_Subscription, Any]]] = {}  # Полосы с событиями или в обработке
+        self._ready: Deque[Hashable] = deque()  # Полосы с событиями, которые не обрабатываются ни одним потоком
+        self._pending: int = 0
+        self._is_active: bool = True
+        self._condition: threading.Condition = threading.Condition()
+
+        self._threads: List[threading.Thread] = [
+            threading.Thread(target=self._run, name=f'event-bus-{i}', daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def subscribe(self, event_type: Hashable, handler: Union[EventHandler, BatchEventHandler],
+                  key: EventKey = lambda event: None, batched: bool = False) -> None:
+        """
+            Подписывает обработчик на тип события.
+
+        Args:
+            event_type (Hashable): Тип события.
+            handler (Union[EventHandler, BatchEventHandler]): Обработчик.
+            key (EventKey): Ключ полосы события. По умолчанию все события подписки обрабатываются в одной полосе.
+            batched (bool): Обработчик принимает список событий вместо одного события.
+        """
+        with self._condition:
+            self._subscriptions.setdefault(event_type, []).append(_Subscription(handler, key, batched))
+
+    def publish(self, event_type: Hashable, event: Any) -> None:
+        """
+            Передает событие всем подписчикам его типа.
+
+            Если необработанных событий накопилось max_pending, вызов ждет, пока обработчики их разберут.
+
+        Args:
+            event_type (Hashable): Тип события.
+            event (Any): Событие.
+        """
+        with self._condition:
+            for subscription in self._subscriptions.get(event_type, ()):
+                self._condition.wait_for(lambda: not self._is_active or self._pending < self._max_pending)
+                if not self._is_active:
+                    return
+
+                lane_key: Hashable = subscription.key(event)
+                lane = self._lanes.get(lane_key)
+                if lane is None:
+                    lane = self._lanes[lane_key] = deque()
+                    self._ready.append(lane_key)
+                    self._condition.notify_all()
+                lane.append((subscription, event))
+                self._pending += 1
+
+    def stop(self) -> None:
+        """ Останавливает потоки обработки. Необработанные события отбрасываются. """
+        with self._condition:
+            self._is_active = False
+            self._lanes.clear()
+            self._ready.clear()
+            self._condition.notify_all()
+
+    def _run(self) -> None:
+        """
+            Забирает готовую полосу, обрабатывает пачку ее событий и возвращает полосу в очередь, если в ней что-то осталось.
+        """
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: not self._is_active or bool(self._ready))
+                if not self._is_active:
+                    return
+                lane_key: Hashable = self._ready.popleft()
+                lane = self._lanes[lane_key]
+                items: List[Tuple[_Subscription, Any]] = [lane.popleft() for _ in range(min(len(lane), self._max_batch))]
+
+            self._deliver(items)
+
+            with self._condition:
+                self._pending -= len(items)
+                if not self._is_active:
+                    return
+                # Полоса остается в словаре, пока ее обрабатывает поток, поэтому publish не отдаст ее второму потоку
+                if lane:
+                    self._ready.append(lane_key)
+                else:
+                    del self._lanes[lane_key]
+                self._condition.notify_all()
+
+    def _deliver(self, items: List[Tuple[_Subscription, Any]]) -> None:
+        """
+            Вызывает обработчики, объединяя подряд идущие события одной подписки с batched=True.
+
+        Args:
+            items (List[Tuple[_Subscription, Any]]): События полосы в порядке публикации.
+        """
+        position: int = 0
+        while position < len(items):
+            subscription: _Subscription = items[position][0]
+            if not subscription.batched:
+                self._call(subscription.handler, items[position][1])
+                position += 1
+                continue
+
+            batch: List[Any] = []
+            while position < len(items) and items[position][0] is subscription:
+                batch.append(items[position][1])
+                position += 1
+            self._call(subscription.handler, batch)
+
+    def _call(self, handler: Union[EventHandler, BatchEventHandler], argument: Any) -> None:
+        """
+            Вызывает обработчик, не давая его ошибке остановить поток обработки.
+
+        Args:
+            handler (Union[EventHandler, BatchEventHandler]): Обработчик.
+            argument (Any): Событие или список событий.
+        """
+        try:
+            handler(argument)
+        except Exception as e:
+            self._logger.error(f"Произошла ошибка при обработке события. Ошибка [{e}].")
@@ -1,8 +1,8 @@
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Literal, Union
 
-from config import FilenameType
+from config import FilenameType, PathType
 
 MessageIdType = str
 ISO_FormatData = str
@@ -18,8 +18,10 @@ class MessageTextData(BaseModel):
     message: str
 
 class MessageFileData(BaseModel):
-    raw_data: str
+    raw_data: str = ''      # Содержимое файла в Base64 (только для клиентов без потоковой передачи)
     filename: FilenameType
+    size: int = 0           # Размер файла в байтах
+    path: PathType = Field(default='', exclude=True)  # Локальный путь к файлу, по сети не передается
 
 class MessageData(BaseModel):
     type: MessageType
@@ -1,7 +1,11 @@
 import base64
-from dataclasses import dataclass
-from enum import Enum
+from bisect import bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from enum import Enum, IntEnum
+import functools
 import hashlib
+import itertools
 import json
 from logging import Logger
 import os
@@ -10,19 +14,27 @@ import random
 import re
 import socket
 import string
+import struct
 import threading
 import time
-from typing import Any, Dict, List, NamedTuple, Tuple, Union
-from pydantic import BaseModel, ValidationError
+import uuid
+from typing import Any, Callable, Dict, Hashable, Iterable, List, NamedTuple, Tuple, Type, TypeVar, Union
+from Crypto.Signature.pkcs1_15 import PKCS115_SigScheme
+from pydantic import BaseModel, Field, PrivateAttr, ValidationError
 import requests
 
-from config import UserIdHashType, config, IPAddressType, PortType, FilenameType, UserIdType
-from dht import DHT_Client, DHTPeerProfile
+from config import UserIdHashType, config, IPAddressType, PortType, FilenameType, PathType, UserIdType
+from dht import DHT_Client, DHTPeerProfile, EmptyDHTDataError
 from libs.cryptography import B64_FormatData, EncryptedData, Encrypter, PEM_FormatData, RSA_KeyType
-from libs.database import AccountDatabaseManager, DatabaseCreationError, DatabaseGetDataError, DatabaseSetDataError, HistoryDatabaseManager, KeyLoadingError
+from libs.database import AccountDatabaseManager, DatabaseConnectionPool, DatabaseCreationError, DatabaseGetDataError, DatabaseSetDataError, HistoryDatabaseManager, HistoryWriteQueue, KeyLoadingError
+from libs.dht_cache import DHTProfileCache
+from libs.events import EventBus
 from libs.message import *
+from libs.scheduler import Scheduler, TimerHandle
 from libs.structs import ClientInfo, DHTNodeHistory, KnownRSAPublicKeys
-from libs.widgets import ClientDecision, CustomMessageBox, CustomMessageType, DialogManager, YesNoDialog
+from libs.sync import HistorySummary, SyncPlan, build_sync_plan, build_sync_plan_from_summary, change_perception
+from libs.transfer import IncomingTransferRecord, OutgoingTransferRecord, TransferIdType, TransferJournal
+from libs.widgets import ClientDecision, CustomMessageBox, CustomMessageType, DialogManager, UIUpdateQueue, YesNoDialog
 
 class UnavailableSessionIdError(Exception):
     """Исключение возникает при указании недопустимого идентификатора сеанса."""
@@ -41,6 +53,27 @@ class NetworkCommands(Enum):
     SYNC_DATA = "6"    # Синхронизация данных
     EXISTS = "7"       # Сессия уже открыта
     CONNECTING_TO_OURSELVES = "8" # Подключение к самому себе
+    FILE_OFFER = "9"   # Начало потоковой передачи файла
+    FILE_CHUNK = "10"  # Очередной блок файла
+    FILE_DONE = "11"   # Завершение потоковой передачи файла
+    FILE_ACK = "12"    # Подтверждение принятой части файла
+    SEND_BATCH = "13"  # Пакет сообщений истории при синхронизации
+    RECV_BATCH = "14"  # Общее подтверждение пакета сообщений
+    RECV_SACK = "15"   # Накопительное и выборочное подтверждение сообщений по номерам
+
+class ProtocolVersion(IntEnum):
+    """ Версии сетевого протокола, согласуемые клиентами при INIT/ACK. """
+    LEGACY_JSON = 0     # Кадры JSON с данными в Base64 (старые клиенты)
+    BINARY_FRAMES = 1   # Бинарные кадры с фиксированным заголовком
+    CHUNKED_FILES = 2   # Потоковая передача файлов блоками (FILE_OFFER/FILE_CHUNK/FILE_DONE)
+    RESUMABLE_FILES = 3 # Подтверждение блоков (FILE_ACK) и докачка файлов после переподключения
+    SESSION_AEAD = 4    # Кадры после рукопожатия защищаются AES-GCM на сессионном ключе вместо подписи RSA
+    HISTORY_RANGES = 5  # ACK и SYNC_DATA передают идентификаторы истории диапазонами (HistorySummary), а не списком
+    BATCHED_SYNC = 6    # Сообщения при синхронизации передаются пакетами (SEND_BATCH/RECV_BATCH)
+    SEQUENCED_ACKS = 7  # SEND_DATA нумеруются, подтверждения объединяются в RECV_SACK вместо RECV_DATA на каждое сообщение
+
+# Максимальная версия протокола, которую поддерживает наш клиент
+PROTOCOL_VERSION: ProtocolVersion = max(ProtocolVersion)
 
 class AdditionalData(BaseModel):
     """ Дополнительные данные, связанные с сетевым сообщением. """
@@ -48,6 +81,19 @@ class AdditionalData(BaseModel):
     user_name: str = ''                     # Имя пользователя
     ecdh_public_key: 'PEM_FormatData' = ''  # Публичный ключ участника в формате PEM, для использования в ECDH
     resend_flag: bool = False               # Флаг для повторной отправки
+    protocol_version: int = ProtocolVersion.LEGACY_JSON # Версия протокола: в INIT - максимальная, в ACK - согласованная
+
+    def dump_without_version(self) -> str:
+        """
+            Сериализует данные без версии протокола.
+
+            В таком виде данные подписываются в signature_additional: старые клиенты не знают поля protocol_version
+            и проверяют подпись по своей сериализации. Версия протокола подписывается отдельно (signature_protocol).
+
+        Returns:
+            str: JSON без поля protocol_version.
+        """
+        return self.model_dump_json(exclude={'protocol_version'})
 
 class NetworkData(BaseModel):
     """ Описание структуры сетевых данных для передачи. """
@@ -56,6 +102,215 @@ class NetworkData(BaseModel):
     signature: 'B64_FormatData'             # Подпись в формате Base64
     additional: AdditionalData              # Дополнительные данные с метаинформацией
     signature_additional: 'B64_FormatData' = '' # Подпись в формате Base64
+    signature_protocol: 'B64_FormatData' = ''   # Подпись дополнительных данных вместе с версией протокола (только INIT/ACK)
+    _plaintext: Union[bytes, None] = PrivateAttr(default=None) # Расшифрованные данные кадра AEAD (не передаются)
+
+class FileOfferData(BaseModel):
+    """ Описание файла, который собеседник собирается передать блоками. """
+    transfer_id: TransferIdType # Идентификатор передачи (uuid4 в hex)
+    filename: FilenameType      # Имя файла
+    size: int = Field(ge=0, lt=2 ** 63)  # Размер файла в байтах (слишком большие файлы отклоняются отдельно, с ответом отправителю)
+    chunk_size: int = Field(gt=0, le=config.NETWORK.FILE_TRANSFER.MAX_CHUNK_SIZE) # Размер одного блока в байтах
+
+class FileDoneData(BaseModel):
+    """ Завершение передачи файла. """
+    transfer_id: TransferIdType # Идентификатор передачи
+    sha256: str                 # Хэш всего файла для проверки целостности
+
+class FileAckData(BaseModel):
+    """ Подтверждение принятой части файла. """
+    transfer_id: TransferIdType # Идентификатор передачи
+    offset: int                 # Количество байт, непрерывно записанных получателем с начала файла
+    completed: bool = False     # Файл полностью получен и проверен (или отклонен), передачу можно удалить из журнала
+    rejected: bool = False      # Получатель отказался принимать файл
+
+# Данные служебных кадров передачи файлов, которые разбираются с проверкой идентификатора передачи
+FileFrameData = TypeVar('FileFrameData', FileOfferData, FileDoneData, FileAckData)
+
+class MessageBatchData(BaseModel):
+    """ Пакет текстовых сообщений, досылаемых при синхронизации истории. """
+    messages: List[MessageTextData]     # Сообщения в восприятии отправителя
+
+class SequenceAckData(BaseModel):
+    """ Накопительное и выборочное подтверждение сообщений по номерам. """
+    cumulative: int                     # Все сообщения с номерами меньше этого получены
+    sack: List[Tuple[int, int]] = []    # Полученные диапазоны номеров [начало, конец) после накопительной границы
+
+# Время отправки PING (time.monotonic_ns), которое собеседник возвращает в PONG для измерения RTT
+PING_HEADER: struct.Struct = struct.Struct('!Q')
+
+# Номер сообщения в начале зашифрованных данных SEND_DATA
+SEQUENCE_HEADER: struct.Struct = struct.Struct('!Q')
+
+# Заголовок блока файла внутри зашифрованных данных: идентификатор передачи (16 байт) и номер блока
+FILE_CHUNK_HEADER: struct.Struct = struct.Struct('!16sQ')
+
+@dataclass
+class _IncomingFile:
+    """ Состояние принимаемого блоками файла. """
+    record: IncomingTransferRecord  # Запись журнала передачи
+    file: Any               # Открытый на запись временный файл
+    file_hash: Any          # Хэш уже полученных данных
+    received_size: int = 0  # Количество записанных байт
+    next_index: int = 0     # Номер ожидаемого блока
+
+@dataclass
+class _OutgoingFile:
+    """ Состояние отправляемого блоками файла. """
+    record: OutgoingTransferRecord  # Запись журнала передачи
+    condition: threading.Condition = field(default_factory=threading.Condition)  # Ожидание подтверждений от получателя
+    acked_size: int = -1    # Подтвержденное получателем смещение (-1 - ответа на FILE_OFFER еще не было)
+    is_rejected: bool = False   # Получатель отказался принимать файл
+
+@dataclass
+class _ReceiveWindow:
+    """ Номера полученных сообщений и состояние отложенного подтверждения. """
+    next_sequence: int = 0  # Все номера меньше этого получены
+    received_ranges: List[List[int]] = field(default_factory=list)  # Полученные диапазоны [начало, конец) после границы
+    pending: int = 0        # Сколько сообщений получено с момента последнего подтверждения
+    timer: Union[TimerHandle, None] = None  # Таймер отложенного подтверждения
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+class FileTooLargeError(Exception):
+    """Исключение возникает, когда файл превышает допустимый для передачи размер."""
+    def __init__(self, message="Файл слишком большой для передачи."):
+        self.message = message
+        super().__init__(self.message)
+
+class FrameDecodingError(ValueError):
+    """Исключение возникает, когда полученный бинарный кадр не удается разобрать."""
+    def __init__(self, message="Не удалось разобрать бинарный кадр."):
+        self.message = message
+        super().__init__(self.message)
+
+class BinaryFrameCodec:
+    """
+        Кодирует NetworkData в бинарный кадр и обратно.
+
+        Формат кадра (big-endian):
+            magic (1) | version (1) | command (1) | flags (1) | len(ciphertext) (4) | len(iv) (1) |
+            len(signature) (2) | len(additional) (2) | len(signature_additional) (2),
+            после заголовка идут сырые байты ciphertext, iv, signature, additional (JSON) и signature_additional.
+
+        Первый байт JSON кадра всегда '{', поэтому формат кадра однозначно определяется по первому байту.
+    """
+    MAGIC: int = 0xB1
+    VERSION: int = 1
+    HEADER: struct.Struct = struct.Struct('!BBBBIBHHH')
+
+    FLAG_RESEND: int = 0x01      # Флаг повторной отправки (AdditionalData.resend_flag)
+    FLAG_ADDITIONAL: int = 0x02  # В кадре передается AdditionalData целиком
+
+    @staticmethod
+    def is_binary(raw_data: bytes) -> bool:
+        """
+            Проверяет, является ли кадр бинарным.
+
+        Args:
+            raw_data (bytes): Полученный кадр.
+
+        Returns:
+            bool: True - если кадр бинарный, иначе False (JSON).
+        """
+        return len(raw_data) > 0 and raw_data[0] == BinaryFrameCodec.MAGIC
+
+    @staticmethod
+    def encode(data: 'NetworkData') -> bytes:
+        """
+            Кодирует сетевые данные в бинарный кадр.
+
+        Args:
+            data (NetworkData): Данные для кодирования.
+
+        Returns:
+            bytes: Бинарный кадр.
+        """
+        ciphertext: bytes = Encrypter.decode_from_b64(data.encrypted_data.data_b64)
+        iv: bytes = Encrypter.decode_from_b64(data.encrypted_data.iv_b64)
+        signature: bytes = Encrypter.decode_from_b64(data.signature)
+        signature_additional: bytes = Encrypter.decode_from_b64(data.signature_additional)
+
+        flags: int = 0
+        additional: bytes = b''
+        if data.additional.resend_flag:
+            flags |= BinaryFrameCodec.FLAG_RESEND
+        # AdditionalData передается целиком, только если в нем есть что-то кроме флага повторной отправки
+        if data.signature_additional or data.additional != AdditionalData(resend_flag=data.additional.resend_flag):
+            flags |= BinaryFrameCodec.FLAG_ADDITIONAL
+            # Версия протокола передается только в рукопожатии, а оно всегда идет в JSON
+            additional = data.additional.dump_without_version().encode('utf-8')
+
+        header: bytes = BinaryFrameCodec.HEADER.pack(
+            BinaryFrameCodec.MAGIC,
+            BinaryFrameCodec.VERSION,
+            int(data.command_type.value),
+            flags,
+            len(ciphertext),
+            len(iv),
+            len(signature),
+            len(additional),
+            len(signature_additional)
+        )
+        return b''.join((header, ciphertext, iv, signature, additional, signature_additional))
+
+    @staticmethod
+    def decode(raw_data: bytes) -> 'NetworkData':
+        """
+            Декодирует бинарный кадр в сетевые данные.
+
+        Args:
+            raw_data (bytes): Бинарный кадр.
+
+        Returns:
+            NetworkData: Полученные данные.
+
+        Raises:
+            FrameDecodingError: Если кадр поврежден или имеет неподдерживаемую версию.
+        """
+        header_size: int = BinaryFrameCodec.HEADER.size
+        if len(raw_data) < header_size:
+            raise FrameDecodingError(f'Размер кадра [{len(raw_data)}] меньше размера заголовка [{header_size}].')
+
+        magic, version, command, flags, ciphertext_len, iv_len, signature_len, additional_len, signature_additional_len = \
+            BinaryFrameCodec.HEADER.unpack_from(raw_data)
+
+        if magic != BinaryFrameCodec.MAGIC or version != BinaryFrameCodec.VERSION:
+            raise FrameDecodingError(f'Неподдерживаемая версия бинарного кадра [{version}].')
+
+        lengths = (ciphertext_len, iv_len, signature_len, additional_len, signature_additional_len)
+        if header_size + sum(lengths) != len(raw_data):
+            raise FrameDecodingError(f'Размер кадра [{len(raw_data)}] не совпадает с заголовком.')
+
+        try:
+            command_type = NetworkCommands(str(command))
+        except ValueError:
+            raise FrameDecodingError(f'Неизвестная команда [{command}].')
+
+        # Нарезаем тело кадра на поля без промежуточных копий
+        fields: List[bytes] = []
+        view = memoryview(raw_data)
+        offset = header_size
+        for length in lengths:
+            fields.append(bytes(view[offset:offset + length]))
+            offset += length
+        ciphertext, iv, signature, additional, signature_additional = fields
+
+        if flags & BinaryFrameCodec.FLAG_ADDITIONAL:
+            additional_data = AdditionalData.parse_raw(additional)
+        else:
+            additional_data = AdditionalData.model_construct(resend_flag=bool(flags & BinaryFrameCodec.FLAG_RESEND))
+
+        # Данные уже прошли проверку структуры, поэтому собираем модели без валидации pydantic
+        return NetworkData.model_construct(
+            command_type=command_type,
+            encrypted_data=EncryptedData.model_construct(
+                data_b64=Encrypter.encode_to_b64(ciphertext),
+                iv_b64=Encrypter.encode_to_b64(iv)
+            ),
+            signature=Encrypter.encode_to_b64(signature),
+            additional=additional_data,
+            signature_additional=Encrypter.encode_to_b64(signature_additional)
+        )
 
 class NetworkEventType(Enum):
     """ Определяет типы событий в сетевом взаимодействии. """
@@ -71,6 +326,7 @@ class NetworkEventType(Enum):
     UNKNOWN_RSA_PUBLIC_KEY = 9 # Неизвестный публичный ключ RSA
     FAILED_CONNECT = 10        # Не удалось подключиться
     LOGOUT = 11                # Выход из аккаунта
+    FILE_RECEIVED = 12         # Файл полностью получен и сохранен на диск
 
 @dataclass
 class NetworkEventData:
@@ -105,6 +361,26 @@ class __SessionCloseEvent(threading.Event):
 active_users: List[str] = []
 session_close_event: __SessionCloseEvent = __SessionCloseEvent()
 
+def _add_to_ranges(ranges: List[List[int]], number: int) -> None:
+    """
+        Добавляет номер в отсортированный список непересекающихся полуинтервалов [начало, конец), объединяя соседние.
+
+    Args:
+        ranges (List[List[int]]): Диапазоны (изменяются на месте).
+        number (int): Добавляемый номер.
+    """
+    position: int = bisect_right(ranges, [number, float('inf')])  # Первый диапазон, начинающийся после номера
+    if position > 0 and ranges[position - 1][1] >= number:
+        if ranges[position - 1][1] > number:
+            return  # Номер уже получен
+        ranges[position - 1][1] += 1
+        if position < len(ranges) and ranges[position][0] == ranges[position - 1][1]:
+            ranges[position - 1][1] = ranges.pop(position)[1]
+    elif position < len(ranges) and ranges[position][0] == number + 1:
+        ranges[position][0] = number
+    else:
+        ranges.insert(position, [number, number + 1])
+
 class UserSession:
     """ Управляет сетевой сессией пользователя, включая сетевые операции, шифрование и логирование. """
     
@@ -112,7 +388,7 @@ class UserSession:
 
     def __init__(self, connection_socket: socket.socket, remote_address: Tuple[IPAddressType, PortType],
                  user_id_hash: UserIdHashType, user_name: str, user_password: str, peer_rsa_public_key: RSA_KeyType,
-                 logger: Logger, event: NetworkEvent) -> None:
+                 logger: Logger, event: NetworkEvent, scheduler: Scheduler) -> None:
         """
         Инициализирует новую сессию пользователя.
 
@@ -123,6 +399,7 @@ class UserSession:
             user_name (str): Имя пользователя.
             logger (Logger): Логгер для записи событий сессии.
             event (NetworkEvent): Сетевое событие, связанное с сессией.
+            scheduler (Scheduler): Общий для всех сессий планировщик таймеров.
         """
         self._connection_socket: socket.socket = connection_socket
         self._remote_address: Tuple[IPAddressType, PortType] = remote_address
@@ -131,16 +408,26 @@ class UserSession:
         self._user_password: str = user_password
         self._peer_user_id_hash: UserIdHashType = ''  # Идентификатор собеседника
         self._peer_user_name: str = ''  # Имя собеседника
-        self._peer_rsa_public_key: RSA_KeyType = peer_rsa_public_key  # Публичный ключ собеседника для проверки подписи
+        self._peer_rsa_public_key: RSA_KeyType = ''  # Публичный ключ собеседника для проверки подписи
+        self._peer_rsa_verifier: Union[PKCS115_SigScheme, None] = None  # Объект проверки подписей собеседника
+        if peer_rsa_public_key:
+            self._set_peer_rsa_public_key(peer_rsa_public_key)
         self._logger: Logger = logger
         self._is_active: bool = True  # Флаг активности сессии
-        self._last_ping_time: float = time.time()  # Время последнего пинга
+        self._last_ping_time: float = time.time()  # Время последнего кадра от собеседника
+        self._last_send_time: float = time.time()  # Время последнего кадра собеседнику
+        self._last_data_time: float = time.time()  # Время последнего кадра с данными (не PING/PONG) в любую сторону
+        self._srtt: Union[float, None] = None      # Сглаженное время кругового обхода (RFC 6298)
+        self._rttvar: float = 0.0                  # Разброс времени кругового обхода
         self._event: NetworkEvent = event
+        self._scheduler: Scheduler = scheduler
+        self._keepalive_timer: Union[TimerHandle, None] = None  # Таймер следующей проверки соединения
 
         # Переменная, отвечающая за решение пользователя
         # Используется, когда необходимо установить какие-либо значения, которые пользователь выбирает в UI
         # (допустим, нужно, чтобы он ответил Да/нет)
         self._client_decision: ClientDecision = ClientDecision.NONE
+        self._client_decision_condition: threading.Condition = threading.Condition()  # Пробуждение ожидающих решения
 
         self._crypto: Encrypter = Encrypter(keys_path=config.PATHS.KEYS, user_id_hash=self._user_id_hash, user_password=user_password)
         self._database: HistoryDatabaseManager = HistoryDatabaseManager(user_id_hash=self._user_id_hash, user_password=user_password, logger=self._logger)
@@ -148,18 +435,38 @@ class UserSession:
         self._session_id: int = UserSession.session_counter
         UserSession.session_counter += 1
 
-        self._dialog_history: List[MessageTextData] = []  # История диалога
-        self._dialog_history_ids: List[MessageIdType] = []  # Идентификаторы сообщений в истории
+        self._dialog_history: List[MessageTextData] = []  # Последняя страница истории диалога (для отображения при подключении)
+        self._dialog_history_ids: Dict[MessageIdType, None] = {}  # Идентификаторы сообщений в истории (упорядоченное множество)
         self._outbound_message_buffer: Dict[MessageIdType, MessageTextData] = {}  # Буфер исходящих сообщений
+        # Буфер меняют поток кадров (подтверждения) и фоновая синхронизация, поэтому проверка и удаление идут под блокировкой
+        self._outbound_lock: threading.Lock = threading.Lock()
+        self._send_sequence: 'itertools.count[int]' = itertools.count()  # Номера исходящих сообщений сессии
+        self._unacked_sequences: Dict[int, Tuple[MessageIdType, bool]] = {}  # Номер -> (идентификатор, флаг повторной отправки)
+        self._unacked_lock: threading.Lock = threading.Lock()
+        self._receive_window: _ReceiveWindow = _ReceiveWindow()  # Полученные номера сообщений собеседника
 
         self._int_size_for_message_length: int = 4  # Размер целого числа для длины сообщения
+        self._peer_protocol_version: int = ProtocolVersion.LEGACY_JSON  # Согласованная с собеседником версия протокола
 
-        self._thread_client_handler = threading.Thread(target=self._handle_client, daemon=True)
-        self._thread_client_handler.start()
+        self._send_lock: threading.Lock = threading.Lock()  # Блокировка записи кадров в сокет из разных потоков
+        self._incoming_files: Dict[str, _IncomingFile] = {}  # Принимаемые блоками файлы
+        self._outgoing_files: Dict[str, _OutgoingFile] = {}  # Отправляемые блоками файлы
+        self._transfer_journal: TransferJournal = TransferJournal(self._user_id_hash, self._logger)  # Журнал незавершенных передач
+
+        self._thread_client_handler: Union[threading.Thread, None] = None  # Поток обработки входящих кадров
 
     def get_id(self) -> int:
         return self._session_id
 
+    def start(self) -> None:
+        """
+            Запускает обработку входящих кадров.
+
+            Для исходящего соединения вызывается после подключения сокета, чтобы поток не начал читать из еще не подключенного сокета.
+        """
+        self._thread_client_handler = threading.Thread(target=self._handle_client, daemon=True)
+        self._thread_client_handler.start()
+
     def set_client_decision(self, decision: ClientDecision) -> None:
         """
             Устанавливает значение поля _client_decision в одно из нескольких состояний:
@@ -170,7 +477,9 @@ class UserSession:
         Args:
             decision (ClientDecision): Тип состояния. 
         """
-        self._client_decision = decision
+        with self._client_decision_condition:
+            self._client_decision = decision
+            self._client_decision_condition.notify_all()
 
     def connect(self) -> int:
         """
@@ -185,34 +494,8 @@ class UserSession:
             
             # Установление соединения с помощью сокета
             self._connection_socket.connect(self._remote_address)
-
-            # Кодирование начального сообщения в Base64 и его подпись
-            initial_message_b64: B64_FormatData = Encrypter.encode_to_b64(self._crypto.get_rsa_public_key())
-            encrypted_data: EncryptedData = EncryptedData(
-                data_b64=initial_message_b64,
-                iv_b64=''
-            )
-            encrypted_data_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_data.model_dump_json())
-            message_signature_b64: B64_FormatData = self._crypto.sign_message(encrypted_data_b64)
-
-            additional_info: AdditionalData = AdditionalData(
-                user_id_hash=self._user_id_hash,
-                user_name=self._user_name,
-                ecdh_public_key=self._crypto.get_public_key()  # Получение публичного ключа для обмена
-            )
-            additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.model_dump_json())
-            additional_info_signature_b64: B64_FormatData = self._crypto.sign_message(additional_info_b64)
-
-
-            # Сборка данных для отправки
-            data_to_send = NetworkData(
-                command_type=NetworkCommands.INIT,
-                encrypted_data=encrypted_data,
-                signature=message_signature_b64,
-                additional=additional_info,
-                signature_additional=additional_info_signature_b64
-            )
-            self._send_network_data(data_to_send)
+            self.start()
+            self._send_init()
 
             return self._session_id  # Возврат идентификатора сессии при успешном соединении
         
@@ -221,6 +504,40 @@ class UserSession:
             self._logger.debug(f'Произошло закрытие сокета. Завершаю сессию.')
             return -1  # Возврат -1 при ошибке
 
+    def _send_init(self) -> None:
+        """
+            Отправляет инициализационное сообщение INIT с нашим публичным RSA ключом.
+        """
+        # Кодирование начального сообщения в Base64 и его подпись
+        initial_message_b64: B64_FormatData = Encrypter.encode_to_b64(self._crypto.get_rsa_public_key())
+        encrypted_data: EncryptedData = EncryptedData(
+            data_b64=initial_message_b64,
+            iv_b64=''
+        )
+        encrypted_data_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_data.model_dump_json())
+        message_signature_b64: B64_FormatData = self._crypto.sign_message(encrypted_data_b64)
+
+        additional_info: AdditionalData = AdditionalData(
+            user_id_hash=self._user_id_hash,
+            user_name=self._user_name,
+            ecdh_public_key=self._crypto.get_public_key(),  # Получение публичного ключа для обмена
+            protocol_version=PROTOCOL_VERSION
+        )
+        additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.dump_without_version())
+        additional_info_signature_b64: B64_FormatData = self._crypto.sign_message(additional_info_b64)
+
+
+        # Сборка данных для отправки
+        data_to_send = NetworkData(
+            command_type=NetworkCommands.INIT,
+            encrypted_data=encrypted_data,
+            signature=message_signature_b64,
+            additional=additional_info,
+            signature_additional=additional_info_signature_b64,
+            signature_protocol=self._sign_protocol_version(additional_info)
+        )
+        self._send_network_data(data_to_send)
+
     def send(self, message: MessageData, is_resended: bool = False) -> None:
         """
             Отправляет сообщение указанному клиенту.
@@ -229,28 +546,37 @@ class UserSession:
             message (MessageData): Сообщение для отправки.
             is_resended (bool): Флаг, указывающий, нужно ли повторно отправить сообщение.
 
+        Raises:
+            FileTooLargeError: Если собеседник не поддерживает потоковую передачу, а файл превышает допустимый размер.
+
+        Примечание:
+            Файлы собеседникам с поддержкой потоковой передачи отправляются блоками,
+            поэтому вызов блокируется до окончания передачи файла.
         """
-        # Сериализация данных сообщения в JSON
-        message_json = message.model_dump_json()
-        encrypted_message: EncryptedData = self._crypto.encrypt(message_json)
-        encrypted_message_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_message.model_dump_json())
-        message_signature_b64: B64_FormatData = self._crypto.sign_message(encrypted_message_b64)
+        if message.type == MessageType.File and isinstance(message.message, MessageFileData) and message.message.path:
+            if self._peer_protocol_version >= ProtocolVersion.CHUNKED_FILES:
+                self._send_file(self._create_outgoing_transfer(message.message))
+                return
+            message = self._load_file_for_legacy_peer(message.message)
 
-        # Сборка данных для отправки
-        data_to_send = NetworkData(
-            command_type=NetworkCommands.SEND_DATA,
-            encrypted_data=encrypted_message,
-            signature=message_signature_b64,
-            additional=AdditionalData(
-                resend_flag=is_resended
-            )
-        )
+        # Сериализация данных сообщения в JSON
+        payload: bytes = message.model_dump_json().encode()
+        sequence: Union[int, None] = None
+        if self._peer_protocol_version >= ProtocolVersion.SEQUENCED_ACKS:
+            sequence = next(self._send_sequence)
+            payload = SEQUENCE_HEADER.pack(sequence) + payload
+        data_to_send: NetworkData = self._build_network_data(NetworkCommands.SEND_DATA, payload, is_resended)
+
+        # Временное кэширование исходящих текстовых сообщений.
+        # Кэшируем до отправки, иначе подтверждение RECV_DATA может прийти раньше, чем сообщение попадет в буфер
+        if message.type == MessageType.Text and hasattr(message.message, 'id'):
+            with self._outbound_lock:
+                self._outbound_message_buffer[message.message.id] = message.message # type: ignore
+            if sequence is not None:
+                with self._unacked_lock:
+                    self._unacked_sequences[sequence] = (message.message.id, is_resended) # type: ignore
 
         self._send_network_data(data_to_send)
-
-        # Временное кэширование исходящих текстовых сообщений
-        if message.type == MessageType.Text and hasattr(message.message, 'id'):
-            self._outbound_message_buffer[message.message.id] = message.message # type: ignore
     
     def close(self, logout: bool = False, silent_mode: bool = False) -> None:
         """
@@ -264,7 +590,19 @@ class UserSession:
         """
         if self._is_active:
             self._is_active = False
-            self._connection_socket.close()  # Закрытие сокета соединения
+            self._close_transport()  # Закрытие сокета соединения
+
+            if self._keepalive_timer is not None:
+                self._keepalive_timer.cancel()
+            # Будим поток, ожидающий решения пользователя
+            with self._client_decision_condition:
+                self._client_decision_condition.notify_all()
+
+            # Неподтвержденные сообщения остаются в буфере собеседника и сверятся при следующем подключении
+            with self._receive_window.lock:
+                if self._receive_window.timer is not None:
+                    self._receive_window.timer.cancel()
+                    self._receive_window.timer = None
 
             # Если есть информация о собеседнике, регистрируем событие отключения
             if self._peer_user_id_hash:
@@ -273,7 +611,9 @@ class UserSession:
                 else:
                     self._send_event(NetworkEventType.DISCONNECT)
                 # Сохранение исходящих сообщений из временного буфера в базу данных
-                self._database.save_data(list(self._outbound_message_buffer.values()), is_outbound_message_buffer=True)
+                with self._outbound_lock:
+                    unsent_messages: List[MessageTextData] = list(self._outbound_message_buffer.values())
+                self._database.save_data(unsent_messages, is_outbound_message_buffer=True)
 
                 global active_users 
                 del active_users[active_users.index(self._peer_user_id_hash)]
@@ -281,20 +621,120 @@ class UserSession:
                 if not silent_mode:
                     self._send_event(NetworkEventType.FAILED_CONNECT)
 
-            # Ожидание завершения потока обработки клиента, если он был запущен
-            try:
-                self._thread_client_handler.join()
-            except RuntimeError:
-                pass  # Игнорирование ошибки, если поток уже завершен
-
-            global session_close_event
-            session_close_event.ids.put(self._session_id)
-            session_close_event.set()
+            self._wait_handler_finished()
+            # Дожидаемся записи истории диалога, чтобы следующая сессия загрузила ее полностью
+            self._database.flush()
+            self._notify_closed()
 
             # Логирование завершения сессии
             self._logger.debug(f"Сессия для клиента [{self._remote_address}][{self._peer_user_id_hash} "
                                f"| {self._peer_user_name}] завершена.")
 
+    def _close_transport(self) -> None:
+        """
+            Закрывает сокет соединения.
+        """
+        self._connection_socket.close()
+
+    def _wait_handler_finished(self) -> None:
+        """
+            Ожидает завершения потока обработки клиента, если он был запущен.
+        """
+        if self._thread_client_handler is None:
+            return
+        try:
+            self._thread_client_handler.join()
+        except RuntimeError:
+            pass  # Игнорирование ошибки, если close вызван из самого потока обработки
+
+    def _notify_closed(self) -> None:
+        """
+            Сообщает менеджеру клиентов, что сессию можно удалить.
+        """
+        global session_close_event
+        session_close_event.ids.put(self._session_id)
+        session_close_event.set()
+
+    def _run_background(self, target: Callable[..., None], *args: Any) -> None:
+        """
+            Запускает длительную задачу сессии (синхронизацию, докачку файлов) вне потока обработки кадров.
+
+        Args:
+            target (Callable[..., None]): Функция задачи.
+            *args: Аргументы функции.
+        """
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    def _start_keepalive(self) -> None:
+        """
+            Запускает постоянную проверку соединения на общем планировщике.
+        """
+        self._schedule_keepalive()
+
+    def _schedule_keepalive(self) -> None:
+        """
+            Планирует следующую проверку соединения на момент истечения интервала с последнего кадра (см. _last_activity_time).
+        """
+        if not self._is_active:
+            return
+        delay: float = max(0.0, self._keepalive_interval() - (time.time() - self._last_activity_time()))
+        self._keepalive_timer = self._scheduler.call_later(delay, self._keepalive_tick)
+
+    def _keepalive_tick(self) -> None:
+        """
+            Отправляет PING, если за интервал не было кадров (см. _last_activity_time), и планирует следующую проверку.
+        """
+        if not self._is_active:
+            return
+        if time.time() - self._last_activity_time() >= self._keepalive_interval():
+            self._send_keepalive_ping()
+        self._schedule_keepalive()
+
+    def _last_activity_time(self) -> float:
+        """
+            Возвращает время последнего кадра в любую сторону.
+
+            На любой кадр с данными собеседник отвечает подтверждением, поэтому при живом обмене
+            обе стороны получают кадры чаще таймаута и PING не нужен. Исключение - собеседники до RESUMABLE_FILES:
+            они не подтверждают части файла (FILE_ACK), и при односторонней передаче файла отправитель
+            ничего не получает. Для них учитываются только входящие кадры, иначе сессия закроется по таймауту.
+
+        Returns:
+            float: Время последнего отправленного или полученного кадра.
+        """
+        if self._peer_protocol_version < ProtocolVersion.RESUMABLE_FILES:
+            return self._last_ping_time
+        return max(self._last_ping_time, self._last_send_time)
+
+    def _keepalive_interval(self) -> float:
+        """
+            Вычисляет интервал проверки соединения.
+
+            Сразу после обмена данными используется PING.INTERVAL, при простое интервал растет
+            вместе со временем простоя до PING.MAX_INTERVAL. Сверху он ограничен таймаутом собеседника
+            за вычетом запаса на время доставки (srtt + 4 * rttvar) и задержки подтверждений.
+
+        Returns:
+            float: Интервал в секундах.
+        """
+        idle_interval: float = max(config.NETWORK.PING.INTERVAL, (time.time() - self._last_data_time) / 2)
+        rtt_margin: float = (self._srtt + 4 * self._rttvar) if self._srtt is not None else 1.0
+        timeout_limit: float = config.NETWORK.PING.TIMEOUT - rtt_margin - config.NETWORK.ACK.DELAY_MS / 1000
+        return max(1.0, min(idle_interval, config.NETWORK.PING.MAX_INTERVAL, timeout_limit))
+
+    def _update_rtt(self, sample: float) -> None:
+        """
+            Обновляет оценку времени кругового обхода по новому измерению (RFC 6298).
+
+        Args:
+            sample (float): Измеренное время кругового обхода в секундах.
+        """
+        if self._srtt is None:
+            self._srtt, self._rttvar = sample, sample / 2
+        else:
+            self._rttvar = 0.75 * self._rttvar + 0.25 * abs(self._srtt - sample)
+            self._srtt = 0.875 * self._srtt + 0.125 * sample
+
     def _send_network_data(self, data: NetworkData) -> None:
         """
             Отправляет сериализованные данные через сокет.
@@ -303,19 +743,95 @@ class UserSession:
             data (NetworkData): Объект данных, который необходимо отправить.
 
         Описание:
-            Метод сериализует объект данных в JSON, кодирует в UTF-8, определяет размер данных,
-            и отправляет размер данных вместе с самими данными через сокет. Логгирует информацию о передаче.
+            Метод сериализует объект данных в бинарный кадр (если собеседник его поддерживает) или в JSON,
+            определяет размер данных и отправляет размер данных вместе с самими данными через сокет.
+            Логгирует информацию о передаче.
+        """
+        frame_size: int = 0
+
+        def seal() -> bytes:
+            nonlocal frame_size
+            serialized_data: bytes = self._seal_frame(data)
+            frame_size = len(serialized_data)
+            # Размер данных передается перед самими данными
+            return frame_size.to_bytes(self._int_size_for_message_length, byteorder='big') + serialized_data
+
+        self._write_frame(seal)
+        self._last_send_time = time.time()
+        if data.command_type not in (NetworkCommands.PING, NetworkCommands.PONG):
+            self._last_data_time = self._last_send_time
+        self._logger.debug(f"Отправил {data.command_type.name} сообщение клиенту [{self._remote_address}][{self._peer_user_id_hash} "
+                           f"| {self._peer_user_name}] размером [{frame_size}].")
+
+    def _seal_frame(self, data: NetworkData) -> bytes:
         """
-        # Сборка данных для отправки
-        serialized_data: bytes = data.model_dump_json().encode('utf-8')  # Сериализация и кодирование данных в JSON
+            Шифрует кадр AEAD (если он еще не зашифрован) и сериализует его в бинарный кадр или в JSON.
 
-        # Подготовка размера данных для отправки
-        data_length: bytes = len(serialized_data).to_bytes(self._int_size_for_message_length, byteorder='big')
-        
-        # Отправка размера и данных через сокет
-        self._connection_socket.sendall(data_length + serialized_data)
-        self._logger.debug(f"Отправил {data.command_type.name} сообщение клиенту [{self._remote_address}][{self._peer_user_id_hash} "
-                           f"| {self._peer_user_name}] размером [{int.from_bytes(data_length, byteorder='big')}/{len(serialized_data)}].")
+            Вызывается непосредственно перед записью в соединение, поэтому номера кадров AEAD
+            совпадают с порядком кадров в потоке.
+
+        Args:
+            data (NetworkData): Кадр для отправки.
+
+        Returns:
+            bytes: Сериализованный кадр без префикса длины.
+        """
+        if data._plaintext is not None and self._is_session_aead_frame(data.command_type):
+            data.encrypted_data = self._crypto.encrypt_aead(
+                data._plaintext, self._frame_associated_data(data.command_type, data.additional.resend_flag)
+            )
+            data._plaintext = None
+
+        if self._is_binary_frame_allowed(data.command_type):
+            return BinaryFrameCodec.encode(data)
+        # Версия протокола и ее подпись нужны только в рукопожатии
+        exclude: Union[Dict[str, Any], None] = None
+        if data.command_type not in (NetworkCommands.INIT, NetworkCommands.ACK):
+            exclude = {'signature_protocol': True, 'additional': {'protocol_version'}}
+        return data.model_dump_json(exclude=exclude).encode('utf-8')  # Сериализация и кодирование данных в JSON
+
+    def _write_frame(self, seal: Callable[[], bytes]) -> None:
+        """
+            Собирает кадр и записывает его в сокет.
+
+            Кадры могут отправляться из разных потоков (пинг, передача файла, сообщения пользователя),
+            поэтому сборка и запись кадра в сокет атомарны: номера кадров AEAD идут в порядке записи.
+
+        Args:
+            seal (Callable[[], bytes]): Возвращает кадр вместе с префиксом длины.
+        """
+        with self._send_lock:
+            self._connection_socket.sendall(seal())
+
+    def _is_binary_frame_allowed(self, command_type: NetworkCommands) -> bool:
+        """
+            Проверяет, можно ли отправить команду бинарным кадром.
+
+            Команды рукопожатия всегда отправляются в JSON, так как до их обработки версия протокола собеседника неизвестна.
+
+        Args:
+            command_type (NetworkCommands): Тип команды.
+
+        Returns:
+            bool: True - если можно использовать бинарный кадр.
+        """
+        return self._peer_protocol_version >= ProtocolVersion.BINARY_FRAMES and command_type not in (
+            NetworkCommands.INIT, NetworkCommands.ACK, NetworkCommands.EXISTS, NetworkCommands.CONNECTING_TO_OURSELVES
+        )
+
+    def _parse_network_data(self, raw_data: bytes) -> NetworkData:
+        """
+            Разбирает полученный кадр, определяя его формат по первому байту.
+
+        Args:
+            raw_data (bytes): Полученный кадр.
+
+        Returns:
+            NetworkData: Разобранные сетевые данные.
+        """
+        if BinaryFrameCodec.is_binary(raw_data):
+            return BinaryFrameCodec.decode(raw_data)
+        return NetworkData.parse_raw(raw_data)
 
 
     def _handle_client(self) -> None:
@@ -333,90 +849,141 @@ class UserSession:
 
         while self._is_active:
             try:
-                data: str = self._receive_data()
-                if not data:
-                    continue
-                
-                received_data: NetworkData = NetworkData.parse_raw(data)
-
-                if not self._peer_rsa_public_key:
-                    self._peer_rsa_public_key = self._crypto.decode_from_b64(received_data.encrypted_data.data_b64).decode('utf-8')
-                
-                if not self._verify_data(received_data):
-                    continue
-
-                self._logger.debug(f"Проверка подписи для клиента [{self._remote_address}]"
-                                   f"[{self._peer_user_id_hash} | {self._peer_user_name}] прошла успешно.")
-
-                match received_data.command_type:
-                    case NetworkCommands.INIT:
-                        self._handle_init(received_data)
-                    case NetworkCommands.ACK:
-                        self._handle_ack(received_data)
-                    case NetworkCommands.PING:
-                        self._handle_ping()
-                    case NetworkCommands.PONG:
-                        self._handle_pong()
-                    case NetworkCommands.SEND_DATA:
-                        self._handle_send(received_data)
-                    case NetworkCommands.RECV_DATA:
-                        self._handle_recv(received_data)
-                    case NetworkCommands.SYNC_DATA:
-                        self._handle_sync(received_data)
-                    case NetworkCommands.EXISTS:
-                        self._handle_exist(received_data)
-                    case NetworkCommands.CONNECTING_TO_OURSELVES:
-                        self._handle_connecting_to_ourselves()
-
-
+                data: bytes = self._receive_data()
             except socket.timeout as e:
                 self._logger.debug(f"Клиент не отвечает, закрываю соединение с [{self._remote_address}]"
                                    f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
                 self.close()
-
-            except (json.decoder.JSONDecodeError, ValidationError) as e:
-                self._logger.error(f'Ошибка при распознании данных. [{e}]')
-                self._clear_socket_buffer()
-                self._logger.debug(f"Отчищаю буфер сокета для [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
-
-            except BrokenPipeError:
-                self._logger.debug(f'Клиент [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] завершил общение. Завершаю сессию.')
-                self.close()
-
+                continue
             except (OSError, ConnectionRefusedError):
                 self._logger.debug(f'Произошло закрытие сокета. Завершаю сессию.')
                 self.close()
-            
-            except Exception as e:
-                self._logger.error(f'Произошла непредвиденная ошибка [{e}]. Завершаю сессию.')
-                self.close()
+                continue
 
-    def _clear_socket_buffer(self) -> None:
-        """
-            Отчищаем все данные из буфера сокета.
-        """
-        self._connection_socket.setblocking(False)  # Установка сокета в неблокирующий режим
-        try:
-            while True:
-                data = self._connection_socket.recv(1024)  # Попытка прочитать данные из сокета
-                if not data:
-                    break  # Если данных нет, выходим из цикла
-        except BlockingIOError:
-            pass  # Игнорируем ошибку блокировки, потому что это означает, что буфер пуст
-        finally:
-            self._connection_socket.setblocking(True)  # Возвращаем сокет в блокирующий режим
+            if data:
+                self._handle_frame(data)
 
-    def _update_ping_time(self) -> None:
+        # Недополученные файлы либо ждут докачки, либо больше не нужны
+        self._suspend_incoming_files()
+
+    def _set_peer_rsa_public_key(self, peer_rsa_public_key: RSA_KeyType) -> None:
         """
-            Обновляет время последнего пинга для поддержания активности сессии.
+            Запоминает публичный ключ собеседника и один раз создает объект проверки его подписей.
+
+        Args:
+            peer_rsa_public_key (RSA_KeyType): Публичный ключ собеседника в формате PEM.
         """
-        self._last_ping_time = time.time()      # Обновляем время последнего пинга
+        self._peer_rsa_verifier = Encrypter.create_signature_verifier(peer_rsa_public_key)
+        self._peer_rsa_public_key = peer_rsa_public_key
 
-    def __recvall(self, number_of_bytes: int) -> bytearray:
+    def _handle_frame(self, data: bytes) -> None:
         """
-            Получение данных из сокета с обработкой размера сообщения.
+            Обрабатывает один полученный кадр. При неустранимых ошибках закрывает сессию.
 
-        Raises:
+        Args:
+            data (bytes): Полученный кадр.
+        """
+        try:
+            self._process_frame(data)
+
+        except (json.decoder.JSONDecodeError, ValidationError, FrameDecodingError) as e:
+            self._logger.error(f'Ошибка при распознании данных. [{e}]')
+            self._clear_socket_buffer()
+            self._logger.debug(f"Отчищаю буфер сокета для [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
+
+        except BrokenPipeError:
+            self._logger.debug(f'Клиент [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] завершил общение. Завершаю сессию.')
+            self.close()
+
+        except (OSError, ConnectionRefusedError):
+            self._logger.debug(f'Произошло закрытие сокета. Завершаю сессию.')
+            self.close()
+        
+        except Exception as e:
+            self._logger.error(f'Произошла непредвиденная ошибка [{e}]. Завершаю сессию.')
+            self.close()
+
+    def _process_frame(self, data: bytes) -> None:
+        """
+            Разбирает кадр, проверяет подпись и передает данные обработчику команды.
+
+        Args:
+            data (bytes): Полученный кадр.
+        """
+        received_data: NetworkData = self._parse_network_data(data)
+
+        if not self._peer_rsa_public_key:
+            self._set_peer_rsa_public_key(self._crypto.decode_from_b64(received_data.encrypted_data.data_b64).decode('utf-8'))
+        
+        if not self._verify_data(received_data):
+            return
+
+        self._logger.debug(f"Проверка подписи для клиента [{self._remote_address}]"
+                           f"[{self._peer_user_id_hash} | {self._peer_user_name}] прошла успешно.")
+
+        if received_data.command_type not in (NetworkCommands.PING, NetworkCommands.PONG):
+            self._last_data_time = time.time()
+
+        match received_data.command_type:
+            case NetworkCommands.INIT:
+                self._handle_init(received_data)
+            case NetworkCommands.ACK:
+                self._handle_ack(received_data)
+            case NetworkCommands.PING:
+                self._handle_ping(received_data)
+            case NetworkCommands.PONG:
+                self._handle_pong(received_data)
+            case NetworkCommands.SEND_DATA:
+                self._handle_send(received_data)
+            case NetworkCommands.RECV_DATA:
+                self._handle_recv(received_data)
+            case NetworkCommands.SYNC_DATA:
+                self._handle_sync(received_data)
+            case NetworkCommands.EXISTS:
+                self._handle_exist(received_data)
+            case NetworkCommands.CONNECTING_TO_OURSELVES:
+                self._handle_connecting_to_ourselves()
+            case NetworkCommands.FILE_OFFER:
+                self._handle_file_offer(received_data)
+            case NetworkCommands.FILE_CHUNK:
+                self._handle_file_chunk(received_data)
+            case NetworkCommands.FILE_DONE:
+                self._handle_file_done(received_data)
+            case NetworkCommands.FILE_ACK:
+                self._handle_file_ack(received_data)
+            case NetworkCommands.SEND_BATCH:
+                self._handle_send_batch(received_data)
+            case NetworkCommands.RECV_BATCH:
+                self._handle_recv_batch(received_data)
+            case NetworkCommands.RECV_SACK:
+                self._handle_recv_sack(received_data)
+
+    def _clear_socket_buffer(self) -> None:
+        """
+            Отчищаем все данные из буфера сокета.
+        """
+        self._connection_socket.setblocking(False)  # Установка сокета в неблокирующий режим
+        try:
+            while True:
+                data = self._connection_socket.recv(1024)  # Попытка прочитать данные из сокета
+                if not data:
+                    break  # Если данных нет, выходим из цикла
+        except BlockingIOError:
+            pass  # Игнорируем ошибку блокировки, потому что это означает, что буфер пуст
+        finally:
+            self._connection_socket.setblocking(True)  # Возвращаем сокет в блокирующий режим
+
+    def _update_ping_time(self) -> None:
+        """
+            Обновляет время последнего пинга для поддержания активности сессии.
+        """
+        self._last_ping_time = time.time()      # Обновляем время последнего пинга
+
+    def __recvall(self, number_of_bytes: int) -> bytearray:
+        """
+            Получение данных из сокета с обработкой размера сообщения.
+
+        Raises:
             socket.timeout: Если не удалось получить данные из сокета
 
         Returns:
@@ -430,7 +997,7 @@ class UserSession:
             data.extend(packet)
         return data
 
-    def _receive_data(self) -> str:
+    def _receive_data(self) -> bytes:
         """
             Получение данных из сокета с обработкой размера сообщения.
 
@@ -438,12 +1005,12 @@ class UserSession:
             socket.timeout: Если не удалось получить данные из сокета
 
         Returns:
-            str: Данные из сокета
+            bytes: Данные из сокета
         """
         raw_data_size: bytes = self.__recvall(self._int_size_for_message_length)
         
         data_size: int = int.from_bytes(raw_data_size, byteorder='big')
-        data: str = self.__recvall(data_size).decode()
+        data: bytes = bytes(self.__recvall(data_size))
         
         return data
     
@@ -476,6 +1043,9 @@ class UserSession:
         self._load_and_send_dialog_history()
         self._send_connetion_event()
 
+        # Докачиваем файлы, передача которых была прервана в прошлых сессиях
+        self._run_background(self._resume_outgoing_files)
+
     def _rsa_public_key_processing(self, received_data: NetworkData) -> bool:
         """
             Обработка публичного RSA ключа собеседника.        
@@ -551,12 +1121,13 @@ class UserSession:
         Args:
             seconds (int, optional): Время ожидания в секундах. По умолчанию 5.
         """
-        start = time.time()
         self._logger.debug(f'Ожидаю решения пользователя [{seconds}] секунд.')
-        while self._is_active and self._client_decision == ClientDecision.NONE and (time.time() - start) < seconds:
-            time.sleep(0.1)
+        with self._client_decision_condition:
+            is_decided: bool = self._client_decision_condition.wait_for(
+                lambda: not self._is_active or self._client_decision != ClientDecision.NONE, timeout=seconds
+            )
         
-        if self._client_decision == ClientDecision.NONE and (time.time() - start) > seconds:
+        if not is_decided:
             self._logger.debug(f'Ожидание завершено. Был произведен выход по таймеру.')
         else:
             self._logger.debug(f'Ожидание завершено. Пользователь изменил состояние на [{self._client_decision.name}].')
@@ -601,7 +1172,14 @@ class UserSession:
         """
         self._peer_user_id_hash = received_data.additional.user_id_hash
         self._peer_user_name = received_data.additional.user_name
-        self._crypto.calculate_dh_secret(received_data.additional.ecdh_public_key)
+        # ACK приходит в ответ на наш INIT, значит, соединение начали мы
+        self._crypto.calculate_dh_secret(received_data.additional.ecdh_public_key,
+                                         is_initiator=received_data.command_type == NetworkCommands.ACK)
+
+        # В INIT приходит максимальная версия собеседника, в ACK - уже согласованная
+        self._peer_protocol_version = min(PROTOCOL_VERSION, received_data.additional.protocol_version)
+        self._logger.debug(f'Согласована версия протокола [{self._peer_protocol_version}] с клиентом [{self._remote_address}]'
+                           f'[{self._peer_user_id_hash} | {self._peer_user_name}].')
 
         active_users.append(self._peer_user_id_hash)
 
@@ -618,24 +1196,21 @@ class UserSession:
         """
             Загружает историю диалогов из базы данных.
         """
-        # Предполагаем, что метод загрузки диалога из базы данных уже реализован
-        self._dialog_history, self._outbound_message_buffer = self._database.load_data()
-        self._pull_dialog_history_ids()
-
-    def _pull_dialog_history_ids(self) -> None:
-        """
-            Заполняет список идентификаторов сообщений.
-        """
-        self._dialog_history_ids = []
-        for msg in self._dialog_history:
-            self._dialog_history_ids.append(msg.id)
+        # Целиком загружаются только идентификаторы, сами сообщения читаются из базы по мере необходимости
+        self._outbound_message_buffer = self._database.load_unsent_messages()
+        self._dialog_history_ids = dict.fromkeys(self._database.load_message_ids())
+        self._dialog_history = self._database.load_page()
 
     def _send_ack(self) -> None:
         """
             Отправка сообщения ACK с историей диалога.
         """
-        # Сериализация данных сообщения в JSON
-        message_json: str = json.dumps(self._dialog_history_ids)
+        # Сериализация данных сообщения в JSON.
+        # Новые клиенты получают сводку диапазонами, размер которой не зависит от длины синхронизированной истории
+        if self._peer_protocol_version >= ProtocolVersion.HISTORY_RANGES:
+            message_json: str = HistorySummary.from_ids(self._dialog_history_ids).model_dump_json()
+        else:
+            message_json: str = json.dumps(list(self._dialog_history_ids))
         encrypted_message: EncryptedData = self._crypto.encrypt(message_json)
         encrypted_message_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_message.model_dump_json())
         message_signature_b64: B64_FormatData = self._crypto.sign_message(encrypted_message_b64)
@@ -643,9 +1218,10 @@ class UserSession:
         additional_info: AdditionalData = AdditionalData(
             user_id_hash=self._user_id_hash,
             user_name=self._user_name,
-            ecdh_public_key=self._crypto.get_public_key()  # Получение публичного ключа для обмена
+            ecdh_public_key=self._crypto.get_public_key(),  # Получение публичного ключа для обмена
+            protocol_version=self._peer_protocol_version
         )
-        additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.model_dump_json())
+        additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.dump_without_version())
         additional_info_signature_b64: B64_FormatData = self._crypto.sign_message(additional_info_b64)
 
         # Сборка данных для отправки
@@ -654,10 +1230,25 @@ class UserSession:
             encrypted_data=encrypted_message,
             signature=message_signature_b64,
             additional=additional_info,
-            signature_additional=additional_info_signature_b64
+            signature_additional=additional_info_signature_b64,
+            signature_protocol=self._sign_protocol_version(additional_info)
         )
         self._send_network_data(data_to_send)
 
+    def _sign_protocol_version(self, additional_info: AdditionalData) -> B64_FormatData:
+        """
+            Подписывает дополнительные данные рукопожатия вместе с версией протокола.
+
+            Без этой подписи версию можно было бы подменить в пути и отключить у собеседников защиту новых версий.
+
+        Args:
+            additional_info (AdditionalData): Дополнительные данные INIT или ACK.
+
+        Returns:
+            B64_FormatData: Подпись в формате Base64.
+        """
+        return self._crypto.sign_message(Encrypter.encode_to_b64(additional_info.model_dump_json()))
+
     def _send_event(self, event_type: NetworkEventType, dont_set_flag: bool = False, **kwargs) -> None:
         """
             Отправка ивента.
@@ -694,10 +1285,14 @@ class UserSession:
             received_data (NetworkData): Полученные данные для Ack
         """
         encrypted_data: EncryptedData = received_data.encrypted_data
-        decrypted_data: List[MessageIdType] = json.loads(self._crypto.decrypt(encrypted_data))
+        # Размер всей истории собеседника не ограничиваем: сводка не разворачивается целиком,
+        # а запрос недостающих сообщений ограничен SYNC.MAX_REQUEST_IDS (см. _sync_dialog_messages)
+        decrypted_data: Union[HistorySummary, List[MessageIdType], None] = self._parse_history_ids(
+            self._crypto.decrypt(encrypted_data), None
+        )
 
         # Синхранизируем данные
-        threading.Thread(target=self._sync_dialog_history, args=(decrypted_data, ), daemon=True).start()
+        self._run_background(self._sync_dialog_history, decrypted_data)
 
     def _handle_ack(self, received_data: NetworkData) -> None:
         """
@@ -716,60 +1311,60 @@ class UserSession:
         self._send_connetion_event()
 
         # Запуск постоянной проверки соединения
-        threading.Thread(target=self._send_ping, daemon=True).start()
+        self._start_keepalive()
         
         # Обработка полученных данных
         self._recv_ack(received_data)
 
-    def _send_ping(self) -> None:
+    def _send_keepalive_ping(self) -> None:
         """
-            Генерирует Ping сообщение каждый Ping_Interval
+            Отправляет одиночный PING с временем отправки для измерения RTT.
         """
-        while self._is_active:
-            while self._is_active and time.time() - self._last_ping_time < config.NETWORK.PING.INTERVAL:
-                time.sleep(0.1)
-            try:
-                self._send_ping_or_pong(NetworkCommands.PING)
-                self._last_ping_time = time.time()      # Обновляем время последнего пинга
-            except OSError:
-                self._logger.debug(f"Не удалось отправить PING клиенту [{self._remote_address}]"
-                                   f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+        try:
+            self._send_ping_or_pong(NetworkCommands.PING, PING_HEADER.pack(time.monotonic_ns()))
+        except OSError:
+            self._logger.debug(f"Не удалось отправить PING клиенту [{self._remote_address}]"
+                               f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
 
-    def _handle_ping(self) -> None:
+    def _handle_ping(self, received_data: NetworkData) -> None:
         """
             Обработка сообщений PING.
+
+        Args:
+            received_data (NetworkData): Полученные данные PING.
         """
         self._update_ping_time()
         self._logger.debug(f"Получил PING сообщение от клиента [{self._remote_address}]"
                                    f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
-        self._send_ping_or_pong(NetworkCommands.PONG)
+        # Возвращаем данные PING, чтобы собеседник измерил RTT (старые клиенты присылают просто b'PING')
+        self._send_ping_or_pong(NetworkCommands.PONG, self._decrypt_payload(received_data))
         
-    def _send_ping_or_pong(self, message_type: NetworkCommands) -> None:
+    def _send_ping_or_pong(self, message_type: NetworkCommands, payload: Union[bytes, None] = None) -> None:
         """
             Отправляет Ping или Pong сообщение в зависимости от переданного аргумента.
+
+            После SESSION_AEAD такие кадры защищаются только тегом AES-GCM без подписи RSA.
+
         Args:
             message_type (NetworkCommands): Тип сообщения (Ping или Pong)
+            payload (Union[bytes, None]): Данные кадра. По умолчанию - имя команды.
         """
-        encrypted_message: EncryptedData = self._crypto.encrypt(message_type.name)
-        encrypted_message_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_message.model_dump_json())
-        message_signature_b64: B64_FormatData = self._crypto.sign_message(encrypted_message_b64)
-
-        # Сборка данных для отправки
-        data_to_send = NetworkData(
-            command_type=message_type,
-            encrypted_data=encrypted_message,
-            signature=message_signature_b64,
-            additional=AdditionalData()
-        )
-        self._send_network_data(data_to_send)
+        self._send_network_data(self._build_network_data(message_type, payload if payload is not None else message_type.name.encode()))
 
-    def _handle_pong(self) -> None:
+    def _handle_pong(self, received_data: NetworkData) -> None:
         """
             Обработка сообщений PONG.
+
+        Args:
+            received_data (NetworkData): Полученные данные PONG.
         """
         self._update_ping_time()
+        payload: bytes = self._decrypt_payload(received_data)
+        if len(payload) == PING_HEADER.size:
+            (sent_at,) = PING_HEADER.unpack(payload)
+            self._update_rtt((time.monotonic_ns() - sent_at) / 1e9)
         self._logger.debug(f"Получил PONG сообщение от клиента [{self._remote_address}]"
-                                   f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+                                   f"[{self._peer_user_id_hash} | {self._peer_user_name}]. RTT [{self._srtt}].")
 
     def _handle_send(self, received_data: NetworkData) -> None:
         """
@@ -781,146 +1376,901 @@ class UserSession:
         self._update_ping_time()
         self._logger.debug(f"Получил SEND сообщение от клиента [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
         
-        decrypted_data: MessageData = MessageData.parse_raw(self._crypto.decrypt(received_data.encrypted_data))
+        payload: bytes = self._decrypt_payload(received_data)
+        sequence: Union[int, None] = None
+        if self._peer_protocol_version >= ProtocolVersion.SEQUENCED_ACKS:
+            (sequence,) = SEQUENCE_HEADER.unpack_from(payload)
+            payload = payload[SEQUENCE_HEADER.size:]
+        decrypted_data: MessageData = MessageData.parse_raw(payload.decode())
         
         match decrypted_data.type:
             case MessageType.Text:
-                self._handle_text_message(decrypted_data.message, received_data.additional.resend_flag) # type: ignore
+                self._handle_text_message(decrypted_data.message, received_data.additional.resend_flag, sequence) # type: ignore
             case MessageType.File:
                 self._handle_file_message(decrypted_data.message) # type: ignore
+                if sequence is not None:
+                    self._acknowledge_sequence(sequence)
+    
+    def _handle_text_message(self, message: MessageTextData, resend_flag: bool = False, sequence: Union[int, None] = None) -> None:
+        """
+            Обрабатывает текстовые сообщения, проверяя, является ли сообщение повторным, и если нет, сохраняет его в базу.
+
+        Args:
+            message (MessageTextData): Текстовое сообщение для обработки.
+            resend_flag (bool): Флаг, указывающий, было ли сообщение отправлено повторно.
+            sequence (Union[int, None]): Номер сообщения. Если указан, подтверждение откладывается и объединяется с другими.
+
+        Примечание:
+            Если сообщение является повторным и уже содержится в истории, обработка не происходит.
+        """
+        message_id_old = self._accept_text_message(message, resend_flag)
+        committed: 'Future[bool]' = self._database.save_data([message])
+
+        # Отправляем ответ только после фиксации сообщения в базе, иначе собеседник удалит его из буфера раньше записи
+        if sequence is not None:
+            self._after_history_commit(committed, self._acknowledge_sequence, sequence)
+        else:
+            self._after_history_commit(committed, self._send_recv, MessageData(type=MessageType.Text, message=message_id_old), resend_flag)
+
+    def _accept_text_message(self, message: MessageTextData, resend_flag: bool, dont_set_flag: bool = False) -> MessageIdType:
+        """
+            Переводит полученное сообщение в наше восприятие, добавляет его в историю и уведомляет интерфейс.
+            Сохранение в базу остается за вызывающим, чтобы пакет сообщений сохранялся одной записью.
+
+        Args:
+            message (MessageTextData): Полученное сообщение (идентификатор изменяется на месте).
+            resend_flag (bool): Флаг, указывающий, было ли сообщение отправлено повторно.
+            dont_set_flag (bool): Не выставлять событие (вызывающий выставит его один раз для пакета).
+
+        Returns:
+            MessageIdType: Идентификатор сообщения в восприятии собеседника (для подтверждения).
+        """
+        message_id_old = message.id
+        message.id = self._change_perception_for_message_id(message.id)
+
+        # Если это ресенд, то проверяем, есть ли он в темп буфере
+        if resend_flag:
+            with self._outbound_lock:
+                self._outbound_message_buffer.pop(message.id, None)
+
+        self._send_event_data_received(message, resend_flag, dont_set_flag)
+        self._dialog_history_ids[message.id] = None
+        return message_id_old
+
+    def _change_perception_for_message_id(self, message_id: MessageIdType) -> MessageIdType:
+        """
+            Изменяет идентификатор сообщения для внутренней обработки.
+
+        Args:
+            message_id (MessageIdType): Исходный идентификатор сообщения.
+
+        Returns:
+            MessageIdType: Изменённый идентификатор сообщения.
+        """
+        return change_perception(message_id)
+
+    def _send_event_data_received(self, message: MessageTextData, resend_flag: bool, dont_set_flag: bool = False) -> None:
+        """
+            Отправляет событие о получении данных.
+
+        Args:
+            message (MessageTextData): Данные сообщения.
+            resend_flag (bool): Флаг повторной отправки.
+            dont_set_flag (bool): Не выставлять событие после добавления сообщения в очередь.
+        """
+        self._send_event(NetworkEventType.RECEIVE_DATA, dont_set_flag, data=message, resend_flag=resend_flag)
+
+    def _send_recv(self, message: MessageData, resend_flag: bool = False) -> None:
+        """
+            Подготавливает и отправляет сообщение с зашифрованными данными.
+
+        Args:
+            message (MessageData): Сообщение для отправки.
+            resend_flag (bool): Флаг повторной отправки.
+        """
+        self._send_network_data(self._build_network_data(NetworkCommands.RECV_DATA, message.model_dump_json().encode(), resend_flag))
+
+    def _after_history_commit(self, committed: 'Future[bool]', callback: Callable[..., None], *args: Any) -> None:
+        """
+            Выполняет подтверждение на общем планировщике после фиксации полученных сообщений в базе.
+
+            Если запись не удалась, подтверждение не отправляется: сообщения останутся в буфере собеседника
+            и придут снова при следующей синхронизации.
+
+        Args:
+            committed (Future[bool]): Результат save_data.
+            callback (Callable[..., None]): Отправка подтверждения.
+            *args: Аргументы callback.
+        """
+        def send() -> None:
+            if not self._is_active:
+                return
+            try:
+                callback(*args)
+            except OSError:
+                self._logger.debug(f"Не удалось отправить подтверждение клиенту [{self._remote_address}]"
+                                   f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+
+        def on_committed(future: 'Future[bool]') -> None:
+            if future.result():
+                # Callback Future выполняется в потоке записи истории, а отправка в сокет не должна его задерживать
+                self._scheduler.call_later(0, send)
+            else:
+                self._logger.warning(f"Сообщения от клиента [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] "
+                                     f"не записаны в базу, подтверждение не отправлено.")
+
+        committed.add_done_callback(on_committed)
+
+    def _acknowledge_sequence(self, sequence: int) -> None:
+        """
+            Отмечает номер полученного сообщения и планирует отложенное подтверждение.
+
+            Подтверждение отправляется сразу, если накопилось MAX_PENDING сообщений, иначе - через DELAY_MS
+            одним кадром RECV_SACK на все сообщения, полученные за это время.
+
+        Args:
+            sequence (int): Номер полученного сообщения.
+        """
+        window: _ReceiveWindow = self._receive_window
+        with window.lock:
+            if sequence >= window.next_sequence:
+                _add_to_ranges(window.received_ranges, sequence)
+                # Сдвигаем накопительную границу по непрерывно полученным номерам
+                while window.received_ranges and window.received_ranges[0][0] <= window.next_sequence:
+                    window.next_sequence = max(window.next_sequence, window.received_ranges.pop(0)[1])
+
+            window.pending += 1
+            flush_now: bool = window.pending >= config.NETWORK.ACK.MAX_PENDING
+            if not flush_now and window.timer is None:
+                window.timer = self._scheduler.call_later(config.NETWORK.ACK.DELAY_MS / 1000, self._flush_sequence_ack)
+
+        if flush_now:
+            self._flush_sequence_ack()
+
+    def _flush_sequence_ack(self) -> None:
+        """
+            Отправляет накопленное подтверждение RECV_SACK.
+        """
+        window: _ReceiveWindow = self._receive_window
+        with window.lock:
+            if window.timer is not None:
+                window.timer.cancel()
+                window.timer = None
+            if not window.pending or not self._is_active:
+                return
+            window.pending = 0
+            ack: SequenceAckData = SequenceAckData(
+                cumulative=window.next_sequence,
+                sack=[(start, end) for start, end in window.received_ranges[:config.NETWORK.ACK.MAX_SACK_RANGES]]
+            )
+
+        try:
+            self._send_network_data(self._build_network_data(NetworkCommands.RECV_SACK, ack.model_dump_json().encode()))
+        except OSError:
+            self._logger.debug(f"Не удалось отправить RECV_SACK клиенту [{self._remote_address}]"
+                               f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+
+    def _handle_recv_sack(self, received_data: NetworkData) -> None:
+        """
+            Обрабатывает накопительное и выборочное подтверждение сообщений.
+
+        Args:
+            received_data (NetworkData): Полученные данные подтверждения.
+        """
+        self._update_ping_time()
+        ack: SequenceAckData = SequenceAckData.parse_raw(self._decrypt_payload(received_data))
+        sack_starts: List[int] = [start for start, _ in ack.sack]
+
+        confirmations: List[Tuple[MessageIdType, bool]] = []
+        with self._unacked_lock:
+            for sequence in list(self._unacked_sequences):
+                if sequence >= ack.cumulative:
+                    position: int = bisect_right(sack_starts, sequence) - 1
+                    if position < 0 or sequence >= ack.sack[position][1]:
+                        continue
+                confirmations.append(self._unacked_sequences.pop(sequence))
+
+        confirmed: int = self._confirm_outbound_messages(confirmations)
+        self._logger.debug(f"Клиент [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] "
+                           f"подтвердил [{confirmed}] сообщений до номера [{ack.cumulative}].")
+
+    def _confirm_outbound_messages(self, confirmations: List[Tuple[MessageIdType, bool]]) -> int:
+        """
+            Переносит подтвержденные собеседником сообщения из буфера исходящих в историю одной записью.
+
+        Args:
+            confirmations (List[Tuple[MessageIdType, bool]]): Идентификаторы сообщений и флаги повторной отправки.
+
+        Returns:
+            int: Количество сообщений, сохраненных в историю.
+        """
+        with self._outbound_lock:
+            popped: List[Tuple[MessageIdType, bool, Union[MessageTextData, None]]] = [
+                (message_id, resend_flag, self._outbound_message_buffer.pop(message_id, None)) for message_id, resend_flag in confirmations
+            ]
+
+        confirmed_messages: List[MessageTextData] = []
+        for message_id, resend_flag, message in popped:
+            # Повторно отправленное сообщение из истории уже сохранено, а переотправленное из буфера - еще нет
+            if message is None or (resend_flag and message_id in self._dialog_history_ids):
+                continue
+            self._send_event(NetworkEventType.SEND_DATA, dont_set_flag=True, data=message, resend_flag=resend_flag)
+            self._dialog_history_ids[message_id] = None
+            confirmed_messages.append(message)
+
+        if confirmed_messages:
+            self._event.set()
+            self._database.save_data(confirmed_messages)
+        return len(confirmed_messages)
+
+    def _handle_file_message(self, message: MessageFileData) -> None:
+        """
+            Обрабатывает сообщения с файлами, отправляя событие о получении файла.
+
+        Args:
+            message (MessageFileData): Сообщение с файлом для обработки.
+        """
+        self._send_event_file_received(message)
+        # Отправляем ответ
+        self._send_recv(MessageData(type=MessageType.File, message=message.filename))
+    
+    def _send_event_file_received(self, message: MessageFileData) -> None:
+        """
+            Отправляет событие о получении файла.
+
+        Args:
+            message (MessageFileData): Данные файла, которые были получены.
+        """
+        self._send_event(NetworkEventType.REQUEST_FILE, data=message)
+        
+    def _handle_recv(self, received_data: NetworkData) -> None:
+        """
+            Обработка сообщений Recv.
+
+        Args:
+            received_data: Полученные данные для Recv
+        """
+        self._update_ping_time()
+        self._logger.debug(f"Получил RECV сообщение от клиента [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
+        
+        decrypted_data: MessageData = MessageData.parse_raw(self._decrypt_payload(received_data).decode())
+        
+        match decrypted_data.type:
+            case MessageType.Text:
+                with self._outbound_lock:
+                    message: Union[MessageTextData, None] = self._outbound_message_buffer.pop(decrypted_data.message, None) # type: ignore
+                # Сообщение уже подтверждено (например, синхронизацией истории)
+                if message is None:
+                    return
+                # Повторно отправленное сообщение из истории уже сохранено, а переотправленное из буфера - еще нет
+                if not received_data.additional.resend_flag or decrypted_data.message not in self._dialog_history_ids:
+                    self._send_event_data_confirmation(message, received_data.additional.resend_flag) # type: ignore
+                    self._database.save_data(messages=[message])
+                    self._dialog_history_ids[decrypted_data.message] = None # type: ignore
+            case MessageType.File:
+                self._send_event_file_confirmation(decrypted_data.message) # type: ignore
+
+    def _send_event_data_confirmation(self, message_id: MessageIdType, resend_flag: bool) -> None:
+        """
+            Отправляет событие о подтверждении отправки данных.
+
+        Args:
+            message_id (MessageIdType): Идентификатор сообщения.
+            resend_flag (bool): Флаг, указывающий на повторную отправку.
+        """
+        self._send_event(NetworkEventType.SEND_DATA, data=message_id, resend_flag=resend_flag)
+        
+    def _send_event_file_confirmation(self, filename: FilenameType):
+        """
+            Отправляет событие о подтверждении отправки файла.
+
+        Args:
+            filename (FilenameType): Имя файла.
+        """
+        self._send_event(NetworkEventType.FILE_ACCEPTED, data=filename)
     
-    def _handle_text_message(self, message: MessageTextData, resend_flag: bool = False) -> None:
+    def _load_file_for_legacy_peer(self, file_data: MessageFileData) -> MessageData:
+        """
+            Считывает файл целиком для собеседника, который не поддерживает потоковую передачу файлов.
+
+        Args:
+            file_data (MessageFileData): Описание файла с локальным путем.
+
+        Returns:
+            MessageData: Сообщение с содержимым файла в Base64.
+
+        Raises:
+            FileTooLargeError: Если размер файла превышает допустимый для старых клиентов.
+        """
+        file_size: int = os.path.getsize(file_data.path)
+        if file_size > config.NETWORK.FILE_TRANSFER.LEGACY_MAX_FILE_SIZE:
+            raise FileTooLargeError(f'Собеседник не поддерживает потоковую передачу файлов. '
+                                    f'Максимальный размер файла: {config.NETWORK.FILE_TRANSFER.LEGACY_MAX_FILE_SIZE} байт.')
+
+        with open(file_data.path, 'rb') as file:
+            raw_data: str = base64.b64encode(file.read()).decode('utf-8')
+        return MessageData(type=MessageType.File, message=MessageFileData(raw_data=raw_data, filename=file_data.filename, size=file_size))
+
+    def _send_encrypted_bytes(self, command_type: NetworkCommands, payload: bytes) -> None:
+        """
+            Шифрует, подписывает и отправляет произвольные байты с указанной командой.
+
+        Args:
+            command_type (NetworkCommands): Тип команды.
+            payload (bytes): Данные для отправки.
+        """
+        self._send_network_data(self._build_network_data(command_type, payload))
+
+    def _build_network_data(self, command_type: NetworkCommands, payload: bytes, resend_flag: bool = False) -> NetworkData:
+        """
+            Шифрует данные и собирает кадр для отправки собеседнику.
+
+            Если собеседник поддерживает SESSION_AEAD, данные шифруются AES-GCM на сессионном ключе,
+            а тег аутентификации заменяет подпись RSA. Иначе данные шифруются AES-CBC и подписываются.
+
+        Args:
+            command_type (NetworkCommands): Тип команды.
+            payload (bytes): Данные для отправки.
+            resend_flag (bool): Флаг повторной отправки.
+
+        Returns:
+            NetworkData: Собранный кадр.
+        """
+        if self._is_session_aead_frame(command_type):
+            data = NetworkData(
+                command_type=command_type,
+                encrypted_data=EncryptedData(data_b64='', iv_b64=''),
+                signature='',
+                additional=AdditionalData(resend_flag=resend_flag)
+            )
+            # Кадр шифруется при записи в соединение (_seal_frame), чтобы номера в nonce шли в порядке кадров в потоке
+            data._plaintext = payload
+            return data
+
+        encrypted_data: EncryptedData = self._crypto.encrypt_bytes(payload)
+        encrypted_data_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_data.model_dump_json())
+        message_signature_b64: B64_FormatData = self._crypto.sign_message(encrypted_data_b64)
+
+        return NetworkData(
+            command_type=command_type,
+            encrypted_data=encrypted_data,
+            signature=message_signature_b64,
+            additional=AdditionalData(resend_flag=resend_flag)
+        )
+
+    def _is_session_aead_frame(self, command_type: NetworkCommands) -> bool:
+        """
+            Проверяет, защищается ли команда AEAD на сессионном ключе.
+
+            Команды рукопожатия по-прежнему подписываются RSA: подпись подтверждает, что открытый ключ ECDH
+            прислал владелец идентификатора, и только после этого сессионному ключу можно доверять.
+
+        Args:
+            command_type (NetworkCommands): Тип команды.
+
+        Returns:
+            bool: True - если кадр шифруется AES-GCM без подписи RSA.
+        """
+        return self._peer_protocol_version >= ProtocolVersion.SESSION_AEAD and self._is_binary_frame_allowed(command_type)
+
+    @staticmethod
+    def _frame_associated_data(command_type: NetworkCommands, resend_flag: bool) -> bytes:
+        """
+            Возвращает открытые поля кадра, которые защищаются тегом AEAD.
+
+        Args:
+            command_type (NetworkCommands): Тип команды.
+            resend_flag (bool): Флаг повторной отправки.
+
+        Returns:
+            bytes: Связанные данные для AES-GCM.
+        """
+        return struct.pack('!B?', int(command_type.value), resend_flag)
+
+    def _decrypt_payload(self, data: NetworkData) -> bytes:
+        """
+            Возвращает расшифрованные данные полученного кадра.
+
+        Args:
+            data (NetworkData): Полученный кадр.
+
+        Returns:
+            bytes: Расшифрованные данные.
+        """
+        if data._plaintext is not None:
+            return data._plaintext
+        return self._crypto.decrypt_bytes(data.encrypted_data)
+
+    def _create_outgoing_transfer(self, file_data: MessageFileData) -> OutgoingTransferRecord:
+        """
+            Создает запись об отправке файла и, если собеседник умеет докачивать файлы, сохраняет ее в журнал.
+
+        Args:
+            file_data (MessageFileData): Описание файла с локальным путем.
+
+        Returns:
+            OutgoingTransferRecord: Запись об отправке файла.
+        """
+        stat = os.stat(file_data.path)
+        record = OutgoingTransferRecord(
+            transfer_id=uuid.uuid4().hex,
+            owner_id_hash=self._user_id_hash,
+            peer_id_hash=self._peer_user_id_hash,
+            path=os.path.abspath(file_data.path),
+            filename=file_data.filename,
+            size=stat.st_size,
+            mtime=stat.st_mtime
+        )
+        if self._peer_protocol_version >= ProtocolVersion.RESUMABLE_FILES:
+            self._transfer_journal.save(record)
+        return record
+
+    def _send_file(self, record: OutgoingTransferRecord) -> None:
+        """
+            Передает файл блоками фиксированного размера, читая его с диска потоком.
+
+            В памяти одновременно находится не больше одного блока, поэтому расход памяти не зависит от размера файла.
+            Если собеседник поддерживает докачку, передача начинается со смещения, которое он подтвердил в ответ на FILE_OFFER,
+            а число неподтвержденных блоков ограничено окном ACK_WINDOW.
+
+        Args:
+            record (OutgoingTransferRecord): Запись об отправке файла.
+        """
+        is_resumable: bool = self._peer_protocol_version >= ProtocolVersion.RESUMABLE_FILES
+        chunk_size: int = config.NETWORK.FILE_TRANSFER.CHUNK_SIZE
+        ack_window: int = config.NETWORK.FILE_TRANSFER.ACK_WINDOW
+
+        outgoing = _OutgoingFile(record=record)
+        self._outgoing_files[record.transfer_id] = outgoing
+        try:
+            offer = FileOfferData(transfer_id=record.transfer_id, filename=record.filename, size=record.size, chunk_size=chunk_size)
+            self._send_encrypted_bytes(NetworkCommands.FILE_OFFER, offer.model_dump_json().encode('utf-8'))
+
+            # Собеседник отвечает на FILE_OFFER смещением, с которого нужно продолжить передачу
+            offset: int = 0
+            if is_resumable:
+                if not self._wait_file_ack(outgoing, lambda: outgoing.acked_size >= 0):
+                    self._logger.debug(f'Не дождался ответа на FILE_OFFER [{record.filename}]. Передача будет продолжена при следующем подключении.')
+                    return
+                if outgoing.is_rejected:
+                    self._logger.warning(f'Клиент [{self._peer_user_id_hash} | {self._peer_user_name}] отказался принимать файл [{record.filename}].')
+                    return
+                offset = outgoing.acked_size
+
+            self._logger.debug(f'Начинаю передачу файла [{record.filename}] размером [{record.size}] со смещения [{offset}] клиенту '
+                               f'[{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}]. Идентификатор передачи [{record.transfer_id}].')
+
+            file_hash = hashlib.sha256()
+            transfer_id_bytes: bytes = bytes.fromhex(record.transfer_id)
+            with open(record.path, 'rb') as file:
+                # Уже переданная часть файла нужна только для подсчета общего хэша
+                while file.tell() < offset:
+                    block: bytes = file.read(min(chunk_size, offset - file.tell()))
+                    if not block:
+                        break
+                    file_hash.update(block)
+
+                index: int = offset // chunk_size
+                while self._is_active:
+                    if is_resumable and not self._wait_file_ack(outgoing, lambda: index - outgoing.acked_size // chunk_size < ack_window):
+                        self._logger.debug(f'Не дождался подтверждения блоков файла [{record.filename}]. Передача будет продолжена при следующем подключении.')
+                        return
+
+                    chunk: bytes = file.read(chunk_size)
+                    if not chunk:
+                        break
+                    file_hash.update(chunk)
+                    self._send_encrypted_bytes(NetworkCommands.FILE_CHUNK, FILE_CHUNK_HEADER.pack(transfer_id_bytes, index) + chunk)
+                    index += 1
+
+            if not self._is_active:
+                self._logger.debug(f'Передача файла [{record.filename}] прервана: сессия закрыта.')
+                return
+
+            done = FileDoneData(transfer_id=record.transfer_id, sha256=file_hash.hexdigest())
+            self._send_encrypted_bytes(NetworkCommands.FILE_DONE, done.model_dump_json().encode('utf-8'))
+            self._logger.debug(f'Файл [{record.filename}] отправлен клиенту [{self._remote_address}]'
+                               f'[{self._peer_user_id_hash} | {self._peer_user_name}].')
+        except OSError:
+            # Закрытие сессии во время передачи - не ошибка: при докачке файл будет передан при следующем подключении
+            if self._is_active or not is_resumable:
+                raise
+            self._logger.debug(f'Передача файла [{record.filename}] прервана: сессия закрыта.')
+        finally:
+            del self._outgoing_files[record.transfer_id]
+
+    def _wait_file_ack(self, outgoing: '_OutgoingFile', predicate: Callable[[], bool]) -> bool:
+        """
+            Ожидает подтверждения от получателя файла, пока не выполнится условие.
+
+        Args:
+            outgoing (_OutgoingFile): Состояние отправляемого файла.
+            predicate (Callable[[], bool]): Условие, которого нужно дождаться.
+
+        Returns:
+            bool: True - если условие выполнилось, False - если истек таймаут или сессия закрыта.
+        """
+        with outgoing.condition:
+            is_done: bool = outgoing.condition.wait_for(lambda: not self._is_active or predicate(), timeout=config.NETWORK.PING.TIMEOUT)
+        return is_done and self._is_active
+
+    def _resume_outgoing_files(self) -> None:
+        """
+            Продолжает отправку файлов собеседнику, прерванную в прошлых сессиях.
+        """
+        if self._peer_protocol_version < ProtocolVersion.RESUMABLE_FILES:
+            return
+
+        for record in self._transfer_journal.load_outgoing_for_peer(self._peer_user_id_hash):
+            if not self._is_active:
+                return
+
+            if not record.is_file_unchanged():
+                self._logger.debug(f'Файл [{record.path}] изменился или был удален. Отменяю его передачу.')
+                self._transfer_journal.remove_outgoing(record.transfer_id)
+                continue
+
+            self._logger.debug(f'Продолжаю передачу файла [{record.filename}] клиенту [{self._peer_user_id_hash} | {self._peer_user_name}].')
+            try:
+                self._send_file(record)
+            except OSError as e:
+                self._logger.debug(f'Не удалось продолжить передачу файла [{record.filename}]. Ошибка [{e}].')
+                return
+
+    def _send_file_ack(self, transfer_id: str, offset: int, completed: bool = False, rejected: bool = False) -> None:
+        """
+            Отправляет подтверждение принятой части файла.
+
+        Args:
+            transfer_id (str): Идентификатор передачи.
+            offset (int): Количество байт, непрерывно записанных на диск с начала файла.
+            completed (bool): Файл полностью получен и проверен.
+            rejected (bool): Файл отклонен. Передается вместе с completed, чтобы отправитель удалил передачу из журнала.
+        """
+        ack = FileAckData(transfer_id=transfer_id, offset=offset, completed=completed, rejected=rejected)
+        self._send_encrypted_bytes(NetworkCommands.FILE_ACK, ack.model_dump_json().encode('utf-8'))
+
+    def _parse_file_frame(self, received_data: NetworkData, model: Type[FileFrameData]) -> Union[FileFrameData, None]:
+        """
+            Разбирает служебный кадр передачи файла. Кадр с некорректными данными (например, идентификатором передачи,
+            который не является uuid4 в hex и мог бы указывать на путь вне журнала) отбрасывается.
+
+        Args:
+            received_data (NetworkData): Полученные данные.
+            model (Type[FileFrameData]): Модель данных кадра.
+
+        Returns:
+            Union[FileFrameData, None]: Данные кадра или None, если кадр отброшен.
+        """
+        try:
+            return model.parse_raw(self._decrypt_payload(received_data))
+        except ValidationError as e:
+            self._logger.warning(f'Отбрасываю кадр [{received_data.command_type.name}] от клиента [{self._remote_address}]'
+                                 f'[{self._peer_user_id_hash} | {self._peer_user_name}]: некорректные данные [{e}].')
+            return None
+
+    def _handle_file_ack(self, received_data: NetworkData) -> None:
+        """
+            Обработка сообщений FILE_ACK: сдвигает окно отправки и удаляет завершенные передачи из журнала.
+
+        Args:
+            received_data (NetworkData): Полученные данные для FILE_ACK.
+        """
+        self._update_ping_time()
+        ack: Union[FileAckData, None] = self._parse_file_frame(received_data, FileAckData)
+        if ack is None:
+            return
+
+        # Удалять можно только запись о нашей отправке этому собеседнику: идентификатор передачи пришел от него
+        if ack.completed:
+            record: Union[OutgoingTransferRecord, None] = self._transfer_journal.load_outgoing(ack.transfer_id)
+            if record is not None and record.peer_id_hash == self._peer_user_id_hash:
+                self._transfer_journal.remove_outgoing(ack.transfer_id)
+
+        outgoing: Union[_OutgoingFile, None] = self._outgoing_files.get(ack.transfer_id)
+        if outgoing is None:
+            return
+
+        with outgoing.condition:
+            outgoing.acked_size = max(outgoing.acked_size, ack.offset)
+            outgoing.is_rejected = outgoing.is_rejected or ack.rejected
+            outgoing.condition.notify_all()
+
+    def _handle_file_offer(self, received_data: NetworkData) -> None:
+        """
+            Обработка сообщений FILE_OFFER: открывает временный файл для приема блоков
+            и сообщает отправителю, с какого смещения продолжать передачу.
+
+        Args:
+            received_data (NetworkData): Полученные данные для FILE_OFFER.
+        """
+        self._update_ping_time()
+        offer: Union[FileOfferData, None] = self._parse_file_frame(received_data, FileOfferData)
+        if offer is None:
+            return
+        self._logger.debug(f"Получил FILE_OFFER [{offer.filename} | {offer.size}] от клиента [{self._remote_address}]"
+                           f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+
+        if offer.size > config.WIDGETS.MAX_FILE_SIZE:
+            self._logger.warning(f'Отклоняю файл [{offer.filename}]: размер [{offer.size}] превышает допустимый.')
+            # Иначе отправитель с докачкой будет предлагать файл заново при каждом подключении
+            if self._peer_protocol_version >= ProtocolVersion.RESUMABLE_FILES:
+                self._send_file_ack(offer.transfer_id, 0, completed=True, rejected=True)
+            return
+
+        # Повторное предложение той же передачи: закрываем прежний файл, прием продолжится по журналу
+        previous: Union[_IncomingFile, None] = self._incoming_files.pop(offer.transfer_id, None)
+        if previous is not None:
+            self._close_incoming_file(previous)
+
+        # Имя файла приходит от собеседника, поэтому отбрасываем любые пути
+        offer.filename = os.path.basename(offer.filename)
+        incoming: _IncomingFile = self._open_incoming_file(offer)
+        self._incoming_files[offer.transfer_id] = incoming
+
+        if self._peer_protocol_version >= ProtocolVersion.RESUMABLE_FILES:
+            self._send_file_ack(offer.transfer_id, incoming.received_size)
+
+    def _open_incoming_file(self, offer: FileOfferData) -> '_IncomingFile':
+        """
+            Открывает временный файл для приема. Если по журналу передача уже начиналась,
+            обрезает его до подтвержденного смещения и восстанавливает хэш полученной части.
+
+        Args:
+            offer (FileOfferData): Описание принимаемого файла.
+
+        Returns:
+            _IncomingFile: Состояние принимаемого файла.
+        """
+        part_path: PathType = self._transfer_journal.part_path(offer.transfer_id)
+        record: Union[IncomingTransferRecord, None] = self._transfer_journal.load_incoming(offer.transfer_id)
+        file_hash = hashlib.sha256()
+
+        if record is not None and record.peer_id_hash == self._peer_user_id_hash and record.size == offer.size \
+                and record.chunk_size == offer.chunk_size and os.path.exists(part_path):
+            offset: int = record.confirmed_size()
+            file = open(part_path, 'r+b')
+            file.truncate(offset)
+            while file.tell() < offset:
+                block: bytes = file.read(min(offer.chunk_size, offset - file.tell()))
+                if not block:
+                    break
+                file_hash.update(block)
+
+            if file.tell() == offset:
+                record.ranges = [(0, record.confirmed_chunks())] if offset else []
+                self._logger.debug(f'Продолжаю прием файла [{offer.filename}] со смещения [{offset}].')
+            else:
+                # Временный файл короче, чем записано в журнале, - принимаем файл заново
+                file.seek(0)
+                file.truncate()
+                file_hash = hashlib.sha256()
+                record.ranges = []
+        else:
+            record = IncomingTransferRecord(
+                transfer_id=offer.transfer_id,
+                owner_id_hash=self._user_id_hash,
+                peer_id_hash=self._peer_user_id_hash,
+                filename=offer.filename,
+                size=offer.size,
+                chunk_size=offer.chunk_size
+            )
+            os.makedirs(config.PATHS.TRANSFERS, exist_ok=True)
+            file = open(part_path, 'wb')
+
+        self._transfer_journal.save(record)
+        return _IncomingFile(
+            record=record,
+            file=file,
+            file_hash=file_hash,
+            received_size=record.confirmed_size(),
+            next_index=record.confirmed_chunks()
+        )
+
+    def _handle_file_chunk(self, received_data: NetworkData) -> None:
+        """
+            Обработка сообщений FILE_CHUNK: дописывает блок во временный файл, отмечает его в журнале и подтверждает.
+
+        Args:
+            received_data (NetworkData): Полученные данные для FILE_CHUNK.
+        """
+        self._update_ping_time()
+        payload: bytes = self._decrypt_payload(received_data)
+        if len(payload) < FILE_CHUNK_HEADER.size:
+            self._logger.warning(f'Получен блок файла без заголовка от клиента [{self._remote_address}]'
+                                 f'[{self._peer_user_id_hash} | {self._peer_user_name}], кадр отброшен.')
+            return
+        transfer_id_bytes, index = FILE_CHUNK_HEADER.unpack_from(payload)
+        transfer_id: str = transfer_id_bytes.hex()
+
+        incoming: Union[_IncomingFile, None] = self._incoming_files.get(transfer_id)
+        if incoming is None:
+            self._logger.warning(f'Получен блок неизвестной передачи [{transfer_id}].')
+            return
+
+        chunk = memoryview(payload)[FILE_CHUNK_HEADER.size:]
+        if index != incoming.next_index or incoming.received_size + len(chunk) > incoming.record.size:
+            self._logger.error(f'Нарушен порядок блоков файла [{incoming.record.filename}]: '
+                               f'ожидался [{incoming.next_index}], получен [{index}]. Передача отменена.')
+            self._discard_incoming_file(transfer_id)
+            return
+
+        incoming.file.write(chunk)
+        incoming.file.flush()
+        incoming.file_hash.update(chunk)
+        incoming.received_size += len(chunk)
+        incoming.next_index += 1
+
+        # В журнал блок попадает только после записи в файл, поэтому подтвержденное смещение всегда есть на диске.
+        # Журнал сохраняется раз в JOURNAL_INTERVAL блоков: после сбоя прием продолжится с последнего сохраненного смещения,
+        # которое получатель сообщит в ответ на FILE_OFFER
+        incoming.record.add_chunk(index)
+        if incoming.next_index % config.NETWORK.FILE_TRANSFER.JOURNAL_INTERVAL == 0:
+            self._transfer_journal.save(incoming.record)
+
+        if self._peer_protocol_version >= ProtocolVersion.RESUMABLE_FILES:
+            self._send_file_ack(transfer_id, incoming.received_size)
+
+    def _handle_file_done(self, received_data: NetworkData) -> None:
         """
-            Обрабатывает текстовые сообщения, проверяя, является ли сообщение повторным, и если нет, сохраняет его в базу.
+            Обработка сообщений FILE_DONE: проверяет целостность файла и переносит его в папку загрузок.
 
         Args:
-            message (MessageTextData): Текстовое сообщение для обработки.
-            resend_flag (bool): Флаг, указывающий, было ли сообщение отправлено повторно.
-
-        Примечание:
-            Если сообщение является повторным и уже содержится в истории, обработка не происходит.
+            received_data (NetworkData): Полученные данные для FILE_DONE.
         """
-        message_id_old = message.id
-        message.id = self._change_perception_for_message_id(message.id)
+        self._update_ping_time()
+        done: Union[FileDoneData, None] = self._parse_file_frame(received_data, FileDoneData)
+        if done is None:
+            return
 
-        # Если это ресенд, то проверяем, есть ли он в темп буфере
-        if resend_flag:
-            if message.id in self._outbound_message_buffer:
-                del self._outbound_message_buffer[message.id]
+        incoming: Union[_IncomingFile, None] = self._incoming_files.pop(done.transfer_id, None)
+        if incoming is None:
+            self._logger.warning(f'Получено завершение неизвестной передачи [{done.transfer_id}].')
+            return
 
-        self._send_event_data_received(message, resend_flag)
-        self._database.save_data([message])
-        self._dialog_history_ids.append(message.id)
+        self._close_incoming_file(incoming)
+        if incoming.received_size != incoming.record.size or incoming.file_hash.hexdigest() != done.sha256:
+            self._logger.error(f'Файл [{incoming.record.filename}] от клиента [{self._peer_user_id_hash}] поврежден при передаче.')
+            self._transfer_journal.remove(done.transfer_id)
+            return
 
-        # Отправляем ответ
-        self._send_recv(MessageData(type=MessageType.Text, message=message_id_old), resend_flag)
+        os.makedirs(config.PATHS.DOWNLOAD, exist_ok=True)
+        os.replace(self._transfer_journal.part_path(done.transfer_id), os.path.join(config.PATHS.DOWNLOAD, incoming.record.filename))
+        self._transfer_journal.remove(done.transfer_id)
+        self._logger.debug(f'Файл [{incoming.record.filename}] успешно получен от клиента [{self._remote_address}]'
+                           f'[{self._peer_user_id_hash} | {self._peer_user_name}].')
 
+        self._send_event(NetworkEventType.FILE_RECEIVED, data=incoming.record.filename)
+        # Отправляем ответ
+        if self._peer_protocol_version >= ProtocolVersion.RESUMABLE_FILES:
+            self._send_file_ack(done.transfer_id, incoming.received_size, completed=True)
+        self._send_recv(MessageData(type=MessageType.File, message=incoming.record.filename))
 
-    def _change_perception_for_message_id(self, message_id: MessageIdType) -> MessageIdType:
+    def _close_incoming_file(self, incoming: '_IncomingFile') -> None:
         """
-            Изменяет идентификатор сообщения для внутренней обработки.
+            Закрывает временный файл и сохраняет в журнал все записанные в него блоки.
 
         Args:
-            message_id (MessageIdType): Исходный идентификатор сообщения.
-
-        Returns:
-            MessageIdType: Изменённый идентификатор сообщения.
+            incoming (_IncomingFile): Состояние принимаемого файла.
         """
-        return message_id.replace('m', 'o') if 'm' in message_id else message_id.replace('o', 'm')
+        incoming.file.close()
+        self._transfer_journal.save(incoming.record)
 
-    def _send_event_data_received(self, message: MessageTextData, resend_flag: bool) -> None:
+    def _discard_incoming_file(self, transfer_id: str) -> None:
         """
-            Отправляет событие о получении данных.
+            Отменяет прием файла и удаляет временный файл вместе с записью журнала.
 
         Args:
-            message (MessageTextData): Данные сообщения.
-            resend_flag (bool): Флаг повторной отправки.
+            transfer_id (str): Идентификатор передачи.
         """
-        self._send_event(NetworkEventType.RECEIVE_DATA, data=message, resend_flag=resend_flag)
+        incoming: Union[_IncomingFile, None] = self._incoming_files.pop(transfer_id, None)
+        if incoming is None:
+            return
+        incoming.file.close()
+        self._transfer_journal.remove(transfer_id)
 
-    def _send_recv(self, message: MessageData, resend_flag: bool = False) -> None:
+    def _suspend_incoming_files(self) -> None:
         """
-            Подготавливает и отправляет сообщение с зашифрованными данными.
+            Приостанавливает прием недополученных файлов при закрытии сессии.
 
-        Args:
-            message (MessageData): Сообщение для отправки.
-            resend_flag (bool): Флаг повторной отправки.
+            Если собеседник поддерживает докачку, временные файлы и журнал сохраняются до следующего подключения,
+            иначе они удаляются.
         """
-        encrypted_data: EncryptedData = self._crypto.encrypt(message.model_dump_json())
-        encrypted_data_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_data.model_dump_json())
-        message_sinature_b64: B64_FormatData = self._crypto.sign_message(encrypted_data_b64)
-
-        data_to_send: NetworkData = NetworkData(
-            command_type=NetworkCommands.RECV_DATA,
-            encrypted_data=encrypted_data,
-            signature=message_sinature_b64,
-            additional=AdditionalData(
-                resend_flag=resend_flag
-            )
-        )
-        self._send_network_data(data_to_send)
+        for transfer_id in list(self._incoming_files):
+            if self._peer_protocol_version >= ProtocolVersion.RESUMABLE_FILES:
+                self._close_incoming_file(self._incoming_files.pop(transfer_id))
+            else:
+                self._discard_incoming_file(transfer_id)
 
-    def _handle_file_message(self, message: MessageFileData) -> None:
+    def _send_batched(self, messages: List[MessageTextData]) -> None:
         """
-            Обрабатывает сообщения с файлами, отправляя событие о получении файла.
+            Отправляет сообщения истории пакетами SEND_BATCH (или по одному старым клиентам).
+
+            Пакет ограничен количеством сообщений и их суммарным размером, поэтому на каждые BATCH_SIZE сообщений
+            приходится одно шифрование, один кадр и одно подтверждение вместо BATCH_SIZE штук.
 
         Args:
-            message (MessageFileData): Сообщение с файлом для обработки.
+            messages (List[MessageTextData]): Сообщения в нашем восприятии.
         """
-        self._send_event_file_received(message)
-        # Отправляем ответ
-        self._send_recv(MessageData(type=MessageType.File, message=message.filename))
-    
-    def _send_event_file_received(self, message: MessageFileData) -> None:
+        if self._peer_protocol_version < ProtocolVersion.BATCHED_SYNC:
+            for message in messages:
+                self.send(MessageData(type=MessageType.Text, message=message), is_resended=True)
+            return
+
+        batch: List[MessageTextData] = []
+        batch_size: int = 0
+        for message in messages:
+            message_size: int = len(message.message.encode()) + len(message.author.encode()) + len(message.time)
+            if batch and (len(batch) >= config.NETWORK.SYNC.BATCH_SIZE or batch_size + message_size > config.NETWORK.SYNC.BATCH_MAX_BYTES):
+                self._send_batch(batch)
+                batch, batch_size = [], 0
+            batch.append(message)
+            batch_size += message_size
+
+        if batch:
+            self._send_batch(batch)
+
+    def _send_batch(self, messages: List[MessageTextData]) -> None:
         """
-            Отправляет событие о получении файла.
+            Отправляет один пакет сообщений.
 
         Args:
-            message (MessageFileData): Данные файла, которые были получены.
+            messages (List[MessageTextData]): Сообщения пакета в нашем восприятии.
         """
-        self._send_event(NetworkEventType.REQUEST_FILE, data=message)
-        
-    def _handle_recv(self, received_data: NetworkData) -> None:
+        batch_json: str = MessageBatchData(messages=messages).model_dump_json()
+        self._send_network_data(self._build_network_data(NetworkCommands.SEND_BATCH, batch_json.encode(), resend_flag=True))
+        self._logger.debug(f"Отправил пакет из [{len(messages)}] сообщений клиенту [{self._remote_address}]"
+                           f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+
+    def _handle_send_batch(self, received_data: NetworkData) -> None:
         """
-            Обработка сообщений Recv.
+            Обрабатывает пакет сообщений: сохраняет их одной записью и отвечает одним RECV_BATCH.
 
         Args:
-            received_data: Полученные данные для Recv
+            received_data (NetworkData): Полученные данные пакета.
         """
         self._update_ping_time()
-        self._logger.debug(f"Получил RECV сообщение от клиента [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
-        
-        decrypted_data: MessageData = MessageData.parse_raw(self._crypto.decrypt(received_data.encrypted_data))
-        
-        match decrypted_data.type:
-            case MessageType.Text:
-                if not received_data.additional.resend_flag:
-                    self._send_event_data_confirmation(self._outbound_message_buffer[decrypted_data.message], received_data.additional.resend_flag) # type: ignore
-                    self._database.save_data(messages=[self._outbound_message_buffer[decrypted_data.message]]) # type: ignore
-                    self._dialog_history_ids.append(decrypted_data.message) # type: ignore
-                del self._outbound_message_buffer[decrypted_data.message] # type: ignore
-            case MessageType.File:
-                self._send_event_file_confirmation(decrypted_data.message) # type: ignore
+        batch: MessageBatchData = MessageBatchData.parse_raw(self._decrypt_payload(received_data))
+        self._logger.debug(f"Получил пакет из [{len(batch.messages)}] сообщений от клиента [{self._remote_address}]"
+                           f"[{self._peer_user_id_hash} | {self._peer_user_name}].")
+
+        received_ids: List[MessageIdType] = [
+            self._accept_text_message(message, resend_flag=True, dont_set_flag=True) for message in batch.messages
+        ]
+        if batch.messages:
+            self._event.set()
+        committed: 'Future[bool]' = self._database.save_data(batch.messages)
 
-    def _send_event_data_confirmation(self, message_id: MessageIdType, resend_flag: bool) -> None:
-        """
-            Отправляет событие о подтверждении отправки данных.
+        # Подтверждаем весь пакет одной сводкой идентификаторов после его фиксации в базе
+        summary_json: str = HistorySummary.from_ids(received_ids).model_dump_json()
+        self._after_history_commit(
+            committed, self._send_network_data,
+            self._build_network_data(NetworkCommands.RECV_BATCH, summary_json.encode(), resend_flag=True)
+        )
 
-        Args:
-            message_id (MessageIdType): Идентификатор сообщения.
-            resend_flag (bool): Флаг, указывающий на повторную отправку.
+    def _handle_recv_batch(self, received_data: NetworkData) -> None:
         """
-        self._send_event(NetworkEventType.SEND_DATA, data=message_id, resend_flag=resend_flag)
-        
-    def _send_event_file_confirmation(self, filename: FilenameType):
-        """
-            Отправляет событие о подтверждении отправки файла.
+            Обрабатывает подтверждение пакета сообщений.
+
+            Сообщения из буфера исходящих сохраняются в историю, а сообщения, взятые из истории, уже сохранены.
 
         Args:
-            filename (FilenameType): Имя файла.
+            received_data (NetworkData): Полученные данные подтверждения.
         """
-        self._send_event(NetworkEventType.FILE_ACCEPTED, data=filename)
-    
+        self._update_ping_time()
+        summary: HistorySummary = HistorySummary.parse_raw(self._decrypt_payload(received_data))
+        if summary.size() > config.NETWORK.SYNC.BATCH_SIZE:
+            self._logger.warning(f"Клиент [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] "
+                                 f"подтвердил [{summary.size()}] сообщений одним пакетом, подтверждение отброшено.")
+            return
+
+        # Сводку не разворачиваем: подтверждаются только сообщения, которые есть в буфере исходящих
+        confirmed: int = self._confirm_outbound_messages([
+            (message_id, True) for message_id in list(self._outbound_message_buffer) if summary.contains(message_id)
+        ])
+        self._logger.debug(f"Клиент [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] "
+                           f"подтвердил пакет из [{confirmed}] сообщений буфера.")
+
     def _handle_sync(self, received_data: NetworkData) -> None:
         """
             Обрабатывает запросы на синхронизацию данных, повторно отправляя необходимые данные.
@@ -931,7 +2281,14 @@ class UserSession:
         self._update_ping_time()
         self._logger.debug(f"Получил SYNC сообщение от клиента [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
         
-        decrypted_data: List[MessageIdType] = json.loads(self._crypto.decrypt(received_data.encrypted_data))
+        # Собеседник запрашивает сообщения нашей истории, поэтому больше ее длины запрос быть не может
+        decrypted_data: Union[HistorySummary, List[MessageIdType], None] = self._parse_history_ids(
+            self._decrypt_payload(received_data).decode(), len(self._dialog_history_ids)
+        )
+        if decrypted_data is None:
+            return
+        if isinstance(decrypted_data, HistorySummary):
+            decrypted_data = decrypted_data.to_ids()
 
         if not decrypted_data:
             self._logger.debug(f"Пришел пустой запрос SYNC от клиента [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
@@ -941,12 +2298,37 @@ class UserSession:
                            f". Всего нужно отправить [{len(decrypted_data)}].")
         
         # Переотправляем N месседжей из истории
-        for message in self._dialog_history:
-            if message.id in decrypted_data:
-                self.send(MessageData(type=MessageType.Text, message=message), is_resended=True)
+        self._send_batched(self._database.load_messages_by_ids(decrypted_data))
 
         self._logger.debug(f"Все [{len(decrypted_data)}] сообщения(-ий) клиенту [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] были отправлены.")
 
+    def _parse_history_ids(self, data: str, max_ids: Union[int, None]) -> Union[HistorySummary, List[MessageIdType], None]:
+        """
+            Разбирает идентификаторы истории из ACK или SYNC_DATA в формате согласованной версии протокола.
+
+        Args:
+            data (str): Расшифрованные данные в JSON.
+            max_ids (Union[int, None]): Сколько идентификаторов может содержать сводка, прежде чем ее развернут в список.
+                None - без ограничения.
+
+        Returns:
+            Union[HistorySummary, List[MessageIdType], None]: Сводка диапазонами или список идентификаторов (старые клиенты).
+                None, если идентификаторов больше max_ids.
+        """
+        history_ids: Union[HistorySummary, List[MessageIdType]]
+        if self._peer_protocol_version >= ProtocolVersion.HISTORY_RANGES:
+            history_ids = HistorySummary.parse_raw(data)
+            size: int = history_ids.size()
+        else:
+            history_ids = json.loads(data)
+            size: int = len(history_ids)
+
+        if max_ids is not None and size > max_ids:
+            self._logger.warning(f"Клиент [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}] "
+                                 f"прислал [{size}] идентификаторов истории при допустимых [{max_ids}], данные отброшены.")
+            return None
+        return history_ids
+
     def _send_sync(self, data: str) -> None:
         """
             Отправляет синхронизированные данные клиенту.
@@ -954,17 +2336,7 @@ class UserSession:
         Args:
             data (str): Строка данных для отправки.
         """
-        encrypted_data: EncryptedData = self._crypto.encrypt(data)
-        encrypted_data_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_data.model_dump_json())
-        message_sinature_b64: B64_FormatData = self._crypto.sign_message(encrypted_data_b64)
-
-        data_to_send: NetworkData = NetworkData(
-            command_type=NetworkCommands.SYNC_DATA,
-            encrypted_data=encrypted_data,
-            signature=message_sinature_b64,
-            additional=AdditionalData()
-        )
-        self._send_network_data(data_to_send)
+        self._send_network_data(self._build_network_data(NetworkCommands.SYNC_DATA, data.encode()))
 
     def _verify_data(self, data: NetworkData) -> bool:
         """
@@ -976,95 +2348,152 @@ class UserSession:
         Returns:
             bool: Возвращает True, если данные подлинные, иначе False.
         """
+        # Кадры после рукопожатия проверяются тегом AES-GCM, расшифрованные данные сохраняются в кадре
+        if self._is_session_aead_frame(data.command_type):
+            try:
+                data._plaintext = self._crypto.decrypt_aead(
+                    data.encrypted_data, self._frame_associated_data(data.command_type, data.additional.resend_flag)
+                )
+            except ValueError:
+                self._logger.warning(f"Пришло поддельное сообщение от имени клиента [{self._remote_address}]"
+                                        f"[{data.additional.user_id_hash} | {data.additional.user_name}]!")
+                return False
+            return True
+
         # Проверяем, что сообщение пришло именно от нашего собеседника
         encrypted_data: EncryptedData = data.encrypted_data
         encrypted_data_b64: B64_FormatData = Encrypter.encode_to_b64(encrypted_data.model_dump_json())
 
-        if not self._crypto.verify_signature(self._peer_rsa_public_key, encrypted_data_b64, data.signature):
+        if self._peer_rsa_verifier is None or not self._crypto.verify_signature(self._peer_rsa_verifier, encrypted_data_b64, data.signature):
             self._logger.warning(f"Пришло поддельное сообщение от имени клиента [{self._remote_address}]"
                                     f"[{data.additional.user_id_hash} | {data.additional.user_name}]!")
             return False
 
         if data.signature_additional:
             additional_info: AdditionalData = data.additional
-            additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.model_dump_json())
+            additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.dump_without_version())
 
-            if not self._crypto.verify_signature(self._peer_rsa_public_key, additional_info_b64, data.signature_additional):
+            if not self._crypto.verify_signature(self._peer_rsa_verifier, additional_info_b64, data.signature_additional):
                 self._logger.warning(f"Пришло поддельное сообщение от имени клиента [{self._remote_address}]"
                                     f"[{data.additional.user_id_hash} | {data.additional.user_name}]!")
                 return False
+
+        # Версию протокола принимаем только вместе с подписью, иначе ее можно понизить в пути
+        if data.additional.protocol_version != ProtocolVersion.LEGACY_JSON:
+            protocol_info_b64: B64_FormatData = Encrypter.encode_to_b64(data.additional.model_dump_json())
+            if not data.signature_protocol or \
+                    not self._crypto.verify_signature(self._peer_rsa_verifier, protocol_info_b64, data.signature_protocol):
+                self._logger.warning(f"Пришла неподписанная версия протокола от клиента [{self._remote_address}]"
+                                     f"[{data.additional.user_id_hash} | {data.additional.user_name}]!")
+                return False
         return True
 
-    def _sync_dialog_history(self, peer_dialog_message_ids: List[MessageIdType]) -> None:
+    def _sync_dialog_history(self, peer_dialog_message_ids: Union[HistorySummary, List[MessageIdType]]) -> None:
         """
             Синхронизирует историю сообщений с удалённым пиром.
 
         Args:
-            peer_dialog_message_ids (List[MessageIdType]): Список идентификаторов сообщений от пира.
+            peer_dialog_message_ids (Union[HistorySummary, List[MessageIdType]]): Сводка или список идентификаторов сообщений от пира.
         """
-        # Если у нас пустая история и у него, то выходим
-        if not len(peer_dialog_message_ids) and not len(self._dialog_history):
-            return
+        if isinstance(peer_dialog_message_ids, HistorySummary):
+            is_peer_history_empty = peer_dialog_message_ids.is_empty()
+        else:
+            is_peer_history_empty = not peer_dialog_message_ids
 
+        try:
+            # Если у нас пустая история и у него, то синхронизировать сообщения не нужно
+            if not is_peer_history_empty or len(self._dialog_history_ids):
+                self._sync_dialog_messages(peer_dialog_message_ids)
+        finally:
+            # Докачиваем файлы, передача которых была прервана в прошлых сессиях, даже если сверка истории не удалась
+            self._resume_outgoing_files()
+
+    def _sync_dialog_messages(self, peer_dialog_message_ids: Union[HistorySummary, List[MessageIdType]]) -> None:
+        """
+            Синхронизирует сообщения диалога с удалённым пиром.
+
+        Args:
+            peer_dialog_message_ids (Union[HistorySummary, List[MessageIdType]]): Сводка или список идентификаторов сообщений от пира.
+        """
         # Изменяем идентификаторы сообщений для внутреннего использования.
         # Заменяем префиксы, обозначающие, чьи это сообщения (m-наши, o-его)
-        peer_dialog_message_ids = [self._change_perception_for_message_id(mid) for mid in peer_dialog_message_ids]
+        if isinstance(peer_dialog_message_ids, HistorySummary):
+            # Сверка по диапазонам: для синхронизированных диалогов не зависит от длины истории пира
+            plan: SyncPlan = build_sync_plan_from_summary(
+                self._dialog_history_ids, list(self._outbound_message_buffer), peer_dialog_message_ids.change_perception(),
+                max_missing_local=config.NETWORK.SYNC.MAX_REQUEST_IDS
+            )
+        else:
+            peer_dialog_message_ids = [self._change_perception_for_message_id(mid) for mid in peer_dialog_message_ids]
+
+            # Сверка по множествам за O(n + m) вместо поиска по спискам
+            plan: SyncPlan = build_sync_plan(self._dialog_history_ids, list(self._outbound_message_buffer), peer_dialog_message_ids)
 
         # Переотправляем сообщения из временного буфера, если пир их не получил.
-        self._resend_messages_from_buffer(peer_dialog_message_ids)
+        self._resend_messages_from_buffer(plan.resend_ids, plan.confirmed_ids)
 
         # Отправляем сообщения, которых нет у пира, но есть в нашей истории.
-        self._send_missing_messages(peer_dialog_message_ids)
+        self._send_missing_messages(plan.missing_on_peer_ids)
 
         # Проверяем, есть ли сообщения у пира, которых нет в нашей истории.
-        self._request_missing_messages(peer_dialog_message_ids)
+        self._request_missing_messages(plan.missing_local_ids)
 
-    def _send_missing_messages(self, peer_message_ids: List[MessageIdType]) -> None:
+    def _send_missing_messages(self, missing_message_ids: List[MessageIdType]) -> None:
         """
             Отправляет сообщения, которых нет у пира.
 
         Args:
-            peer_message_ids (List[MessageIdType]): Список идентификаторов сообщений от пира.
+            missing_message_ids (List[MessageIdType]): Идентификаторы сообщений нашей истории, которых нет у пира.
         """
-        missing_messages = [msg for msg in self._dialog_history if msg.id not in peer_message_ids]
-        for msg in missing_messages:
-            self.send(MessageData(type=MessageType.Text, message=msg), is_resended=True)
+        self._send_batched(self._database.load_messages_by_ids(missing_message_ids))
 
-    def _request_missing_messages(self, peer_message_ids: List[MessageIdType]) -> None:
+    def _request_missing_messages(self, missing_peer_messages: List[MessageIdType]) -> None:
         """
             Запрашивает у пира сообщения, которых нет в нашей истории.
 
         Args:
-            peer_message_ids (List[MessageIdType]): Список идентификаторов сообщений от пира.
-        """
-        if peer_message_ids:
-            our_message_ids = [msg_id for msg_id in self._dialog_history_ids]
-            missing_peer_messages = [mid for mid in peer_message_ids if mid not in our_message_ids]
-
-            if missing_peer_messages:
-                self._logger.debug(f"Запрашиваю отсутствующие сообщения у [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
-                # Возвращаем префиксы, обозначающие, чьи это сообщения (m-наши, o-его)
-                missing_peer_messages = [self._change_perception_for_message_id(mid) for mid in missing_peer_messages]
+            missing_peer_messages (List[MessageIdType]): Идентификаторы сообщений пира, которых нет у нас.
+        """
+        if missing_peer_messages:
+            self._logger.debug(f"Запрашиваю отсутствующие сообщения у [{self._remote_address}][{self._peer_user_id_hash} | {self._peer_user_name}].")
+            # За одну синхронизацию запрашиваем не больше MAX_REQUEST_IDS сообщений, остальные - при следующем подключении
+            missing_peer_messages = missing_peer_messages[:config.NETWORK.SYNC.MAX_REQUEST_IDS]
+            # Возвращаем префиксы, обозначающие, чьи это сообщения (m-наши, o-его)
+            missing_peer_messages = [self._change_perception_for_message_id(mid) for mid in missing_peer_messages]
+            if self._peer_protocol_version >= ProtocolVersion.HISTORY_RANGES:
+                self._send_sync(HistorySummary.from_ids(missing_peer_messages).model_dump_json())
+            else:
                 self._send_sync(json.dumps(missing_peer_messages))
 
-    def _resend_messages_from_buffer(self, peer_message_ids: List[MessageIdType]) -> None:
+    def _resend_messages_from_buffer(self, resend_ids: List[MessageIdType], confirmed_ids: List[MessageIdType]) -> None:
         """
             Переотправляет сообщения из временного буфера, если пир их не получил.
 
         Args:
-            peer_message_ids (List[MessageIdType]): Список идентификаторов сообщений от пира.
-        """
+            resend_ids (List[MessageIdType]): Сообщения буфера, которых нет у пира.
+            confirmed_ids (List[MessageIdType]): Сообщения буфера, которые пир уже получил.
+        """
+        # Синхронизация идет в фоновом потоке, а поток кадров тем временем может подтвердить и удалить
+        # часть сообщений буфера. Такие сообщения пропускаем
+        with self._outbound_lock:
+            resend_messages: List[MessageTextData] = [
+                msg for msg in map(self._outbound_message_buffer.get, resend_ids) if msg is not None
+            ]
+            confirmed_messages: List[Tuple[MessageIdType, MessageTextData]] = [
+                (msg_id, msg) for msg_id in confirmed_ids
+                if (msg := self._outbound_message_buffer.pop(msg_id, None)) is not None
+            ]
+
+        # Сообщения остаются в буфере до подтверждения, пакет лишь сокращает число кадров
+        self._send_batched(resend_messages)
+
+        # Сообщения, которые пир уже получил, просто сохраняем из буфера в историю
         existed_msg: List[MessageTextData] = []
-        for msg_id, msg in list(self._outbound_message_buffer.items()):
-            if msg_id not in peer_message_ids:
-                self.send(MessageData(type=MessageType.Text, message=msg), is_resended=True)
-            else:
-                # Иначе просто сохраняем сообщения из буфера в историю
-                # Пулим в ивент для обновления истории сообщений
-                self._send_event(NetworkEventType.SEND_DATA, data=msg, resend_flag=True, dont_set_flag=True)
-                existed_msg.append(msg)
-                self._dialog_history_ids.append(msg_id)
-                del self._outbound_message_buffer[msg_id]
+        for msg_id, msg in confirmed_messages:
+            # Пулим в ивент для обновления истории сообщений
+            self._send_event(NetworkEventType.SEND_DATA, data=msg, resend_flag=True, dont_set_flag=True)
+            existed_msg.append(msg)
+            self._dialog_history_ids[msg_id] = None
 
         if existed_msg:                
             self._event.set()
@@ -1102,7 +2531,7 @@ class UserSession:
             user_id_hash=self._user_id_hash,
             user_name=self._user_name
         )
-        additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.model_dump_json())
+        additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.dump_without_version())
         additional_info_signature_b64: B64_FormatData = self._crypto.sign_message(additional_info_b64)
 
         # Сборка данных для отправки
@@ -1137,7 +2566,7 @@ class UserSession:
             message_signature_b64: B64_FormatData = self._crypto.sign_message(encrypted_data_b64)
 
             additional_info: AdditionalData = AdditionalData()
-            additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.model_dump_json())
+            additional_info_b64: B64_FormatData = Encrypter.encode_to_b64(additional_info.dump_without_version())
             additional_info_signature_b64: B64_FormatData = self._crypto.sign_message(additional_info_b64)
 
             # Сборка данных для отправки
@@ -1163,10 +2592,45 @@ class ClientManager:
 
         # Список активных сессий
         self._sessions: Dict[int, UserSession] = {}
+        # Таймеры всех сессий (проверка соединения, отложенные подтверждения)
+        self._scheduler: Scheduler = Scheduler(logger)
 
         self.setup_listener(port)
+        self._start_session_cleanup()
+
+    def _start_session_cleanup(self) -> None:
+        """
+            Запускает удаление завершившихся сессий.
+        """
         threading.Thread(target=self._delete_closed_session, daemon=True).start()
 
+    def _create_session(self, remote_address: Tuple[IPAddressType, PortType], peer_rsa_public_key: RSA_KeyType,
+                        connection_socket: socket.socket) -> UserSession:
+        """
+            Создает сессию и регистрирует ее в списке активных сессий.
+
+        Args:
+            remote_address (Tuple[IPAddressType, PortType]): IP-адрес и порт собеседника.
+            peer_rsa_public_key (RSA_KeyType): Публичный ключ собеседника (пустой для входящих подключений).
+            connection_socket (socket.socket): Сокет соединения.
+
+        Returns:
+            UserSession: Созданная сессия.
+        """
+        session = UserSession(
+            connection_socket=connection_socket,
+            remote_address=remote_address,
+            user_id_hash=self._client_info.user_id_hash,
+            user_name=self._client_info.user_name,
+            user_password=self._client_info.user_password,
+            peer_rsa_public_key=peer_rsa_public_key,
+            logger=self._logger,
+            event=self.event,
+            scheduler=self._scheduler
+        )
+        self._sessions[session.get_id()] = session
+        return session
+
     def setup_listener(self, port: PortType = config.NETWORK.CLIENT_COMMUNICATION_PORT) -> None:
         """
             Настройка и запуск прослушивающего сокета.
@@ -1204,17 +2668,7 @@ class ClientManager:
             try:
                 client_socket, addr = self._listener_socket.accept()
                 self._logger.debug(f'Создаю новую сессию с [{addr}].')
-                session = UserSession(
-                    connection_socket=client_socket,
-                    remote_address=addr,
-                    user_id_hash=self._client_info.user_id_hash,
-                    user_name=self._client_info.user_name,
-                    user_password=self._client_info.user_password,
-                    peer_rsa_public_key='',
-                    logger=self._logger,
-                    event=self.event
-                )
-                self._sessions[session.get_id()] = session
+                self._create_session(addr, '', connection_socket=client_socket).start()
 
             except OSError as e:
                 self._logger.debug(f'Завершаю прослушивание порта [{self._listen_communication_port}].')
@@ -1243,17 +2697,11 @@ class ClientManager:
             Создает новую сессию для взаимодействия с пиром.
         """
         self._logger.debug(f'Создаю новую сессию с [{(peer_info.avaliable_ip, peer_info.avaliable_port)}].')
-        session = UserSession(
-            connection_socket=socket.socket(socket.AF_INET, socket.SOCK_STREAM),
-            remote_address=(peer_info.avaliable_ip, peer_info.avaliable_port),
-            user_id_hash=self._client_info.user_id_hash,
-            user_name=self._client_info.user_name,
-            user_password=self._client_info.user_password,
-            peer_rsa_public_key=peer_info.rsa_public_key,
-            logger=self._logger,
-            event=self.event
+        session = self._create_session(
+            (peer_info.avaliable_ip, peer_info.avaliable_port),
+            peer_info.rsa_public_key,
+            connection_socket=socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         )
-        self._sessions[session.get_id()] = session
         return session.connect()
 
     def close_all_sessions(self) -> None:
@@ -1287,6 +2735,7 @@ class ClientManager:
             )
         )
         self.event.set()
+        self._scheduler.stop()
         self._logger.debug("Все сессии завершены.")
     
     def get_state(self) -> bool:
@@ -1355,8 +2804,8 @@ class ClientManager:
     def _get_global_ip_address(self) -> str:
         """Получает глобальный IP адрес клиента через внешний сервис."""
         try:
-            response = requests.get('https://ifconfig.me')
-            ip_address = response.text
+            response = requests.get('https://ifconfig.me', timeout=config.NETWORK.PUBLIC_IP_TIMEOUT)
+            ip_address = response.text.strip()
             self._logger.debug(f"Получен глобальный ip адрес [{ip_address}].")
             return ip_address
         except requests.RequestException as e:
@@ -1377,12 +2826,20 @@ class SessionInfo:
 class ClientHelper:
     def __init__(self, logger: Logger) -> None:
         self._logger: Logger = logger
-        self._client: ClientManager = ClientManager(logger, config.NETWORK.CLIENT_COMMUNICATION_PORT)
+        if config.NETWORK.ASYNCIO.ENABLED:
+            # Импорт здесь, так как libs.aio_network сам зависит от этого модуля
+            from libs.aio_network import AsyncClientManager
+            self._client: ClientManager = AsyncClientManager(logger, config.NETWORK.CLIENT_COMMUNICATION_PORT)
+        else:
+            self._client: ClientManager = ClientManager(logger, config.NETWORK.CLIENT_COMMUNICATION_PORT)
 
         self._active_dialogs: Dict[UserIdHashType, SessionInfo] = {}
         self._inactive_dialogs: Dict[UserIdHashType, SessionInfo] = {}
 
         self._ip_address: IPAddressType = ''
+        # Кэш профилей собеседников из DHT, создается при входе в аккаунт
+        self._dht_cache: Union[DHTProfileCache, None] = None
+        self._published_dht_key: str = ''   # DHT ключ, под которым публикуется наш профиль
 
         self._create_accounts_db()
 
@@ -1518,36 +2975,59 @@ class ClientHelper:
     def is_own_ip(self, peer_ip: IPAddressType) -> bool:
         return self._ip_address == peer_ip
 
-    def set_client_info(self, dialog_manager: DialogManager, client_info: ClientInfo) -> None:
+    def set_client_info(self, dialog_manager: DialogManager, ui_queue: UIUpdateQueue, client_info: ClientInfo) -> None:
         """
             Устанавливает значения, введенные пользователем.
+            Вызывается из фонового потока, поэтому диалоги создаются через очередь обновлений интерфейса.
         Args:
+            dialog_manager (DialogManager): Ссылка на виджет диалогов.
+            ui_queue (UIUpdateQueue): Очередь обновлений интерфейса.
             client_info (ClientInfo): Клиентская информация.
         """
         if self._client._client_info.user_id != client_info.user_id:
             try:
                 peers_ids_hash = AccountDatabaseManager.fetch_all_peer_id(client_info.user_id_hash)
-                history_database = HistoryDatabaseManager(client_info.user_id_hash, client_info.user_password, self._logger)
 
                 for peer_id_hash in peers_ids_hash:
-                    history_database.set_table_name(peer_id_hash)
-                    history_data, _ = history_database.load_data()
+                    # Загружаем только последнюю страницу истории, остальное диалог подгрузит при прокрутке
+                    history_database = self._open_history_database(client_info, peer_id_hash)
+                    history_data = history_database.load_page()
 
                     if history_data:
                         self._inactive_dialogs[peer_id_hash] = SessionInfo(
-                            dialog_id=dialog_manager.add_dialog(
+                            dialog_id=ui_queue.invoke(functools.partial(
+                                dialog_manager.add_dialog,
                                 dialog_name=peer_id_hash,
                                 interlocutor_id=peer_id_hash,
-                                dialog_history=history_data
-                            ),
+                                dialog_history=history_data,
+                                history_loader=history_database.load_page,
+                                message_id_counter=history_database.load_next_message_number()
+                            )),
                             session_id=-1
                         )
-                        dialog_manager.inactivate_dialog(self._inactive_dialogs[peer_id_hash].dialog_id)
+                        ui_queue.post(dialog_manager.inactivate_dialog, self._inactive_dialogs[peer_id_hash].dialog_id)
             except DatabaseGetDataError as e:
                 self._logger.error(f"{e}")
 
+            self._dht_cache = DHTProfileCache(self._logger, client_info.user_id, client_info.user_password, self._client.dht.get_async)
+
         self._client.set_client_info(client_info)
 
+    def _open_history_database(self, client_info: ClientInfo, peer_id_hash: UserIdHashType) -> HistoryDatabaseManager:
+        """
+            Открывает историю диалога с собеседником для постраничной загрузки в интерфейсе.
+
+        Args:
+            client_info (ClientInfo): Информация о пользователе.
+            peer_id_hash (UserIdHashType): Идентификатор собеседника.
+
+        Returns:
+            HistoryDatabaseManager: Менеджер истории диалога.
+        """
+        history_database = HistoryDatabaseManager(client_info.user_id_hash, client_info.user_password, self._logger)
+        history_database.set_table_name(peer_id_hash)
+        return history_database
+
     def get_hash(self, input_string: str, desired_length: int = 256) -> str:
         """
             Генерирует хэш из строки заданной длины. Хэш функция sha256.
@@ -1686,17 +3166,94 @@ class ClientHelper:
     def set_data_to_dht(self, key: str, data: DHTPeerProfile) -> None:
         self._client.dht.set_data(key=key, data=data.model_dump_json())
 
+    def publish_own_profile(self) -> None:
+        """
+            Публикует наш профиль в DHT по ключу пользователя и поддерживает его там.
+
+            Профиль перезаписывается сразу, как только меняется наш IP адрес или порт приложения,
+            а неизменный профиль периодически записывается повторно. Публикация под прежним ключом прекращается.
+            IP адрес определяется заново не чаще раза в DHT_REPUBLISH.IP_RECHECK_INTERVAL секунд,
+            чтобы не обращаться к внешнему сервису при каждой проверке профиля.
+        """
+        client_info = self._client._client_info
+        rsa_public_key = Encrypter.load_rsa_public_key(config.PATHS.KEYS, client_info.user_id_hash, client_info.user_password)
+        # Адрес, определенный перед публикацией (get_ip), используется до следующей перепроверки
+        ip_address: IPAddressType = self._ip_address
+        resolved_at: float = time.monotonic() if ip_address else 0.0
+
+        def own_profile() -> str:
+            nonlocal ip_address, resolved_at
+            if not ip_address or time.monotonic() - resolved_at >= config.NETWORK.DHT_REPUBLISH.IP_RECHECK_INTERVAL:
+                ip_address, resolved_at = self.get_ip(), time.monotonic()
+            if not ip_address:
+                return ''
+            return DHTPeerProfile(
+                avaliable_ip=ip_address,
+                avaliable_port=client_info.application_port,
+                rsa_public_key=rsa_public_key
+            ).model_dump_json()
+
+        if self._published_dht_key and self._published_dht_key != client_info.user_dht_key:
+            self._client.dht.unpublish(self._published_dht_key)
+        self._published_dht_key = client_info.user_dht_key
+        self._client.dht.publish(client_info.user_dht_key, own_profile)
+
     def get_data_from_dht(self, key: str) -> DHTPeerProfile:
+        """
+            Возвращает профиль собеседника по его DHT ключу. Известные профили берутся из кэша без обращения к DHT.
+
+        Args:
+            key (str): DHT ключ собеседника.
+
+        Returns:
+            DHTPeerProfile: Профиль собеседника.
+        """
+        if self._dht_cache is not None:
+            return self._dht_cache.get(key)
         return DHTPeerProfile.parse_raw(self._client.dht.get_data(key=key))
 
+    def prefetch_dht_profiles(self, keys: Iterable[str]) -> Dict[str, bool]:
+        """
+            Заранее получает из DHT профили сохраненных собеседников, чтобы подключение к ним не ждало DHT.
+
+        Args:
+            keys (Iterable[str]): DHT ключи собеседников.
+
+        Returns:
+            Dict[str, bool]: DHT ключ -> найден ли профиль собеседника в DHT.
+        """
+        if self._dht_cache is None:
+            return {}
+        return self._dht_cache.prefetch(keys)
+
     def is_dialog_active(self, peer_user_id_hash: UserIdHashType) -> bool:
         return peer_user_id_hash in self._active_dialogs
 
     def close_session(self, peer_user_id_hash: UserIdHashType) -> None:
         self._client.get_session(self._active_dialogs[peer_user_id_hash].session_id).close()
 
-    def connect(self, peer_info: DHTPeerProfile) -> None:
-        self._client.connect(peer_info)
+    def connect(self, peer_info: DHTPeerProfile, dht_key: str = '') -> None:
+        """
+            Подключается к собеседнику. Если по адресу из кэша подключиться не удалось, профиль удаляется из кэша
+            и подключение повторяется по адресу, заново полученному из DHT.
+
+        Args:
+            peer_info (DHTPeerProfile): Профиль собеседника.
+            dht_key (str): DHT ключ, по которому получен профиль.
+        """
+        if self._client.connect(peer_info) != -1 or not dht_key or self._dht_cache is None:
+            return
+
+        self._logger.debug(f'Не удалось подключиться к [{dht_key}] по сохраненному адресу, запрашиваю профиль из DHT.')
+        self._dht_cache.invalidate(dht_key)
+        try:
+            fresh_peer_info = self.get_data_from_dht(dht_key)
+        except (OSError, TypeError, ValidationError, EmptyDHTDataError) as e:
+            self._logger.error(f'Не удалось получить данные клиента [{dht_key}]. Ошибка [{e}].')
+            return
+
+        if fresh_peer_info != peer_info:
+            self._client.connect(fresh_peer_info)
 
     def send_message_to_another_client(self, message: MessageData, peer_user_id_hash: UserIdHashType) -> None:
         self._client.get_session(self._active_dialogs[peer_user_id_hash].session_id).send(message)
@@ -1708,115 +3265,205 @@ class ClientHelper:
         self._client.close_all_sessions()
         self._inactive_dialogs = {}
 
-    def handle_dialog(self, app_root: Any, dialogs: DialogManager) -> None:
+    def handle_dialog(self, app_root: Any, dialogs: DialogManager, ui_queue: UIUpdateQueue) -> None:
         """
             Обработчик ивентов для отображения данных.
 
+            События сети передаются в шину событий: события одного собеседника обрабатываются по порядку
+            в своей полосе, события разных собеседников - параллельно в ограниченном пуле потоков.
+            Виджеты обработчики не трогают: изменения передаются в очередь обновлений интерфейса.
+            Долгие действия (запись файла, вопрос пользователю) полосу не занимают, чтобы не задерживать
+            остальные события собеседника.
+
         Args:
             app_root (Any): Ссылка на главное окно (для меседжбокса)
             dialogs (DialogManager): Ссылка на виджет диалогов.
+            ui_queue (UIUpdateQueue): Очередь обновлений интерфейса.
+        """
+        bus: EventBus = EventBus(self._logger)
+        background: ThreadPoolExecutor = ThreadPoolExecutor(config.EVENTS.BACKGROUND_WORKERS, thread_name_prefix='events-background')
+        by_peer: Callable[[NetworkEventMessage], Hashable] = lambda event: event.event_data.user_id_hash
+
+        bus.subscribe(NetworkEventType.CONNECT, functools.partial(self._on_connect_event, ui_queue, dialogs), key=by_peer)
+        bus.subscribe(NetworkEventType.DISCONNECT, functools.partial(self._on_disconnect_event, ui_queue, dialogs), key=by_peer)
+        bus.subscribe(NetworkEventType.LOGOUT, self._on_logout_event, key=by_peer)
+        bus.subscribe(NetworkEventType.SEND_DATA, functools.partial(self._on_message_events, ui_queue, dialogs), key=by_peer, batched=True)
+        bus.subscribe(NetworkEventType.RECEIVE_DATA, functools.partial(self._on_message_events, ui_queue, dialogs), key=by_peer, batched=True)
+        bus.subscribe(NetworkEventType.REQUEST_FILE, functools.partial(self._on_request_file_event, app_root, background), key=by_peer)
+        bus.subscribe(NetworkEventType.UNKNOWN_RSA_PUBLIC_KEY, functools.partial(self._on_unknown_rsa_public_key_event, app_root, ui_queue), key=by_peer)
+        for event_type in (NetworkEventType.FILE_RECEIVED, NetworkEventType.FILE_ACCEPTED, NetworkEventType.ALREADY_EXISTS,
+                           NetworkEventType.CONNECTING_TO_OURSELVES, NetworkEventType.FAILED_CONNECT):
+            bus.subscribe(event_type, functools.partial(self._on_notification_event, app_root))
+
+        try:
+            while self._client.get_state():
+                self._client.event.wait()
+                self._client.event.clear()
+
+                while not self._client.event.messages.empty():
+                    event_data: NetworkEventMessage = self._client.event.messages.get(block=False)
+                    if not event_data:
+                        break
+                    if event_data.event_type == NetworkEventType.CLOSE_CLIENT:
+                        return
+                    bus.publish(event_data.event_type, event_data)
+        finally:
+            bus.stop()
+            background.shutdown(wait=False)
+
+    def _on_connect_event(self, ui_queue: UIUpdateQueue, dialogs: DialogManager, event_data: NetworkEventMessage) -> None:
         """
-        while self._client.get_state():
-            self._client.event.wait()
-            self._client.event.clear()
+            Открывает диалог с подключившимся собеседником.
 
-            while not self._client.event.messages.empty():
-                event_data: NetworkEventMessage = self._client.event.messages.get(block=False)
-                if not event_data:
-                    break
+        Args:
+            ui_queue (UIUpdateQueue): Очередь обновлений интерфейса.
+            dialogs (DialogManager): Ссылка на виджет диалогов.
+            event_data (NetworkEventMessage): Событие CONNECT.
+        """
+        if event_data.event_data.user_id_hash in self._inactive_dialogs:
+            ui_queue.post(dialogs.load_dialog, self._inactive_dialogs[event_data.event_data.user_id_hash].dialog_id)
+            
+            self._active_dialogs[event_data.event_data.user_id_hash] = SessionInfo(
+                dialog_id=self._inactive_dialogs[event_data.event_data.user_id_hash].dialog_id,
+                session_id=event_data.event_data.session_id
+            )
+            ui_queue.post(
+                dialogs.set_dialog_name,
+                self._active_dialogs[event_data.event_data.user_id_hash].dialog_id,
+                event_data.event_data.user_name
+            )
+
+            del self._inactive_dialogs[event_data.event_data.user_id_hash]
+        else:
+            history_database = self._open_history_database(self._client._client_info, event_data.event_data.user_id_hash)
+            self._active_dialogs[event_data.event_data.user_id_hash] = SessionInfo(
+                dialog_id=ui_queue.invoke(functools.partial(
+                    dialogs.add_dialog,
+                    dialog_name=event_data.event_data.user_name,
+                    interlocutor_id=event_data.event_data.user_id_hash,
+                    dialog_history=event_data.event_data.data, # type: ignore
+                    history_loader=history_database.load_page,
+                    message_id_counter=history_database.load_next_message_number())),
+                session_id=event_data.event_data.session_id
+            )
+
+    def _on_disconnect_event(self, ui_queue: UIUpdateQueue, dialogs: DialogManager, event_data: NetworkEventMessage) -> None:
+        """
+            Переводит диалог с отключившимся собеседником в неактивные.
+
+        Args:
+            ui_queue (UIUpdateQueue): Очередь обновлений интерфейса.
+            dialogs (DialogManager): Ссылка на виджет диалогов.
+            event_data (NetworkEventMessage): Событие DISCONNECT.
+        """
+        if event_data.event_data.user_id_hash in self._active_dialogs:
+            ui_queue.post(dialogs.inactivate_dialog, self._active_dialogs[event_data.event_data.user_id_hash].dialog_id)
+            
+            self._inactive_dialogs[event_data.event_data.user_id_hash] = SessionInfo(
+                dialog_id=self._active_dialogs[event_data.event_data.user_id_hash].dialog_id,
+                session_id=-1
+            )
+            
+            del self._active_dialogs[event_data.event_data.user_id_hash]
+
+    def _on_logout_event(self, event_data: NetworkEventMessage) -> None:
+        """
+            Забывает диалог собеседника, который вышел из аккаунта.
+
+        Args:
+            event_data (NetworkEventMessage): Событие LOGOUT.
+        """
+        if event_data.event_data.user_id_hash in self._active_dialogs:
+            del self._active_dialogs[event_data.event_data.user_id_hash]
+
+    def _on_message_events(self, ui_queue: UIUpdateQueue, dialogs: DialogManager, events: List[NetworkEventMessage]) -> None:
+        """
+            Отображает пачку полученных и переотправленных сообщений одного собеседника.
+
+        Args:
+            ui_queue (UIUpdateQueue): Очередь обновлений интерфейса.
+            dialogs (DialogManager): Ссылка на виджет диалогов.
+            events (List[NetworkEventMessage]): События SEND_DATA или RECEIVE_DATA одного собеседника.
+        """
+        user_id_hash: UserIdHashType = events[0].event_data.user_id_hash
+        if user_id_hash not in self._active_dialogs:
+            return
+
+        # Из своих сообщений показываем только переотправленные: остальные уже добавлены в диалог при отправке
+        messages: List[MessageTextData] = [
+            event.event_data.data for event in events # type: ignore
+            if event.event_type == NetworkEventType.RECEIVE_DATA or event.event_data.resend_flag
+        ]
+        if messages:
+            ui_queue.post_messages(dialogs.get_dialog(self._active_dialogs[user_id_hash].dialog_id), messages)
+
+    def _on_request_file_event(self, app_root: Any, background: ThreadPoolExecutor, event_data: NetworkEventMessage) -> None:
+        """
+            Передает запись полученного от собеседника файла в фоновый поток.
+
+        Args:
+            app_root (Any): Ссылка на главное окно (для меседжбокса)
+            background (ThreadPoolExecutor): Потоки длительных обработчиков событий.
+            event_data (NetworkEventMessage): Событие REQUEST_FILE.
+        """
+        background.submit(self._create_file_from_data, app_root, event_data.event_data.data, event_data.event_data.user_id_hash) # type: ignore
+
+    def _on_unknown_rsa_public_key_event(self, app_root: Any, ui_queue: UIUpdateQueue, event_data: NetworkEventMessage) -> None:
+        """
+            Ставит вопрос о неизвестном ключе в очередь интерфейса, не дожидаясь ответа пользователя.
+
+        Args:
+            app_root (Any): Ссылка на главное окно (для меседжбокса)
+            ui_queue (UIUpdateQueue): Очередь обновлений интерфейса.
+            event_data (NetworkEventMessage): Событие UNKNOWN_RSA_PUBLIC_KEY.
+        """
+        self._logger.debug(f'Получен неизвестный публичный ключ RSA от клиента [{event_data.event_data.user_id_hash}].')
+        ui_queue.post(self._ask_unknown_rsa_public_key_decision, app_root, event_data)
+
+    def _ask_unknown_rsa_public_key_decision(self, app_root: Any, event_data: NetworkEventMessage) -> None:
+        """
+            Спрашивает пользователя, доверяет ли он собеседнику с неизвестным ключом, и передает решение сессии.
+            Вызывается в потоке интерфейса.
+
+        Args:
+            app_root (Any): Ссылка на главное окно (для меседжбокса)
+            event_data (NetworkEventMessage): Событие UNKNOWN_RSA_PUBLIC_KEY.
+        """
+        result = YesNoDialog.ask_yes_no(app_root, 'Предупреждение', f'Получен неизвестный публичный ключ RSA от клиента [{event_data.event_data.user_id_hash}].\n\n'
+                               f'За данным аккаунтом может оказаться злоумышленник, Вы доверяете данному пользователю и хотите начать диалог?')
+        
+        try:
+            self._client.get_session(event_data.event_data.session_id).set_client_decision(result)
+        except UnavailableSessionIdError:
+            CustomMessageBox.show(app_root, 'Ошибка', f'Соединение с клиентом [{event_data.event_data.user_id_hash}] было закрыто из-за неактивности.', CustomMessageType.ERROR)
+
+    def _on_notification_event(self, app_root: Any, event_data: NetworkEventMessage) -> None:
+        """
+            Показывает пользователю уведомление о событии сети.
 
-                try:
-
-                    def _show_message(user_id_hash: UserIdHashType, message: MessageTextData):
-                        nonlocal dialogs
-                        
-                        dialog = dialogs.get_dialog(self._active_dialogs[user_id_hash].dialog_id)
-                        if not dialog.exist_message(message):
-                            dialog.recieve_message(message)
-
-                    match event_data.event_type:
-                        case NetworkEventType.CONNECT:
-                            if event_data.event_data.user_id_hash in self._inactive_dialogs:
-                                dialogs.load_dialog(self._inactive_dialogs[event_data.event_data.user_id_hash].dialog_id)
-                                
-                                self._active_dialogs[event_data.event_data.user_id_hash] = SessionInfo(
-                                    dialog_id=self._inactive_dialogs[event_data.event_data.user_id_hash].dialog_id,
-                                    session_id=event_data.event_data.session_id
-                                )
-                                dialogs.set_dialog_name(
-                                    dialog_id=self._active_dialogs[event_data.event_data.user_id_hash].dialog_id,
-                                    dialog_name=event_data.event_data.user_name
-                                )
-
-                                del self._inactive_dialogs[event_data.event_data.user_id_hash]
-                            else:
-                                self._active_dialogs[event_data.event_data.user_id_hash] = SessionInfo(
-                                    dialog_id=dialogs.add_dialog(
-                                        dialog_name=event_data.event_data.user_name,
-                                        interlocutor_id=event_data.event_data.user_id_hash,
-                                        dialog_history=event_data.event_data.data), # type: ignore
-                                    session_id=event_data.event_data.session_id
-                                )
-                                
-                        case NetworkEventType.DISCONNECT:
-                            if event_data.event_data.user_id_hash in self._active_dialogs:
-                                dialogs.inactivate_dialog(self._active_dialogs[event_data.event_data.user_id_hash].dialog_id)
-                                
-                                self._inactive_dialogs[event_data.event_data.user_id_hash] = SessionInfo(
-                                    dialog_id=self._active_dialogs[event_data.event_data.user_id_hash].dialog_id,
-                                    session_id=-1
-                                )
-                                
-                                del self._active_dialogs[event_data.event_data.user_id_hash]
-
-                        case NetworkEventType.LOGOUT:
-                            if event_data.event_data.user_id_hash in self._active_dialogs:
-                                del self._active_dialogs[event_data.event_data.user_id_hash]
-
-                        case NetworkEventType.SEND_DATA:
-                            if event_data.event_data.resend_flag and event_data.event_data.user_id_hash in self._active_dialogs:
-                                threading.Thread(target=_show_message, args=(event_data.event_data.user_id_hash, event_data.event_data.data), daemon=True).start()
-
-                        case NetworkEventType.RECEIVE_DATA:
-                            if event_data.event_data.user_id_hash in self._active_dialogs:
-                                threading.Thread(target=_show_message, args=(event_data.event_data.user_id_hash, event_data.event_data.data), daemon=True).start()
-                        
-                        case NetworkEventType.REQUEST_FILE:
-                            # Пишем файл
-                            threading.Thread(target=self._create_file_from_data,
-                                            args=(app_root, event_data.event_data.data, event_data.event_data.user_id_hash),
-                                            daemon=True).start()
-                        case NetworkEventType.FILE_ACCEPTED:
-                            self._logger.debug(f'Файл [{event_data.event_data.data}] успешно передан клиенту [{event_data.event_data.user_id_hash}].')# type: ignore
-                            CustomMessageBox.show(app_root, 'Успешно', f'Файл [{event_data.event_data.data}] успешно передан клиенту [{event_data.event_data.user_id_hash}].', CustomMessageType.SUCCESS)# type: ignore
-                        
-                        case NetworkEventType.ALREADY_EXISTS:
-                            self._logger.debug(f'Диалог с клиентом [{event_data.event_data.user_id_hash}] от имени [{self._client._client_info.user_id}] уже открыт!')
-                            CustomMessageBox.show(app_root, 'Ошибка', f'Диалог с клиентом [{event_data.event_data.user_id_hash}] от имени [{self._client._client_info.user_id}] уже открыт!', CustomMessageType.ERROR)
-                        
-                        case NetworkEventType.CONNECTING_TO_OURSELVES:
-                            self._logger.error("Пока нельзя подключаться самому к себе!")
-                            CustomMessageBox.show(app_root, 'Ошибка', "Пока нельзя подключаться самому к себе!", CustomMessageType.ERROR)
-                        
-                        case NetworkEventType.FAILED_CONNECT:
-                            self._logger.debug(f'Не удалось подключиться к клиенту [{event_data.event_data.address}].')
-                            CustomMessageBox.show(app_root, 'Ошибка', f'Не удалось подключиться к клиенту [{event_data.event_data.address}].', CustomMessageType.ERROR)
-                        
-                        case NetworkEventType.UNKNOWN_RSA_PUBLIC_KEY:
-                            self._logger.debug(f'Получен неизвестный публичный ключ RSA от клиента [{event_data.event_data.user_id_hash}].')
-                            result = YesNoDialog.ask_yes_no(app_root, 'Предупреждение', f'Получен неизвестный публичный ключ RSA от клиента [{event_data.event_data.user_id_hash}].\n\n'
-                                                   f'За данным аккаунтом может оказаться злоумышленник, Вы доверяете данному пользователю и хотите начать диалог?')
-                            
-                            try:
-                                self._client.get_session(event_data.event_data.session_id).set_client_decision(result)
-                            except UnavailableSessionIdError:
-                                CustomMessageBox.show(app_root, 'Ошибка', f'Соединение с клиентом [{event_data.event_data.user_id_hash}] было закрыто из-за неактивности.', CustomMessageType.ERROR)
-
-                        case NetworkEventType.CLOSE_CLIENT:
-                            return
-                        
-                except Exception as e:
-                    self._logger.error(f"Произошла ошибка при обработке события. Ошибка [{e}].")
+        Args:
+            app_root (Any): Ссылка на главное окно (для меседжбокса)
+            event_data (NetworkEventMessage): Событие для уведомления.
+        """
+        match event_data.event_type:
+            case NetworkEventType.FILE_RECEIVED:
+                self._logger.debug(f'Файл [{event_data.event_data.data}] успешно получен от клиента [{event_data.event_data.user_id_hash}] и записан в папку [{config.PATHS.DOWNLOAD}].')
+                CustomMessageBox.show(app_root, 'Успешно', f'Файл [{event_data.event_data.data}] успешно получен от клиента [{event_data.event_data.user_id_hash}] и записан в папку [{config.PATHS.DOWNLOAD}].', CustomMessageType.SUCCESS)
+            case NetworkEventType.FILE_ACCEPTED:
+                self._logger.debug(f'Файл [{event_data.event_data.data}] успешно передан клиенту [{event_data.event_data.user_id_hash}].')# type: ignore
+                CustomMessageBox.show(app_root, 'Успешно', f'Файл [{event_data.event_data.data}] успешно передан клиенту [{event_data.event_data.user_id_hash}].', CustomMessageType.SUCCESS)# type: ignore
+            
+            case NetworkEventType.ALREADY_EXISTS:
+                self._logger.debug(f'Диалог с клиентом [{event_data.event_data.user_id_hash}] от имени [{self._client._client_info.user_id}] уже открыт!')
+                CustomMessageBox.show(app_root, 'Ошибка', f'Диалог с клиентом [{event_data.event_data.user_id_hash}] от имени [{self._client._client_info.user_id}] уже открыт!', CustomMessageType.ERROR)
+            
+            case NetworkEventType.CONNECTING_TO_OURSELVES:
+                self._logger.error("Пока нельзя подключаться самому к себе!")
+                CustomMessageBox.show(app_root, 'Ошибка', "Пока нельзя подключаться самому к себе!", CustomMessageType.ERROR)
+            
+            case NetworkEventType.FAILED_CONNECT:
+                self._logger.debug(f'Не удалось подключиться к клиенту [{event_data.event_data.address}].')
+                CustomMessageBox.show(app_root, 'Ошибка', f'Не удалось подключиться к клиенту [{event_data.event_data.address}].', CustomMessageType.ERROR)
 
     def close(self):
         """
@@ -1824,4 +3471,6 @@ class ClientHelper:
         """
         if self._client.dht.is_active:
             self._client.dht.stop()
-        self._client.close()
\ No newline at end of file
+        self._client.close()
+        HistoryWriteQueue.get().stop()
+        DatabaseConnectionPool.close_all()
\ No newline at end of file
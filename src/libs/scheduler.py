@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+from logging import Logger
+import threading
+import time
+from typing import Any, Callable, List, Tuple
+
+from config import config
+
+class TimerHandle:
+    """ Запланированный вызов планировщика. """
+    __slots__ = ('when', 'callback', 'args', 'cancelled')
+
+    def __init__(self, when: float, callback: Callable[..., None], args: Tuple[Any, ...]) -> None:
+        self.when: float = when                         # Момент срабатывания (time.monotonic)
+        self.callback: Callable[..., None] = callback   # Вызываемая функция
+        self.args: Tuple[Any, ...] = args               # Аргументы функции
+        self.cancelled: bool = False                    # Вызов отменен
+
+    def cancel(self) -> None:
+        """ Отменяет вызов. Отмененный вызов удаляется из очереди при наступлении его времени. """
+        self.cancelled = True
+
+class Scheduler:
+    """
+        Общий планировщик отложенных вызовов для всех сессий клиента.
+
+        Один поток ждет ближайший по времени вызов на условной переменной (куча по времени срабатывания),
+        поэтому простаивающие сессии не просыпаются вообще. Сработавшие вызовы выполняются в небольшом пуле потоков,
+        чтобы отправка кадра в медленный сокет одной сессии не задерживала таймеры остальных.
+    """
+    def __init__(self, logger: Logger, workers: int = config.NETWORK.TIMERS.WORKERS) -> None:
+        """
+            Создает планировщик и запускает его поток.
+
+        Args:
+            logger (Logger): Логгер для записи ошибок вызовов.
+            workers (int): Количество потоков выполнения сработавших вызовов.
+        """
+        self._logger: Logger = logger
+        self._condition: threading.Condition = threading.Condition()
+        self._timers: List[Tuple[float, int, TimerHandle]] = []
+        self._counter: 'itertools.count[int]' = itertools.count()  # Порядок вызовов с одинаковым временем
+        self._is_active: bool = True
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scheduler')
+        self._thread: threading.Thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def call_later(self, delay: float, callback: Callable[..., None], *args: Any) -> TimerHandle:
+        """
+            Планирует вызов через заданное время.
+
+        Args:
+            delay (float): Задержка в секундах.
+            callback (Callable[..., None]): Вызываемая функция.
+            *args: Аргументы функции.
+
+        Returns:
+            TimerHandle: Объект для отмены вызова.
+        """
+        handle = TimerHandle(time.monotonic() + max(0.0, delay), callback, args)
+        with self._condition:
+            heapq.heappush(self._timers, (handle.when, next(self._counter), handle))
+            # Будим поток, только если новый вызов стал ближайшим
+            if self._timers[0][2] is handle:
+                self._condition.notify()
+        return handle
+
+    def stop(self) -> None:
+        """ Останавливает планировщик. Еще не сработавшие вызовы отбрасываются. """
+        with self._condition:
+            self._is_active = False
+            self._timers.clear()
+            self._condition.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+        self._executor.shutdown(wait=False)
+
+    def _run(self) -> None:
+        """
+            Ожидает ближайший вызов и передает сработавшие вызовы в пул потоков.
+        """
+        while True:
+            with self._condition:
+                while self._is_active:
+                    if not self._timers:
+                        self._condition.wait()
+                        continue
+                    timeout: float = self._timers[0][0] - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    self._condition.wait(timeout)
+                if not self._is_active:
+                    return
+                _, _, handle = heapq.heappop(self._timers)
+
+            if not handle.cancelled:
+                self._executor.submit(self._invoke, handle)
+
+    def _invoke(self, handle: TimerHandle) -> None:
+        """
+            Выполняет вызов и логирует его ошибки, чтобы они не терялись в пуле потоков.
+
+        Args:
+            handle (TimerHandle): Сработавший вызов.
+        """
+        if handle.cancelled:
+            return
+        try:
+            handle.callback(*handle.args)
+        except Exception as e:
+            self._logger.error(f'Ошибка в отложенном вызове [{getattr(handle.callback, "__name__", handle.callback)}]: {e}')
@@ -0,0 +1,284 @@
+from bisect import bisect_right
+import re
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple, Union
+
+from pydantic import BaseModel, PrivateAttr, field_validator
+
+from libs.message import MessageIdType
+
+class SyncPlan(NamedTuple):
+    """ Результат сверки истории диалога с собеседником. """
+    resend_ids: List[MessageIdType]         # Сообщения из буфера исходящих, которые собеседник не получил
+    confirmed_ids: List[MessageIdType]      # Сообщения из буфера исходящих, которые у собеседника уже есть
+    missing_on_peer_ids: List[MessageIdType]  # Сообщения нашей истории, которых нет у собеседника
+    missing_local_ids: List[MessageIdType]  # Сообщения собеседника, которых нет в нашей истории
+
+def build_sync_plan(our_ids: Iterable[MessageIdType], buffered_ids: Iterable[MessageIdType],
+                    peer_ids: Iterable[MessageIdType]) -> SyncPlan:
+    """
+        Сверяет идентификаторы сообщений двух сторон за O(n + m).
+
+        Все проверки принадлежности выполняются по множествам, поэтому время сверки растет линейно
+        с размером истории. Порядок идентификаторов в каждом списке результата совпадает с порядком во входных данных.
+
+    Args:
+        our_ids (Iterable[MessageIdType]): Идентификаторы подтвержденных сообщений нашей истории.
+        buffered_ids (Iterable[MessageIdType]): Идентификаторы неподтвержденных исходящих сообщений.
+        peer_ids (Iterable[MessageIdType]): Идентификаторы сообщений собеседника (уже в нашем восприятии, см. change_perception).
+
+    Returns:
+        SyncPlan: Какие сообщения переотправить, подтвердить, отправить и запросить.
+    """
+    peer_ids = list(peer_ids)
+    peer_id_set = set(peer_ids)
+
+    resend_ids: List[MessageIdType] = []
+    confirmed_ids: List[MessageIdType] = []
+    for message_id in buffered_ids:
+        (confirmed_ids if message_id in peer_id_set else resend_ids).append(message_id)
+
+    our_id_list = list(our_ids)
+    our_id_set = set(our_id_list)
+    our_id_set.update(confirmed_ids)
+
+    missing_on_peer_ids = [message_id for message_id in our_id_list if message_id not in peer_id_set]
+    missing_local_ids = [message_id for message_id in peer_ids if message_id not in our_id_set]
+
+    return SyncPlan(
+        resend_ids=resend_ids,
+        confirmed_ids=confirmed_ids,
+        missing_on_peer_ids=missing_on_peer_ids,
+        missing_local_ids=missing_local_ids
+    )
+
+def change_perception(message_id: MessageIdType) -> MessageIdType:
+    """
+        Переводит идентификатор сообщения в восприятие собеседника.
+
+        Префикс идентификатора обозначает автора сообщения: m - наше, o - собеседника.
+
+    Args:
+        message_id (MessageIdType): Идентификатор сообщения.
+
+    Returns:
+        MessageIdType: Идентификатор с противоположным префиксом.
+    """
+    return message_id.replace('m', 'o') if 'm' in message_id else message_id.replace('o', 'm')
+
+_NUMBERED_ID_PATTERN = re.compile(r'^(\D+)(0|[1-9]\d*)$')
+_PREFIX_PATTERN = re.compile(r'^\D+$')
+
+class HistorySummary(BaseModel):
+    """
+        Компактное описание набора идентификаторов сообщений.
+
+        Идентификаторы вида `<префикс автора><номер>` (m0, o15, ...) хранятся как отсортированные
+        полуинтервалы номеров [начало, конец) для каждого префикса, поэтому для синхронизированного диалога
+        с непрерывной нумерацией сводка занимает по одному диапазону на автора независимо от длины истории.
+        Идентификаторы другого вида передаются списком.
+    """
+    ranges: Dict[str, List[Tuple[int, int]]] = {}   # Префикс автора -> диапазоны номеров [начало, конец)
+    ids: List[MessageIdType] = []                   # Идентификаторы, которые нельзя представить диапазоном
+
+    _id_set: Union[Set[MessageIdType], None] = PrivateAttr(default=None)
+
+    @field_validator('ranges')
+    @classmethod
+    def _validate_ranges(cls, ranges: Dict[str, List[Tuple[int, int]]]) -> Dict[str, List[Tuple[int, int]]]:
+        """
+            Проверяет, что диапазоны каждого префикса непустые, отсортированы и не пересекаются.
+
+            На этом держатся contains и _subtract_ranges, а сводка приходит от собеседника.
+
+        Raises:
+            ValueError: Префикс содержит цифры или диапазоны нарушают порядок.
+        """
+        for prefix, prefix_ranges in ranges.items():
+            if not _PREFIX_PATTERN.match(prefix):
+                raise ValueError(f'Invalid history prefix [{prefix}].')
+            previous_end = 0
+            for start, end in prefix_ranges:
+                if not previous_end <= start < end:
+                    raise ValueError(f'Invalid history range [{start}, {end}) for prefix [{prefix}].')
+                previous_end = end
+        return ranges
+
+    @classmethod
+    def from_ids(cls, message_ids: Iterable[MessageIdType]) -> 'HistorySummary':
+        """
+            Строит сводку по идентификаторам сообщений.
+
+        Args:
+            message_ids (Iterable[MessageIdType]): Идентификаторы сообщений.
+
+        Returns:
+            HistorySummary: Сводка.
+        """
+        numbers: Dict[str, List[int]] = {}
+        ids: List[MessageIdType] = []
+        for message_id in message_ids:
+            match = _NUMBERED_ID_PATTERN.match(message_id)
+            if match:
+                numbers.setdefault(match.group(1), []).append(int(match.group(2)))
+            else:
+                ids.append(message_id)
+
+        ranges: Dict[str, List[Tuple[int, int]]] = {}
+        for prefix, prefix_numbers in numbers.items():
+            prefix_ranges: List[Tuple[int, int]] = []
+            for number in sorted(set(prefix_numbers)):
+                if prefix_ranges and prefix_ranges[-1][1] == number:
+                    prefix_ranges[-1] = (prefix_ranges[-1][0], number + 1)
+                else:
+                    prefix_ranges.append((number, number + 1))
+            ranges[prefix] = prefix_ranges
+        return cls(ranges=ranges, ids=sorted(set(ids)))
+
+    def is_empty(self) -> bool:
+        """
+            Проверяет, что в сводке нет ни одного идентификатора.
+
+        Returns:
+            bool: True - если сводка пустая.
+        """
+        return not self.ids and not any(self.ranges.values())
+
+    def size(self) -> int:
+        """
+            Считает количество идентификаторов в сводке без разворачивания диапазонов.
+
+            Используется, чтобы отбросить сводку собеседника до того, как difference или to_ids
+            развернут ее в список.
+
+        Returns:
+            int: Количество идентификаторов.
+        """
+        return len(self.ids) + sum(end - start for prefix_ranges in self.ranges.values() for start, end in prefix_ranges)
+
+    def contains(self, message_id: MessageIdType) -> bool:
+        """
+            Проверяет, входит ли идентификатор в сводку, за O(log r), где r - количество диапазонов.
+
+        Args:
+            message_id (MessageIdType): Идентификатор сообщения.
+
+        Returns:
+            bool: True - если идентификатор входит в сводку.
+        """
+        match = _NUMBERED_ID_PATTERN.match(message_id)
+        if match is None:
+            if self._id_set is None:
+                self._id_set = set(self.ids)
+            return message_id in self._id_set
+
+        prefix_ranges = self.ranges.get(match.group(1), [])
+        number = int(match.group(2))
+        position = bisect_right(prefix_ranges, (number, float('inf'))) - 1
+        return position >= 0 and prefix_ranges[position][0] <= number < prefix_ranges[position][1]
+
+    def difference(self, other: 'HistorySummary', limit: Union[int, None] = None) -> List[MessageIdType]:
+        """
+            Возвращает идентификаторы, которые есть в этой сводке, но отсутствуют в другой.
+
+            Диапазоны вычитаются друг из друга без разворачивания, поэтому время зависит от количества диапазонов
+            и размера результата, а не от длины истории.
+
+        Args:
+            other (HistorySummary): Другая сводка.
+            limit (Union[int, None]): Сколько идентификаторов вернуть не больше. None - без ограничения.
+
+        Returns:
+            List[MessageIdType]: Отсутствующие в другой сводке идентификаторы.
+        """
+        result: List[MessageIdType] = []
+        for prefix, prefix_ranges in self.ranges.items():
+            for start, end in _subtract_ranges(prefix_ranges, other.ranges.get(prefix, [])):
+                if limit is not None:
+                    end = min(end, start + limit - len(result))
+                result.extend(f'{prefix}{number}' for number in range(start, end))
+                if limit is not None and len(result) >= limit:
+                    return result
+        result.extend(message_id for message_id in self.ids if not other.contains(message_id))
+        return result if limit is None else result[:limit]
+
+    def to_ids(self) -> List[MessageIdType]:
+        """
+            Разворачивает сводку в список идентификаторов.
+
+        Returns:
+            List[MessageIdType]: Идентификаторы сообщений.
+        """
+        return self.difference(HistorySummary())
+
+    def change_perception(self) -> 'HistorySummary':
+        """
+            Переводит сводку в восприятие собеседника (меняет местами префиксы m и o).
+
+        Returns:
+            HistorySummary: Сводка с противоположными префиксами.
+        """
+        return HistorySummary(
+            ranges={change_perception(prefix): list(prefix_ranges) for prefix, prefix_ranges in self.ranges.items()},
+            ids=[change_perception(message_id) for message_id in self.ids]
+        )
+
+def build_sync_plan_from_summary(our_ids: Iterable[MessageIdType], buffered_ids: Iterable[MessageIdType],
+                                 peer_summary: HistorySummary, max_missing_local: Union[int, None] = None) -> SyncPlan:
+    """
+        Сверяет нашу историю со сводкой истории собеседника.
+
+        Результат совпадает с build_sync_plan для тех же идентификаторов, но сверка идет по диапазонам,
+        поэтому для синхронизированных диалогов она не зависит от длины истории собеседника.
+
+    Args:
+        our_ids (Iterable[MessageIdType]): Идентификаторы подтвержденных сообщений нашей истории.
+        buffered_ids (Iterable[MessageIdType]): Идентификаторы неподтвержденных исходящих сообщений.
+        peer_summary (HistorySummary): Сводка истории собеседника (уже в нашем восприятии).
+        max_missing_local (Union[int, None]): Сколько недостающих у нас сообщений запросить не больше.
+            Сводку присылает собеседник, поэтому без ограничения она может развернуться в сколь угодно длинный список.
+
+    Returns:
+        SyncPlan: Какие сообщения переотправить, подтвердить, отправить и запросить.
+    """
+    resend_ids: List[MessageIdType] = []
+    confirmed_ids: List[MessageIdType] = []
+    for message_id in buffered_ids:
+        (confirmed_ids if peer_summary.contains(message_id) else resend_ids).append(message_id)
+
+    our_id_list = list(our_ids)
+    our_summary = HistorySummary.from_ids(our_id_list)
+    known_summary = HistorySummary.from_ids(our_id_list + confirmed_ids) if confirmed_ids else our_summary
+
+    return SyncPlan(
+        resend_ids=resend_ids,
+        confirmed_ids=confirmed_ids,
+        missing_on_peer_ids=our_summary.difference(peer_summary),
+        missing_local_ids=peer_summary.difference(known_summary, limit=max_missing_local)
+    )
+
+def _subtract_ranges(ranges: List[Tuple[int, int]], removed: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+        Вычитает из отсортированных непересекающихся полуинтервалов другие такие же полуинтервалы.
+
+    Args:
+        ranges (List[Tuple[int, int]]): Исходные диапазоны.
+        removed (List[Tuple[int, int]]): Вычитаемые диапазоны.
+
+    Returns:
+        List[Tuple[int, int]]: Оставшиеся диапазоны.
+    """
+    result: List[Tuple[int, int]] = []
+    j = 0
+    for start, end in ranges:
+        # Пропускаем вычитаемые диапазоны, которые закончились до начала текущего
+        while j < len(removed) and removed[j][1] <= start:
+            j += 1
+        k = j
+        while start < end and k < len(removed) and removed[k][0] < end:
+            if removed[k][0] > start:
+                result.append((start, removed[k][0]))
+            start = max(start, removed[k][1])
+            k += 1
+        if start < end:
+            result.append((start, end))
+    return result
@@ -0,0 +1,246 @@
+import os
+from logging import Logger
+from typing import Annotated, List, Tuple, Union
+
+from pydantic import BaseModel, StringConstraints, ValidationError
+
+from config import config, FilenameType, PathType, UserIdHashType
+
+# Идентификатор передачи - uuid4 в hex. Он приходит от собеседника и входит в имена файлов журнала,
+# поэтому допускаются только 32 строчные шестнадцатеричные цифры
+TransferIdType = Annotated[str, StringConstraints(pattern=r'^[0-9a-f]{32}$')]
+
+class IncomingTransferRecord(BaseModel):
+    """ Запись журнала о принимаемом файле. """
+    transfer_id: TransferIdType     # Идентификатор передачи
+    owner_id_hash: UserIdHashType   # Наш идентификатор (получатель)
+    peer_id_hash: UserIdHashType    # Идентификатор отправителя
+    filename: FilenameType          # Имя файла
+    size: int                       # Размер файла в байтах
+    chunk_size: int                 # Размер одного блока в байтах
+    ranges: List[Tuple[int, int]] = []  # Записанные на диск диапазоны блоков [начало, конец)
+
+    def add_chunk(self, index: int) -> None:
+        """
+            Отмечает блок как записанный, объединяя соседние диапазоны.
+
+        Args:
+            index (int): Номер блока.
+        """
+        ranges: List[Tuple[int, int]] = []
+        start, end = index, index + 1
+        for range_start, range_end in self.ranges:
+            if range_end < start or range_start > end:
+                ranges.append((range_start, range_end))
+            else:
+                start, end = min(start, range_start), max(end, range_end)
+        ranges.append((start, end))
+        self.ranges = sorted(ranges)
+
+    def confirmed_chunks(self) -> int:
+        """
+            Возвращает количество блоков, непрерывно записанных с начала файла.
+
+        Returns:
+            int: Количество подтвержденных блоков.
+        """
+        if self.ranges and self.ranges[0][0] == 0:
+            return self.ranges[0][1]
+        return 0
+
+    def confirmed_size(self) -> int:
+        """
+            Возвращает количество байт, непрерывно записанных с начала файла.
+
+        Returns:
+            int: Подтвержденное смещение в байтах.
+        """
+        return min(self.confirmed_chunks() * self.chunk_size, self.size)
+
+class OutgoingTransferRecord(BaseModel):
+    """ Запись журнала об отправляемом файле. """
+    transfer_id: TransferIdType     # Идентификатор передачи
+    owner_id_hash: UserIdHashType   # Наш идентификатор (отправитель)
+    peer_id_hash: UserIdHashType    # Идентификатор получателя
+    path: PathType                  # Локальный путь к файлу
+    filename: FilenameType          # Имя файла
+    size: int                       # Размер файла на момент начала передачи
+    mtime: float                    # Время изменения файла на момент начала передачи
+
+    def is_file_unchanged(self) -> bool:
+        """
+            Проверяет, что файл не изменился с начала передачи и его можно докачивать.
+
+        Returns:
+            bool: True - если файл на месте и не изменялся.
+        """
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime == self.mtime
+
+class TransferJournal:
+    """
+        Журнал незавершенных передач файлов на диске.
+
+        Каждая передача хранится в отдельном файле `<transfer_id>.in.json` или `<transfer_id>.out.json`,
+        данные принимаемого файла - в `<transfer_id>.part`. Запись журнала заменяется атомарно,
+        поэтому после аварийного завершения в нем остается последнее подтвержденное состояние.
+    """
+    _INCOMING_SUFFIX: str = '.in.json'
+    _OUTGOING_SUFFIX: str = '.out.json'
+    _PART_SUFFIX: str = '.part'
+
+    def __init__(self, owner_id_hash: UserIdHashType, logger: Logger, journal_path: PathType = config.PATHS.TRANSFERS) -> None:
+        """
+            Инициализирует журнал передач пользователя.
+
+        Args:
+            owner_id_hash (UserIdHashType): Идентификатор пользователя, которому принадлежат передачи.
+            logger (Logger): Логгер.
+            journal_path (PathType): Папка журнала.
+        """
+        self._owner_id_hash: UserIdHashType = owner_id_hash
+        self._logger: Logger = logger
+        self._journal_path: PathType = journal_path
+
+    def part_path(self, transfer_id: str) -> PathType:
+        """
+            Возвращает путь к временному файлу с данными принимаемого файла.
+
+        Args:
+            transfer_id (str): Идентификатор передачи.
+
+        Returns:
+            PathType: Путь к временному файлу.
+        """
+        return self._path(f'{transfer_id}{self._PART_SUFFIX}')
+
+    def save(self, record: Union[IncomingTransferRecord, OutgoingTransferRecord]) -> None:
+        """
+            Атомарно сохраняет запись журнала.
+
+        Args:
+            record (Union[IncomingTransferRecord, OutgoingTransferRecord]): Запись журнала.
+        """
+        os.makedirs(self._journal_path, exist_ok=True)
+        path: PathType = self._record_path(record.transfer_id, isinstance(record, IncomingTransferRecord))
+        tmp_path: PathType = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            file.write(record.model_dump_json())
+        os.replace(tmp_path, path)
+
+    def load_incoming(self, transfer_id: str) -> Union[IncomingTransferRecord, None]:
+        """
+            Загружает запись о принимаемом файле.
+
+        Args:
+            transfer_id (str): Идентификатор передачи.
+
+        Returns:
+            Union[IncomingTransferRecord, None]: Запись журнала или None, если ее нет или она принадлежит другому пользователю.
+        """
+        record = self._load(self._record_path(transfer_id, True), IncomingTransferRecord)
+        if record is None or record.owner_id_hash != self._owner_id_hash:
+            return None
+        return record # type: ignore
+
+    def load_outgoing(self, transfer_id: str) -> Union[OutgoingTransferRecord, None]:
+        """
+            Загружает запись об отправляемом файле.
+
+        Args:
+            transfer_id (str): Идентификатор передачи.
+
+        Returns:
+            Union[OutgoingTransferRecord, None]: Запись журнала или None, если ее нет или она принадлежит другому пользователю.
+        """
+        record = self._load(self._record_path(transfer_id, False), OutgoingTransferRecord)
+        if record is None or record.owner_id_hash != self._owner_id_hash:
+            return None
+        return record # type: ignore
+
+    def load_outgoing_for_peer(self, peer_id_hash: UserIdHashType) -> List[OutgoingTransferRecord]:
+        """
+            Загружает все незавершенные отправки файлов указанному собеседнику.
+
+        Args:
+            peer_id_hash (UserIdHashType): Идентификатор собеседника.
+
+        Returns:
+            List[OutgoingTransferRecord]: Записи журнала.
+        """
+        if not os.path.isdir(self._journal_path):
+            return []
+
+        records: List[OutgoingTransferRecord] = []
+        for name in os.listdir(self._journal_path):
+            if not name.endswith(self._OUTGOING_SUFFIX):
+                continue
+            record = self._load(os.path.join(self._journal_path, name), OutgoingTransferRecord)
+            if record is not None and record.owner_id_hash == self._owner_id_hash and record.peer_id_hash == peer_id_hash:
+                records.append(record) # type: ignore
+        return records
+
+    def remove(self, transfer_id: str, remove_part: bool = True) -> None:
+        """
+            Удаляет записи журнала о передаче.
+
+        Args:
+            transfer_id (str): Идентификатор передачи.
+            remove_part (bool): Удалить ли временный файл с данными.
+        """
+        paths: List[PathType] = [self._record_path(transfer_id, True), self._record_path(transfer_id, False)]
+        if remove_part:
+            paths.append(self.part_path(transfer_id))
+
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def remove_outgoing(self, transfer_id: str) -> None:
+        """
+            Удаляет только запись об отправляемом файле, не трогая записи и данные приема с тем же идентификатором.
+
+        Args:
+            transfer_id (str): Идентификатор передачи.
+        """
+        try:
+            os.remove(self._record_path(transfer_id, False))
+        except FileNotFoundError:
+            pass
+
+    def _record_path(self, transfer_id: str, is_incoming: bool) -> PathType:
+        suffix: str = self._INCOMING_SUFFIX if is_incoming else self._OUTGOING_SUFFIX
+        return self._path(f'{transfer_id}{suffix}')
+
+    def _path(self, name: str) -> PathType:
+        """
+            Возвращает путь к файлу журнала, проверяя, что он не выходит за пределы папки журнала.
+
+        Args:
+            name (str): Имя файла.
+
+        Returns:
+            PathType: Путь к файлу.
+
+        Raises:
+            ValueError: Если путь указывает за пределы папки журнала.
+        """
+        path: PathType = os.path.join(self._journal_path, name)
+        if os.path.dirname(os.path.realpath(path)) != os.path.realpath(self._journal_path):
+            raise ValueError(f'Путь [{path}] выходит за пределы папки журнала передач.')
+        return path
+
+    def _load(self, path: PathType, model: type) -> Union[IncomingTransferRecord, OutgoingTransferRecord, None]:
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                return model.parse_raw(file.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValidationError) as e:
+            self._logger.error(f'Не удалось прочитать запись журнала передач [{path}]. Ошибка [{e}].')
+            return None
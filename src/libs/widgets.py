@@ -1,4 +1,9 @@
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import math
 import platform
+import sys
 import threading
 import tkinter as tk
 from tkinter import ttk
@@ -8,12 +13,11 @@ import os
 import random
 import string
 
-import base64
 import pyperclip
 from PIL import Image, ImageTk
 from enum import Enum
 
-from typing import Any, Callable, List, NamedTuple, Optional
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Tuple
 
 import pytz
 from datetime import datetime
@@ -21,6 +25,181 @@ from datetime import datetime
 from config import config
 from libs.message import *
 
+class UIUpdateQueue:
+    """
+        Очередь обновлений интерфейса.
+
+        Tk не потокобезопасен, поэтому фоновые потоки не трогают виджеты напрямую, а ставят вызовы в очередь.
+        Главный поток забирает очередь через after() раз в кадр. Сообщения, пришедшие в диалог за кадр,
+        накапливаются и выводятся одной вставкой, поэтому пачка из тысячи сообщений отрисовывается за один кадр.
+    """
+    _instance: Optional['UIUpdateQueue'] = None
+
+    def __init__(self, root: tk.Misc, interval_ms: int = config.WIDGETS.UI_UPDATE_INTERVAL_MS) -> None:
+        """
+            Создает очередь обновлений для главного окна.
+
+        Args:
+            root: Главное окно, в цикле событий которого применяются обновления.
+            interval_ms: Период применения накопленных обновлений в миллисекундах.
+        """
+        self._root = root
+        self._interval_ms = interval_ms
+        self._ui_thread = threading.current_thread()
+        self._lock = threading.Lock()
+        self._calls: Deque[Tuple[Callable[..., Any], Tuple[Any, ...], Optional[Future]]] = deque()
+        self._messages: Dict['Dialog', List[MessageTextData]] = {}  # Сообщения диалогов, накопленные за кадр
+        self._after_id: Optional[str] = None
+        self._is_active = False
+
+        UIUpdateQueue._instance = self
+
+    @classmethod
+    def instance(cls) -> Optional['UIUpdateQueue']:
+        """
+            Возвращает очередь обновлений приложения.
+
+        Returns:
+            Очередь обновлений или None, если она еще не создана.
+        """
+        return cls._instance
+
+    def start(self) -> None:
+        """
+            Запускает периодическое применение обновлений.
+        """
+        self._is_active = True
+        self._after_id = self._root.after(self._interval_ms, self._drain)
+
+    def stop(self) -> None:
+        """
+            Останавливает применение обновлений. Ожидающие результата вызовы отменяются.
+        """
+        self._is_active = False
+        if self._after_id is not None:
+            try:
+                self._root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+
+        with self._lock:
+            calls, self._calls = self._calls, deque()
+            self._messages = {}
+        for _, _, future in calls:
+            if future is not None:
+                future.cancel()
+
+    def is_ui_thread(self) -> bool:
+        """
+            Проверяет, выполняется ли вызов в потоке цикла событий.
+
+        Returns:
+            True, если текущий поток - поток интерфейса.
+        """
+        return threading.current_thread() is self._ui_thread
+
+    def post(self, func: Callable[..., Any], *args: Any) -> None:
+        """
+            Ставит вызов в очередь, не дожидаясь его выполнения.
+
+        Args:
+            func: Вызываемая функция.
+            *args: Аргументы функции.
+        """
+        with self._lock:
+            if self._is_active:
+                self._calls.append((func, args, None))
+
+    def invoke(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+            Выполняет вызов в потоке интерфейса и возвращает его результат.
+            Из потока интерфейса функция вызывается сразу.
+
+        Args:
+            func: Вызываемая функция.
+            *args: Аргументы функции.
+
+        Returns:
+            Результат вызова.
+
+        Raises:
+            CancelledError: Если очередь была остановлена до выполнения вызова.
+        """
+        if self.is_ui_thread():
+            return func(*args)
+
+        future: Future = Future()
+        with self._lock:
+            if not self._is_active:
+                future.cancel()
+            else:
+                self._calls.append((func, args, future))
+        return future.result()
+
+    def post_messages(self, dialog: 'Dialog', messages: List[MessageTextData]) -> None:
+        """
+            Добавляет сообщения к выводу диалога в ближайшем кадре.
+
+        Args:
+            dialog: Диалог, в который выводятся сообщения.
+            messages: Сообщения в порядке получения.
+        """
+        with self._lock:
+            if self._is_active:
+                self._messages.setdefault(dialog, []).extend(messages)
+
+    def _drain(self) -> None:
+        """
+            Применяет все накопленные вызовы, затем выводит накопленные сообщения по одной вставке на диалог.
+        """
+        if not self._is_active:
+            return
+        # Следующий кадр планируем сразу: вызов может открыть модальное окно со своим циклом событий
+        self._after_id = self._root.after(self._interval_ms, self._drain)
+
+        with self._lock:
+            calls, self._calls = self._calls, deque()
+            messages, self._messages = self._messages, {}
+
+        for func, args, future in calls:
+            if future is not None and not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = func(*args)
+            except Exception as e:
+                if future is None:
+                    # Ошибка одного вызова не должна терять остальные обновления кадра
+                    self._root.report_callback_exception(*sys.exc_info())
+                else:
+                    future.set_exception(e)
+            else:
+                if future is not None:
+                    future.set_result(result)
+
+        for dialog, dialog_messages in messages.items():
+            dialog.recieve_messages(dialog_messages)
+
+def _run_in_ui(blocking: bool, func: Callable[..., Any], *args: Any) -> Any:
+    """
+        Выполняет вызов в потоке интерфейса, если очередь обновлений запущена, иначе - сразу.
+
+    Args:
+        blocking: Дождаться ли выполнения вызова и вернуть его результат.
+        func: Вызываемая функция.
+        *args: Аргументы функции.
+
+    Returns:
+        Результат вызова или None, если вызов поставлен в очередь без ожидания.
+    """
+    ui_queue = UIUpdateQueue.instance()
+    if ui_queue is None or ui_queue.is_ui_thread():
+        return func(*args)
+    if blocking:
+        return ui_queue.invoke(func, *args)
+    ui_queue.post(func, *args)
+    return None
+
 class CustomMessageType(Enum):
     ANY = 'ANY'
     INFO = 'INFO'
@@ -112,8 +291,8 @@ class _MessageBox(tk.Toplevel):
 class CustomMessageBox:
     @staticmethod
     def show(master: Any, title: str, message: str, message_type: CustomMessageType = CustomMessageType.ANY, blocking: bool = False):
-        # Создаем и показываем конкретный тип сообщения
-        _MessageBox(master, title, message, message_type).run(blocking)
+        # Создаем и показываем конкретный тип сообщения в потоке интерфейса
+        _run_in_ui(blocking, lambda: _MessageBox(master, title, message, message_type).run(blocking))
 
 
 class ClientDecision(Enum):
@@ -190,8 +369,8 @@ class _YesNoDialog(tk.Toplevel):
 class YesNoDialog:
     @staticmethod
     def ask_yes_no(master: Any, title: str, message: str) -> ClientDecision:
-        # Создаем и показываем конкретный тип сообщения
-        return _YesNoDialog(master, title, message).run()
+        # Создаем и показываем конкретный тип сообщения в потоке интерфейса, дожидаясь ответа пользователя
+        return _run_in_ui(True, lambda: _YesNoDialog(master, title, message).run())
 
 class PlaceholderVar(tk.StringVar):
     def __init__(self, *args, **kwargs):
@@ -546,11 +725,120 @@ class LimitedText(ttk.Frame):
         """
         self._text_input_message.config(state='disabled')
     
+# Загружает страницу истории, старше указанного сообщения
+HistoryLoader = Callable[[MessageTextData], List[MessageTextData]]
+
+class _LineIndex:
+    """
+        Количество строк, которые занимают сообщения диалога в текстовом виджете, в порядке сообщений.
+
+        Хранится блочным списком с суммой строк каждого блока. Размер блока растет как √n, а при избытке блоков
+        список перестраивается, поэтому блоков и сообщений в блоке всегда O(√n): вставка в любую позицию и подсчет
+        строк перед позицией выполняются за O(√n) (перестройка за O(n) случается редко и амортизируется),
+        и вставка сообщения в середину диалога не требует пересчета строк всей истории.
+    """
+    _MIN_BLOCK_SIZE = 64
+
+    def __init__(self) -> None:
+        self._blocks: List[List[int]] = []  # Количество строк каждого сообщения, по блокам
+        self._sums: List[int] = []          # Сумма строк каждого блока
+        self._size: int = 0                 # Количество сообщений
+
+    def insert(self, position: int, lines: List[int]) -> None:
+        """
+            Вставляет количества строк сообщений, начиная с позиции.
+
+        Args:
+            position: Позиция первого вставляемого сообщения.
+            lines: Количество строк каждого вставляемого сообщения.
+        """
+        if not lines:
+            return
+        if not self._blocks:
+            self._blocks.append([])
+            self._sums.append(0)
+
+        block_index, offset = self._locate(position)
+        block = self._blocks[block_index]
+        block[offset:offset] = lines
+        self._size += len(lines)
+        block_size: int = self._block_size()
+        if len(block) <= 2 * block_size:
+            self._sums[block_index] += sum(lines)
+            return
+
+        # Переполненный блок делим на блоки текущего размера
+        chunks = self._split(block, block_size)
+        self._blocks[block_index:block_index + 1] = chunks
+        self._sums[block_index:block_index + 1] = [sum(chunk) for chunk in chunks]
+
+        # Блоки, созданные при меньшей длине истории, остаются мелкими: при избытке перестраиваем весь список
+        if len(self._blocks) > 2 * max(self._MIN_BLOCK_SIZE, self._size // block_size):
+            self._blocks = self._split([count for block in self._blocks for count in block], block_size)
+            self._sums = [sum(block) for block in self._blocks]
+
+    def lines_before(self, position: int) -> int:
+        """
+            Считает строки, которые занимают сообщения перед позицией.
+
+        Args:
+            position: Позиция сообщения.
+
+        Returns:
+            Количество строк.
+        """
+        if not self._blocks:
+            return 0
+        block_index, offset = self._locate(position)
+        return sum(self._sums[:block_index]) + sum(self._blocks[block_index][:offset])
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """
+            Находит блок и смещение в нем для позиции. Позиция за последним сообщением относится к последнему блоку.
+
+        Args:
+            position: Позиция сообщения.
+
+        Returns:
+            Индекс блока и смещение внутри блока.
+        """
+        for block_index, block in enumerate(self._blocks):
+            if position <= len(block):
+                return block_index, position
+            position -= len(block)
+        return len(self._blocks) - 1, len(self._blocks[-1])
+
+    def _block_size(self) -> int:
+        """
+            Возвращает размер блока для текущего количества сообщений: √n, но не меньше _MIN_BLOCK_SIZE.
+
+        Returns:
+            Размер блока.
+        """
+        return max(self._MIN_BLOCK_SIZE, math.isqrt(self._size))
+
+    @staticmethod
+    def _split(lines: List[int], block_size: int) -> List[List[int]]:
+        """
+            Делит количества строк на блоки заданного размера.
+
+        Args:
+            lines: Количество строк каждого сообщения.
+            block_size: Размер блока.
+
+        Returns:
+            Блоки.
+        """
+        return [lines[i:i + block_size] for i in range(0, len(lines), block_size)]
+
 class Dialog(ttk.Frame):
     objects_counter = 0 # Счетчик объектов класса для присвоения уникальных ID
+    # Поток загрузки страниц истории: чтение и расшифровка истории не выполняются в потоке интерфейса
+    _history_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='history-loader')
 
     def __init__(self, master: Any, interlocutor_id: str, username: str = '',
-                  dialog_name: str = '', command: Any = None, **kwargs) -> None:
+                  dialog_name: str = '', command: Any = None, history_loader: Optional[HistoryLoader] = None,
+                  message_id_counter: int = 0, **kwargs) -> None:
         """
             Инициализация диалогового окна.
 
@@ -560,6 +848,8 @@ class Dialog(ttk.Frame):
             username: Имя пользователя. Если None, будет сгенерировано случайное имя.
             dialog_name: Название диалога. Если None, будет сгенерировано случайное название.
             command: Функция обратного вызова для обработки отправленных сообщений.
+            history_loader: Функция загрузки более старых сообщений при прокрутке к началу диалога.
+            message_id_counter: Номер, с которого нумеруются новые сообщения (история может быть загружена не полностью).
             **kwargs: Дополнительные аргументы для ttk.Frame.
         """
         super().__init__(master, **kwargs)
@@ -568,6 +858,9 @@ class Dialog(ttk.Frame):
         self._interlocutor_id = interlocutor_id
         self._username = username if username else self._generate_random_name()
         self._command = command
+        self._history_loader = history_loader
+        self._is_history_exhausted = history_loader is None  # Вся ли история уже загружена
+        self._is_window_shifting = False  # Запланирован ли сдвиг окна выведенных сообщений
 
         self._moscow_tz = pytz.timezone('Europe/Moscow')
         
@@ -575,8 +868,14 @@ class Dialog(ttk.Frame):
         self._id = Dialog.objects_counter
         Dialog.objects_counter += 1
 
-        self._messages: List[MessageTextData] = []  # Список сообщений в диалоге
-        self._message_id_counter = 0  # Счетчик ID сообщений
+        self._messages: List[MessageTextData] = []  # Список сообщений в диалоге, упорядоченный по времени
+        self._message_times: List[datetime] = []  # Время сообщений в том же порядке (для бинарного поиска)
+        self._message_ids: Dict[MessageIdType, MessageTextData] = {}  # Сообщения по ID (для проверки дубликатов)
+        self._line_index = _LineIndex()  # Строки, которые занимают сообщения в текстовом виджете
+        # В виджет выведено только окно сообщений [_window_start, _window_end), размер виджета не зависит от длины истории
+        self._window_start = 0
+        self._window_end = 0
+        self._message_id_counter = message_id_counter  # Счетчик ID сообщений
 
         self._setup_widgets()  # Метод установки виджетов
         self._bind_events()  # Метод привязки событий
@@ -588,7 +887,7 @@ class Dialog(ttk.Frame):
         """
         self._frame_dialog = ttk.Frame(self)
         self._text_dialog = tk.Text(self._frame_dialog, state='disabled', height=20, font=config.WIDGETS.DIALOG_TEXT_FONT) # type: ignore
-        self._scrollbar = tk.Scrollbar(self._frame_dialog, command=self._text_dialog.yview)
+        self._scrollbar = tk.Scrollbar(self._frame_dialog, command=self._on_scrollbar)
         self._frame_input = LimitedText(self, config.WIDGETS.MAX_TEXT_SYMBOLS_NUMBER)
         self._button_send_input_message = ttk.Button(self, text="Отправить", command=self.send_message)
 
@@ -598,7 +897,7 @@ class Dialog(ttk.Frame):
         self._frame_input.pack(fill='both', expand=True)
         self._button_send_input_message.pack(fill='both', expand=True, padx=5)
 
-        self._text_dialog.config(yscrollcommand=self._scrollbar.set)
+        self._text_dialog.config(yscrollcommand=self._on_dialog_scroll)
         self._text_dialog.tag_configure("bold", font=config.WIDGETS.DIALOG_AUTHOR_FONT) # type: ignore
 
     def _bind_events(self):
@@ -615,8 +914,9 @@ class Dialog(ttk.Frame):
             Обрабатывает перетаскивание файлов в текстовое поле, проверяя их и отправляя данные файла.
 
             При успешном перетаскивании файла (или файлов) в текстовое поле, данный метод
-            читает файл, проверяет его размер и, если все условия соблюдены, передает данные файла
-            в пользовательскую функцию обратного вызова (_command).
+            проверяет размер файла и, если все условия соблюдены, передает описание файла
+            в пользовательскую функцию обратного вызова (_command). Сам файл читается с диска
+            уже при отправке, блоками, поэтому целиком в память не загружается.
 
         Args:
             event: Событие перетаскивания файла.
@@ -633,25 +933,23 @@ class Dialog(ttk.Frame):
                     CustomMessageBox.show(self._master, 'Ошибка', f'Можно передавать только файлы!', CustomMessageType.ERROR)
                     continue
 
-                if os.path.getsize(file) > config.WIDGETS.MAX_FILE_SIZE:
+                file_size = os.path.getsize(file)
+                if file_size > config.WIDGETS.MAX_FILE_SIZE:
                     CustomMessageBox.show(self._master, 'Ошибка', f'Слишком большой файл [{file}]!\nМаксимальный размер: {config.WIDGETS.MAX_FILE_SIZE} байт.', CustomMessageType.ERROR)
                     continue
 
                 # Если размер файла не превышает максимально допустимый, отправляем данные
-                # Читаем данные файла
-                with open(file, 'rb') as bin_file:
-                    file_data: bytes = bin_file.read(config.WIDGETS.MAX_FILE_SIZE)
-                        
-                    try:
-                        self._command(MessageData(
-                            type    = MessageType.File,
-                            message = MessageFileData(
-                                raw_data = base64.b64encode(file_data).decode('utf-8'),
-                                filename = os.path.basename(file)
-                            )
-                        ))
-                    except Exception as e:
-                        CustomMessageBox.show(self._master, 'Ошибка', f'Произошла ошибка [{e}]!', CustomMessageType.ERROR)
+                try:
+                    self._command(MessageData(
+                        type    = MessageType.File,
+                        message = MessageFileData(
+                            filename = os.path.basename(file),
+                            size     = file_size,
+                            path     = file
+                        )
+                    ))
+                except Exception as e:
+                    CustomMessageBox.show(self._master, 'Ошибка', f'Произошла ошибка [{e}]!', CustomMessageType.ERROR)
 
         # Разбиваем данные события на список путей к файлам
         files = self.tk.splitlist(event.data)
@@ -679,18 +977,15 @@ class Dialog(ttk.Frame):
             # Фиксируем текущее время в московском часовом поясе
             current_time = datetime.now(self._moscow_tz)
             
-            # Добавляем сообщение в историю сообщений
-            self._messages.append(MessageTextData(
+            # Добавляем сообщение в историю сообщений и в диалог
+            message_data = MessageTextData(
                 id      = f'm{self._message_id_counter}',
                 time    = current_time.isoformat(),
                 author  = self._username,
                 message = message
-            ))
+            )
             self._message_id_counter += 1
-
-            # Форматируем сообщение для отображения в диалоге
-            formatted_message = self._format_message(self._messages[-1], current_time)
-            self._add_message_to_dialog(formatted_message, formatted_message.index(': ') + 1)
+            self._insert_message(message_data, current_time)
             
             # Очищаем поле ввода после отправки сообщения
             self._frame_input.del_text()
@@ -699,7 +994,7 @@ class Dialog(ttk.Frame):
             if self._command:
                 self._command(MessageData(
                     type    = MessageType.Text,
-                    message = self._messages[-1]
+                    message = message_data
                 ))
     
     def exist_message(self, message: MessageTextData) -> bool:
@@ -712,10 +1007,7 @@ class Dialog(ttk.Frame):
         Returns:
             True, если сообщение существует, иначе False.
         """
-        for msg in self._messages:
-            if msg.id == message.id:
-                return True
-        return False
+        return message.id in self._message_ids
 
     def recieve_message(self, message: MessageTextData) -> None:
         """
@@ -726,24 +1018,37 @@ class Dialog(ttk.Frame):
         """
 
         if message:
-            recived_message_time = datetime.fromisoformat(message.time)
-
             # Обновляем счетчик ID сообщений, если необходимо
             self._update_counter(message.id)
+            self._insert_message(message, datetime.fromisoformat(message.time))
+
+    def recieve_messages(self, messages: List[MessageTextData]) -> None:
+        """
+            Обрабатывает получение пачки сообщений, пропуская уже полученные.
+            Сообщения, идущие после последнего сообщения диалога, выводятся одной вставкой.
+
+        Args:
+            messages: Список объектов MessageTextData в порядке получения.
+        """
+        appended = 0
+        for message in messages:
+            if not message or self.exist_message(message):
+                continue
+
+            recived_message_time = datetime.fromisoformat(message.time)
+            self._update_counter(message.id)
 
-            # Если в истории уже есть сообщения, проверяем порядок времени получения
-            if self._messages and recived_message_time < datetime.fromisoformat(self._messages[-1].time):
-                # Перестраиваем историю сообщений, если полученное сообщение старше последнего
-                self._restruct_dialog_messages(message)
-                return
+            if self._message_times and recived_message_time < self._message_times[-1]:
+                # Перед вставкой в середину выводим накопленные сообщения, чтобы номера строк совпадали с историей
+                self._render_appended(appended)
+                appended = 0
+                self._insert_message(message, recived_message_time)
+                continue
 
-            # Просто добавляем сообщение в диалог
-            formatted_message = self._format_message(message, recived_message_time)
-            self._add_message_to_dialog(formatted_message, formatted_message.index(': ') + 1)
+            self._store_messages(len(self._messages), [message], [recived_message_time])
+            appended += 1
 
-            self._messages.append(message)
-            # Сортируем сообщения по времени, на случай если порядок был нарушен
-            self._messages.sort(key=lambda x: x.time)
+        self._render_appended(appended)
 
     def load_history(self, history: List[MessageTextData]) -> None:
         """
@@ -756,23 +1061,142 @@ class Dialog(ttk.Frame):
             return
 
         # Сортировка истории по времени
-        history = sorted(history, key=lambda x: datetime.fromisoformat(x.time))
+        self.recieve_messages(sorted(history, key=lambda x: datetime.fromisoformat(x.time)))
 
-        messages_size_before = len(self._messages)
-        # Интеграция каждого сообщения из истории
-        for message in history:
-            if self.exist_message(message):
-                continue
+    def _on_dialog_scroll(self, first: str, last: str) -> None:
+        """
+            Обновляет полосу прокрутки по положению во всей загруженной истории и сдвигает окно
+            выведенных сообщений, когда диалог прокручен к его краю.
+
+        Args:
+            first: Доля текста виджета выше видимой области.
+            last: Доля текста виджета до конца видимой области.
+        """
+        total = len(self._messages)
+        if total:
+            window_size = self._window_end - self._window_start
+            self._scrollbar.set((self._window_start + float(first) * window_size) / total,
+                                (self._window_start + float(last) * window_size) / total)
+        else:
+            self._scrollbar.set(first, last)
+
+        # Скрытые вкладки окно не сдвигают: пока виджет не отображен, он сообщает, что виден весь текст
+        if self._is_window_shifting or not self._text_dialog.winfo_viewable():
+            return
+        if float(first) <= 0.0 and (self._window_start > 0 or not self._is_history_exhausted):
+            self._is_window_shifting = True
+            self.after_idle(self._shift_window_up)
+        elif float(last) >= 1.0 and self._window_end < total:
+            self._is_window_shifting = True
+            self.after_idle(self._shift_window_down)
+
+    def _on_scrollbar(self, *args: str) -> None:
+        """
+            Обрабатывает команды полосы прокрутки. Перетаскивание ползунка выводит окно сообщений
+            вокруг соответствующего места истории, остальные команды прокручивают виджет.
+
+        Args:
+            *args: Аргументы команды yview ('moveto', доля) или ('scroll', количество, единицы).
+        """
+        if args[0] != 'moveto' or not self._messages:
+            self._text_dialog.yview(*args)
+            return
+
+        total = len(self._messages)
+        target = min(int(float(args[1]) * total), total - 1)
+        window_size = config.WIDGETS.DIALOG_WINDOW_SIZE
+        margin = config.WIDGETS.DIALOG_WINDOW_MARGIN
+        # Перерисовываем окно, только если цель подошла к его краю
+        if not (self._window_start <= target < self._window_end and
+                (target - self._window_start >= margin or self._window_start == 0) and
+                (self._window_end - target > margin or self._window_end == total)):
+            start = min(max(0, target - window_size // 2), max(0, total - window_size))
+            self._render_window(start, min(total, start + window_size))
+        self._text_dialog.yview(f'{self._window_line(target)}.0')
+
+    def _shift_window_up(self) -> None:
+        """
+            Выводит в начало окна более ранние сообщения, при необходимости загружая страницу истории,
+            и убирает лишние сообщения из конца окна. Положение прокрутки сохраняется.
+        """
+        if self._window_start == 0:
+            # Страница истории загружается в фоне, сдвиг окна продолжится после ее получения
+            self._load_older_history()
+            return
+
+        try:
+            new_start = max(0, self._window_start - config.WIDGETS.DIALOG_WINDOW_MARGIN)
+            top_line = int(self._text_dialog.index('@0,0').split('.')[0])
+            added_lines = self._line_index.lines_before(self._window_start) - self._line_index.lines_before(new_start)
+
+            self._add_messages_to_dialog(self._format_messages(new_start, self._window_start), 1, scroll_to_end=False)
+            self._window_start = new_start
+            self._text_dialog.yview(f'{top_line + added_lines}.0')
+            self._trim_window_bottom()
+        finally:
+            self._is_window_shifting = False
+
+    def _shift_window_down(self) -> None:
+        """
+            Выводит в конец окна более поздние сообщения и убирает лишние сообщения из начала окна.
+            Положение прокрутки сохраняется.
+        """
+        try:
+            new_end = min(len(self._messages), self._window_end + config.WIDGETS.DIALOG_WINDOW_MARGIN)
+            self._add_messages_to_dialog(self._format_messages(self._window_end, new_end), scroll_to_end=False)
+            self._window_end = new_end
+            self._trim_window_top()
+        finally:
+            self._is_window_shifting = False
+
+    def _load_older_history(self) -> None:
+        """
+            Запускает в фоновом потоке загрузку страницы сообщений старше самого раннего сообщения в диалоге.
+            Результат передается в поток интерфейса через UIUpdateQueue.
+        """
+        ui_queue = UIUpdateQueue.instance()
+        if not self._messages or self._history_loader is None or ui_queue is None:
+            self._is_history_exhausted = True
+            self._is_window_shifting = False
+            return
 
+        oldest_message = self._messages[0]
+        future = Dialog._history_executor.submit(self._history_loader, oldest_message)
+        future.add_done_callback(lambda done: ui_queue.post(self._on_older_history_loaded, oldest_message, done))
+
+    def _on_older_history_loaded(self, oldest_message: MessageTextData, future: Future) -> None:
+        """
+            Добавляет загруженную страницу в начало истории (в виджет она не выводится) и продолжает сдвиг окна.
+            Вызывается в потоке интерфейса.
+
+        Args:
+            oldest_message: Сообщение, старше которого загружалась страница.
+            future: Результат загрузки страницы.
+        """
+        if not self.winfo_exists():
+            return
+        # Пока страница загружалась, в начало истории попали другие сообщения: загрузку повторит следующая прокрутка
+        if not self._messages or self._messages[0] is not oldest_message:
+            self._is_window_shifting = False
+            return
+
+        if future.exception() is not None:
+            older_messages = []
+        else:
+            older_messages = [message for message in future.result() if not self.exist_message(message)]
+        if not older_messages:
+            self._is_history_exhausted = True
+            self._is_window_shifting = False
+            return
+
+        older = sorted(((datetime.fromisoformat(message.time), message) for message in older_messages), key=lambda x: x[0])
+        for _, message in older:
             self._update_counter(message.id)
-            
-            message_time = datetime.fromisoformat(message.time)
-            formatted_message = self._format_message(message, message_time)
-            self._add_message_to_dialog(formatted_message, formatted_message.index(': ') + 1)
-            self._messages.append(message)
 
-        if messages_size_before != len(self._messages):
-            self._messages.sort(key=lambda x: datetime.fromisoformat(x.time))
+        self._store_messages(0, [message for _, message in older], [message_time for message_time, _ in older])
+        self._window_start += len(older)
+        self._window_end += len(older)
+        self._shift_window_up()
 
     def _update_counter(self, msg_id: MessageIdType) -> None:
         """
@@ -800,41 +1224,147 @@ class Dialog(ttk.Frame):
         return f"[{message_time.strftime('%d.%m.%Y - %H:%M:%S')}] {message.author}: {message.message}\n"
 
 
-    def _restruct_dialog_messages(self, recv_message: MessageTextData) -> None:
+    def _insert_message(self, message: MessageTextData, message_time: datetime) -> None:
+        """
+            Вставляет сообщение в хронологически правильное место в истории и, если оно попадает в окно, в диалог.
+
+            Место вставки находится бинарным поиском по времени сообщений, а номер строки в виджете -
+            по индексу количества строк, поэтому вставка не перебирает историю диалога.
+
+        Args:
+            message: Сообщение типа MessageTextData.
+            message_time: Время сообщения.
+        """
+        position = bisect_right(self._message_times, message_time)
+        if position == len(self._messages):
+            self._store_messages(position, [message], [message_time])
+            self._render_appended(1)
+            return
+
+        line_number = self._window_line(position)
+        self._store_messages(position, [message], [message_time])
+        if position < self._window_start or (position == self._window_start and position > 0):
+            # Сообщение выше окна: сдвигаем границы окна, не трогая виджет
+            self._window_start += 1
+            self._window_end += 1
+        elif position <= self._window_end:
+            formatted_message = self._format_message(message, message_time)
+            self._add_message_to_dialog(formatted_message, formatted_message.index(': ') + 1, line_number)
+            self._window_end += 1
+            self._trim_window_top()
+
+    def _render_appended(self, count: int) -> None:
         """
-            Вставляет полученное сообщение в хронологически правильное место в диалоге.
+            Выводит последние добавленные в историю сообщения и прокручивает диалог к концу.
+            Если окно было не в конце истории, оно переносится к последним сообщениям.
 
         Args:
-            recv_message: Полученное сообщение типа MessageTextData.
-        """
-        # Инициализация переменных для отслеживания позиции вставки
-        counter = 0
-        pos_in_text = 1
-        was_inserted = False
-
-        # Преобразование строки времени в объект datetime
-        received_message_time = datetime.fromisoformat(recv_message.time)
-
-        # Перебор существующих сообщений для поиска подходящего места вставки
-        for message in self._messages:
-            message_time = datetime.fromisoformat(message.time)
-
-            # Вставка, если время полученного сообщения меньше времени текущего сообщения в списке
-            if received_message_time < message_time and not was_inserted:
-                formatted_message = self._format_message(recv_message, received_message_time)
-                self._add_message_to_dialog(formatted_message, formatted_message.index(': ') + 1, pos_in_text)
-                was_inserted = True
-                break   
-
-            if not was_inserted:
-                counter += 1
-                pos_in_text += message.message.count('\n') + 1
-        
-        # Вставка сообщения в список сообщений
-        self._messages.insert(counter, recv_message)
+            count: Количество добавленных в конец истории сообщений.
+        """
+        if not count:
+            return
+
+        total = len(self._messages)
+        if self._window_end != total - count:
+            self._render_window(max(0, total - config.WIDGETS.DIALOG_WINDOW_SIZE), total)
+        else:
+            self._add_messages_to_dialog(self._format_messages(self._window_end, total))
+            self._window_end = total
+            self._trim_window_top()
+        self._text_dialog.see(tk.END)
+
+    def _render_window(self, start: int, end: int) -> None:
+        """
+            Заменяет содержимое виджета сообщениями истории [start, end).
+
+        Args:
+            start: Первое выводимое сообщение.
+            end: Сообщение, следующее за последним выводимым.
+        """
+        self._text_dialog.config(state='normal')
+        self._text_dialog.delete('1.0', tk.END)
+        self._text_dialog.config(state='disabled')
+
+        self._window_start = self._window_end = start
+        self._add_messages_to_dialog(self._format_messages(start, end), 1, scroll_to_end=False)
+        self._window_end = end
+
+    def _trim_window_top(self) -> None:
+        """
+            Убирает из начала виджета сообщения сверх размера окна, сохраняя положение прокрутки.
+        """
+        excess = (self._window_end - self._window_start) - config.WIDGETS.DIALOG_WINDOW_SIZE
+        if excess <= 0:
+            return
+
+        removed_lines = self._line_index.lines_before(self._window_start + excess) - self._line_index.lines_before(self._window_start)
+        top_line = int(self._text_dialog.index('@0,0').split('.')[0])
+
+        self._text_dialog.config(state='normal')
+        self._text_dialog.delete('1.0', f'{removed_lines + 1}.0')
+        self._text_dialog.config(state='disabled')
+
+        self._window_start += excess
+        self._text_dialog.yview(f'{max(1, top_line - removed_lines)}.0')
+
+    def _trim_window_bottom(self) -> None:
+        """
+            Убирает из конца виджета сообщения сверх размера окна.
+        """
+        excess = (self._window_end - self._window_start) - config.WIDGETS.DIALOG_WINDOW_SIZE
+        if excess <= 0:
+            return
+
+        new_end = self._window_end - excess
+        self._text_dialog.config(state='normal')
+        self._text_dialog.delete(f'{self._window_line(new_end)}.0', 'end-1c')
+        self._text_dialog.config(state='disabled')
+        self._window_end = new_end
+
+    def _window_line(self, position: int) -> int:
+        """
+            Возвращает номер строки виджета, с которой начинается (или начиналось бы) сообщение истории.
+
+        Args:
+            position: Позиция сообщения в истории, не раньше начала окна.
+
+        Returns:
+            Номер строки в текстовом виджете.
+        """
+        return self._line_index.lines_before(position) - self._line_index.lines_before(self._window_start) + 1
+
+    def _format_messages(self, start: int, end: int) -> List[Tuple[str, int]]:
+        """
+            Форматирует сообщения истории [start, end) для вывода в виджет.
+
+        Args:
+            start: Первое сообщение.
+            end: Сообщение, следующее за последним.
+
+        Returns:
+            Пары (отформатированное сообщение, длина строки с датой и автором).
+        """
+        formatted: List[Tuple[str, int]] = []
+        for message, message_time in zip(self._messages[start:end], self._message_times[start:end]):
+            formatted_message = self._format_message(message, message_time)
+            formatted.append((formatted_message, formatted_message.index(': ') + 1))
+        return formatted
+
+    def _store_messages(self, position: int, messages: List[MessageTextData], message_times: List[datetime]) -> None:
+        """
+            Добавляет сообщения в историю диалога и ее индексы, начиная с позиции.
 
+        Args:
+            position: Позиция первого сообщения в истории.
+            messages: Сообщения, упорядоченные по времени.
+            message_times: Время каждого сообщения.
+        """
+        self._messages[position:position] = messages
+        self._message_times[position:position] = message_times
+        self._message_ids.update((message.id, message) for message in messages)
+        self._line_index.insert(position, [message.message.count('\n') + 1 for message in messages])
 
-    def _add_message_to_dialog(self, formatted_message: str, date_and_author_len: int, pos: int = -1) -> None:
+    def _add_message_to_dialog(self, formatted_message: str, date_and_author_len: int, pos: int = -1, scroll_to_end: bool = True) -> None:
         """
             Добавляет форматированное сообщение в виджет текстового диалога.
 
@@ -842,6 +1372,7 @@ class Dialog(ttk.Frame):
             formatted_message: Отформатированное сообщение.
             date_and_author_len: Длина строки с датой и автором.
             pos: Позиция вставки в виджете.
+            scroll_to_end: Прокрутить ли диалог к последней строке.
         """
         
         # Получаем номер следующей строки
@@ -854,7 +1385,34 @@ class Dialog(ttk.Frame):
         self._text_dialog.config(state='disabled')
 
         # Прокрутка к последней добавленной строке
-        self._text_dialog.see(tk.END)
+        if scroll_to_end:
+            self._text_dialog.see(tk.END)
+
+    def _add_messages_to_dialog(self, messages: List[Tuple[str, int]], pos: int = -1, scroll_to_end: bool = True) -> None:
+        """
+            Добавляет форматированные сообщения в виджет текстового диалога за один проход:
+            одно переключение состояния виджета, одна вставка и одна прокрутка.
+
+        Args:
+            messages: Пары (отформатированное сообщение, длина строки с датой и автором).
+            pos: Номер строки, с которой вставляются сообщения. По умолчанию - в конец.
+            scroll_to_end: Прокрутить ли диалог к последней строке.
+        """
+        if not messages:
+            return
+
+        first_line_number = int(self._text_dialog.index("end-1c").split(".")[0]) if pos == -1 else pos
+        self._text_dialog.config(state='normal')
+        self._text_dialog.insert(f"{first_line_number}.0", ''.join(message for message, _ in messages))
+
+        line_number = first_line_number
+        for formatted_message, date_and_author_len in messages:
+            self._text_dialog.tag_add("bold", f"{line_number}.0", f"{line_number}.{date_and_author_len}")
+            line_number += formatted_message.count('\n')
+        self._text_dialog.config(state='disabled')
+
+        if scroll_to_end:
+            self._text_dialog.see(tk.END)
 
     def _generate_random_name(self) -> str:
         """
@@ -1034,14 +1592,17 @@ class DialogManager(ttk.Frame):
             self._dialogs[dialog_id].dialog._dialog_name = dialog_name
             self._notebook_dialogs.tab(self._dialogs[dialog_id].tab_id, text=dialog_name)
 
-    def add_dialog(self, dialog_name: str, interlocutor_id: str, dialog_history: List[MessageTextData]) -> int:
+    def add_dialog(self, dialog_name: str, interlocutor_id: str, dialog_history: List[MessageTextData],
+                   history_loader: Optional[HistoryLoader] = None, message_id_counter: int = 0) -> int:
         """
             Добавляет новую вкладку диалога в Notebook.
 
         Args:
             dialog_name: Название диалога.
             interlocutor_id: Идентификатор собеседника.
-            dialog_history: История сообщений диалога.
+            dialog_history: История сообщений диалога (последняя страница, если передан history_loader).
+            history_loader: Функция загрузки более старых сообщений при прокрутке.
+            message_id_counter: Номер, с которого нумеруются новые сообщения.
 
         Returns:
             Идентификатор созданного диалога.
@@ -1052,7 +1613,9 @@ class DialogManager(ttk.Frame):
             interlocutor_id = interlocutor_id,
             username        = self._user_name,
             dialog_name     = dialog_name,
-            command         = self._command
+            command         = self._command,
+            history_loader  = history_loader,
+            message_id_counter = message_id_counter
         )
 
         self._dialogs[dialog.get_id()] = DialogInfo(tab_id=self._notebook_dialogs.index('end'), dialog=dialog)
@@ -13,7 +13,6 @@ from dataclasses import dataclass
 
 from config import UserIdHashType, config
 from dht import DHTPeerProfile, EmptyDHTDataError
-from libs.cryptography import Encrypter
 from libs.message import MessageData
 from libs.mylogger import MyLogger, MyLoggerType
 from libs.network import ClientHelper, UserIdType
@@ -51,6 +50,8 @@ class WinApp(TkinterDnD.Tk):
         self._logger.setLevel(self._logger_type.value)
 
         self._create_window()
+        self._ui_queue = wg.UIUpdateQueue(self)
+        self._ui_queue.start()
 
         registered_users = self._client_helper.get_all_registered_users()
         if not registered_users:
@@ -58,7 +59,7 @@ class WinApp(TkinterDnD.Tk):
         else:
             threading.Thread(target=self._create_sign_in_window, args=(registered_users,), daemon=True).start()
 
-        threading.Thread(target=self._client_helper.handle_dialog, args=(self, self._dialog_manager), daemon=True).start()
+        threading.Thread(target=self._client_helper.handle_dialog, args=(self, self._dialog_manager, self._ui_queue), daemon=True).start()
         self.protocol("WM_DELETE_WINDOW", self._prepare_to_close_program)
 
     def _default_init(self) -> None:
@@ -70,6 +71,7 @@ class WinApp(TkinterDnD.Tk):
 
         self._client_info = ClientInfo()
         self._last_user_id: UserIdType = ''
+        self._dht_peers_reachability: dict[str, bool] = {}  # DHT ключ собеседника -> найден ли его профиль
 
         self._is_child_window_for_entering_user_info_active = False
         self._was_event_to_close_program = False
@@ -236,6 +238,10 @@ class WinApp(TkinterDnD.Tk):
                                                        width=30, command=self._connect_to_another_user)
         button_connect_to_another_client.pack(padx=10, pady=10, side='left')
 
+        self._label_alien_reachability = ttk.Label(self._frame_connection, text='')
+        self._label_alien_reachability.pack()
+        self._combo_alien_dht_key.bind('<<ComboboxSelected>>', lambda event: self._update_reachability_label())
+
         def _send_message_to_another_client(message: MessageData) -> None:
             peer_user_id_hash: UserIdHashType = self._dialog_manager.get_current_dialog().get_interlocutor_id()
             self._client_helper.send_message_to_another_client(message, peer_user_id_hash)
@@ -264,27 +270,35 @@ class WinApp(TkinterDnD.Tk):
             wg.CustomMessageBox.show(self, 'Ошибка', "Перед подключением необходимо ввести свой DHT ключ!", wg.CustomMessageType.ERROR)
             return
         
-        if not self._combo_alien_dht_key.get():
+        # Ключ читаем здесь, в потоке интерфейса: фоновый поток подключения не должен обращаться к виджетам
+        alien_dht_key: str = self._combo_alien_dht_key.get()
+        if not alien_dht_key:
             self._logger.error("Перед подключением необходимо ввести DHT ключ собеседника!")
             wg.CustomMessageBox.show(self, 'Ошибка', "Перед подключением необходимо ввести DHT ключ собеседника!", wg.CustomMessageType.ERROR)
             return
         
-        if not self._check_data_for_validity(self._combo_alien_dht_key.get()):
+        if not self._check_data_for_validity(alien_dht_key):
             self._logger.error(f"В введенном DHT ключе есть недопустимые символы!")
             wg.CustomMessageBox.show(self, 'Ошибка', f"В введенном DHT ключе есть недопустимые символы!", wg.CustomMessageType.ERROR)
             return
 
-        threading.Thread(target=self.__connect_to_another_client, daemon=True).start()
+        threading.Thread(target=self.__connect_to_another_client, args=(alien_dht_key,), daemon=True).start()
+
+    def __connect_to_another_client(self, alien_dht_key: str) -> None:
+        """
+            Получает профиль собеседника из DHT и подключается к нему. Выполняется в фоновом потоке.
 
-    def __connect_to_another_client(self) -> None:
+        Args:
+            alien_dht_key (str): DHT ключ собеседника.
+        """
         try:
-            another_client_info: DHTPeerProfile = self._client_helper.get_data_from_dht(self._combo_alien_dht_key.get())
+            another_client_info: DHTPeerProfile = self._client_helper.get_data_from_dht(alien_dht_key)
         except (OSError, TypeError, ValidationError, EmptyDHTDataError) as e:
-            self._logger.error(f'Не удалось получить данные клиента [{self._combo_alien_dht_key.get()}].')
-            wg.CustomMessageBox.show(self, 'Ошибка', f'Не удалось получить ip клиента [{self._combo_alien_dht_key.get()}].\n\nОшибка [{e}].', wg.CustomMessageType.ERROR)
+            self._logger.error(f'Не удалось получить данные клиента [{alien_dht_key}].')
+            wg.CustomMessageBox.show(self, 'Ошибка', f'Не удалось получить ip клиента [{alien_dht_key}].\n\nОшибка [{e}].', wg.CustomMessageType.ERROR)
             return
         
-        if self._client_info.dht_peers_keys.add_new_dht_key(self._client_info.dht_node_ip, self._combo_alien_dht_key.get()):
+        if self._client_info.dht_peers_keys.add_new_dht_key(self._client_info.dht_node_ip, alien_dht_key):
             self._client_helper.update_dht_peers_keys(self._client_info.dht_peers_keys)
         
         # if self._client_helper.is_own_ip(another_client_info.avaliable_ip):
@@ -293,7 +307,7 @@ class WinApp(TkinterDnD.Tk):
         #     return
         
         # установаем соединение
-        self._client_helper.connect(another_client_info)
+        self._client_helper.connect(another_client_info, alien_dht_key)
 
     def _create_sign_in_window(self, registered_users: list[UserIdType]):
         """
@@ -415,6 +429,8 @@ class WinApp(TkinterDnD.Tk):
         """
         self._combo_alien_dht_key.set('')
         self._combo_alien_dht_key['values'] = ()
+        self._dht_peers_reachability = {}
+        self._update_reachability_label()
 
     def _pull_alien_combobox(self):
         """
@@ -427,6 +443,45 @@ class WinApp(TkinterDnD.Tk):
                 for dht_key in dht_node.dht_keys:
                     self._combo_alien_dht_key['values'] = (*self._combo_alien_dht_key['values'], dht_key)
 
+    def _prefetch_dht_profiles(self) -> None:
+        """
+            Заранее получает из DHT профили собеседников для текущего DHT-node IP и показывает, какие из них найдены.
+        """
+        dht_keys = [
+            dht_key
+            for dht_node in self._client_info.dht_peers_keys.nodes_history if dht_node.ip_address == self._client_info.dht_node_ip
+            for dht_key in dht_node.dht_keys
+        ]
+        if not dht_keys:
+            return
+
+        self._logger.debug(f'Запрашиваю из DHT профили [{len(dht_keys)}] сохраненных собеседников.')
+        reachability = self._client_helper.prefetch_dht_profiles(dht_keys)
+        self._ui_queue.post(self._set_dht_peers_reachability, reachability)
+
+    def _set_dht_peers_reachability(self, reachability: dict[str, bool]) -> None:
+        """
+            Запоминает, профили каких собеседников найдены в DHT, и обновляет надпись о доступности.
+
+        Args:
+            reachability (dict[str, bool]): DHT ключ -> найден ли профиль собеседника.
+        """
+        self._dht_peers_reachability = reachability
+        self._update_reachability_label()
+
+    def _update_reachability_label(self) -> None:
+        """
+            Показывает, найден ли в DHT выбранный собеседник, а если он не выбран - сколько собеседников найдено.
+        """
+        dht_key = self._combo_alien_dht_key.get()
+        if dht_key in self._dht_peers_reachability:
+            text = 'Собеседник в сети' if self._dht_peers_reachability[dht_key] else 'Собеседник не найден в DHT'
+        elif self._dht_peers_reachability:
+            text = f'В сети {sum(self._dht_peers_reachability.values())} из {len(self._dht_peers_reachability)} собеседников'
+        else:
+            text = ''
+        self._label_alien_reachability.config(text=text)
+
     def _create_child_window_for_entering_user_info(self, first_initialization: bool = False):
         """
             Создает дочернее окно для ввода дополнительной информации о пользователе.
@@ -729,7 +784,8 @@ class WinApp(TkinterDnD.Tk):
         wg.CustomMessageBox.show(self, 'Инфо', 'Подождите, идет загрузка аккаунта.', wg.CustomMessageType.INFO)
 
         self._last_user_id = self._client_info.user_id
-        self._client_helper.set_client_info(self._dialog_manager, deepcopy(self._client_info))
+        self._client_helper.set_client_info(self._dialog_manager, self._ui_queue, deepcopy(self._client_info))
+        threading.Thread(target=self._prefetch_dht_profiles, daemon=True).start()
 
         try:
             self._client_helper.save_account()
@@ -740,29 +796,13 @@ class WinApp(TkinterDnD.Tk):
 
         ip_address = self._client_helper.get_ip()
 
-        self.title(f"Client: ip[{ip_address}] | id[{self._client_info.user_id}] | name[{self._client_info.user_name}]")
-        self._dialog_manager.set_user_name(self._client_info.user_name)
+        # Метод выполняется в фоновом потоке, поэтому окно и диалоги обновляются в потоке интерфейса
+        self._ui_queue.post(self.title, f"Client: ip[{ip_address}] | id[{self._client_info.user_id}] | name[{self._client_info.user_name}]")
+        self._ui_queue.post(self._dialog_manager.set_user_name, self._client_info.user_name)
 
         self._logger.debug(f'Добавляю свой ip [{ip_address}] в DHT по ключу [{self._client_info.user_dht_key}].')
         
-        def __set_data():
-            self._client_helper.set_data_to_dht(
-                self._client_info.user_dht_key,
-                DHTPeerProfile(
-                    avaliable_ip=ip_address,
-                    avaliable_port=self._client_info.application_port,
-                    rsa_public_key=Encrypter.load_rsa_public_key(
-                        config.PATHS.KEYS,
-                        self._client_info.user_id_hash,
-                        self._client_info.user_password
-                    )
-                )
-            )
-        
-        try:
-            __set_data()
-        except ValueError:
-            __set_data()
+        self._client_helper.publish_own_profile()
 
     def _check_data_for_validity(self, data: str) -> bool:
         """
@@ -844,7 +884,7 @@ class WinApp(TkinterDnD.Tk):
             wg.CustomMessageBox.show(self, 'Инфо', f"Подождите, идет завершение программы...", wg.CustomMessageType.INFO)
             self._client_helper.close()
             self._create_config()
-            self.destroy()
+            self._ui_queue.post(self.destroy)
 
         
         if not self._was_event_to_close_program: